@@ -0,0 +1,148 @@
+from array import array
+
+from spatial_index import wrap_longitudes
+
+# Below this map zoom level responses carry clusters, from it on individual aircraft
+CLUSTER_MAX_ZOOM = 8
+# Cluster cells are about a quarter of a 256px map tile wide, so ~64px on screen
+CELLS_PER_TILE = 4
+# Finest level served without a viewport box: at most 32x16 cells for the whole world
+GLOBAL_CLUSTER_ZOOM = 3
+
+def cell_degrees(zoom):
+    """Cluster cell size in degrees at a map zoom level"""
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+class ClusterLevel:
+    """Aircraft aggregated into grid cells for one zoom level (parallel arrays, one entry per cell)"""
+
+    __slots__ = ('zoom', 'cells', 'counts', 'latitudes', 'longitudes', 'rows')
+
+    def __init__(self, zoom, cells, counts, latitudes, longitudes, rows):
+        self.zoom = zoom
+        self.cells = cells
+        self.counts = counts
+        # Centroids of the aircraft in each cell
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        # Any one aircraft of the cell, the aircraft itself when it is alone
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.counts)
+
+    def query(self, lamin=None, lomin=None, lamax=None, lomax=None):
+        """Cell positions whose centroid lies in the box (all cells without one)"""
+        if lamin is None:
+            return range(len(self.counts))
+        lomin, lomax = wrap_longitudes(lomin, lomax)
+        lats, lons = self.latitudes, self.longitudes
+        if lomin > lomax:
+            # Crosses the antimeridian
+            return [i for i in range(len(lats)) if lamin <= lats[i] <= lamax and (lons[i] >= lomin or lons[i] <= lomax)]
+        return [i for i in range(len(lats)) if lamin <= lats[i] <= lamax and lomin <= lons[i] <= lomax]
+
+class ClusterLevels:
+    """Per-zoom clusters of one snapshot, built once on the ingest thread.
+
+    The finest level is bucketed from the rows, every coarser level merges the
+    four cells below it, so all levels together cost about one pass over the
+    aircraft. A response below CLUSTER_MAX_ZOOM has at most one entry per cell
+    in view, however many aircraft are flying.
+    """
+
+    def __init__(self, latitudes, longitudes, max_zoom=CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.levels = {}
+        if max_zoom <= 0:
+            return
+
+        finest = max_zoom - 1
+        size = cell_degrees(finest)
+        columns = int(360 / size)
+        rows_per_column = int(180 / size)
+        # (x << 16 | y) cell -> [count, latitude sum, longitude sum, row]
+        buckets = {}
+        for row, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            x = min(max(int((lon + 180) / size), 0), columns - 1)
+            y = min(max(int((lat + 90) / size), 0), rows_per_column - 1)
+            cell = x << 16 | y
+            bucket = buckets.get(cell)
+            if bucket is None:
+                buckets[cell] = [1, lat, lon, row]
+            else:
+                bucket[0] += 1
+                bucket[1] += lat
+                bucket[2] += lon
+
+        for zoom in range(finest, -1, -1):
+            self.levels[zoom] = self._level(zoom, buckets)
+            parents = {}
+            for cell, (count, lat_sum, lon_sum, row) in buckets.items():
+                parent_cell = (cell >> 17) << 16 | (cell & 0xFFFF) >> 1
+                parent = parents.get(parent_cell)
+                if parent is None:
+                    parents[parent_cell] = [count, lat_sum, lon_sum, row]
+                else:
+                    parent[0] += count
+                    parent[1] += lat_sum
+                    parent[2] += lon_sum
+            buckets = parents
+
+    @classmethod
+    def for_columns(cls, columns, max_zoom=CLUSTER_MAX_ZOOM):
+        return cls(columns.columns['latitude'], columns.columns['longitude'], max_zoom)
+
+    @staticmethod
+    def _level(zoom, buckets):
+        cells, counts = array('I'), array('I')
+        latitudes, longitudes, rows = array('d'), array('d'), array('I')
+        for cell, (count, lat_sum, lon_sum, row) in buckets.items():
+            cells.append(cell)
+            counts.append(count)
+            latitudes.append(lat_sum / count)
+            longitudes.append(lon_sum / count)
+            rows.append(row)
+        return ClusterLevel(zoom, cells, counts, latitudes, longitudes, rows)
+
+    def level(self, zoom):
+        """ClusterLevel for a map zoom, or None when individual aircraft should be shown"""
+        if zoom is None or zoom >= self.max_zoom:
+            return None
+        return self.levels.get(max(int(zoom), 0))
+
+def clusters_payload(snapshot, zoom, bbox=None):
+    """Response body for a clustered zoom level, or None if the zoom shows individual aircraft.
+
+    Without a ``bbox`` the whole world is in view, so the clusters are those
+    of GLOBAL_CLUSTER_ZOOM at most: finer levels have about one cell per aircraft.
+    """
+    level = snapshot.clusters.level(zoom)
+    if level is None:
+        return None
+    if bbox is None and level.zoom > GLOBAL_CLUSTER_ZOOM:
+        level = snapshot.clusters.level(GLOBAL_CLUSTER_ZOOM)
+    clusters = []
+    aircraft = []
+    total = 0
+    for i in level.query(*(bbox or ())):
+        count = level.counts[i]
+        total += count
+        if count == 1:
+            aircraft.append(snapshot.columns.row(level.rows[i]))
+        else:
+            clusters.append({
+                'latitude': round(level.latitudes[i], 5),
+                'longitude': round(level.longitudes[i], 5),
+                'count': count
+            })
+    return {
+        'success': True,
+        'clustered': True,
+        'zoom': level.zoom,
+        'version': snapshot.version,
+        'time': snapshot.time,
+        'count': total,
+        'clusters': clusters,
+        'aircraft': aircraft
+    }
@@ -0,0 +1,213 @@
+import base64
+from array import array
+from itertools import compress
+
+NUMERIC_FIELDS = ('longitude', 'latitude', 'altitude', 'velocity', 'heading', 'vertical_rate')
+STRING_FIELDS = ('icao24', 'callsign', 'country')
+
+class StringTable:
+    """Interns strings into a list, handing out their integer position"""
+
+    __slots__ = ('values', '_index')
+
+    def __init__(self, values=None):
+        # A table loaded from existing values is read-only
+        self.values = list(values) if values is not None else []
+        self._index = {} if values is None else None
+
+    def intern(self, value):
+        ref = self._index.get(value)
+        if ref is None:
+            ref = self._index[value] = len(self.values)
+            self.values.append(value)
+        return ref
+
+    def freeze(self):
+        """Drop the lookup index once no more strings will be interned"""
+        self._index = None
+
+    def __getitem__(self, ref):
+        return self.values[ref]
+
+    def __len__(self):
+        return len(self.values)
+
+class AircraftColumns:
+    """Column-oriented store for one set of OpenSky state vectors.
+
+    Numeric fields are parallel array('d') columns, icao24/callsign/country are
+    array('I') references into per-store string tables and on_ground is a
+    bitmap, so a full states/all response costs tens of bytes per aircraft
+    instead of an 11-key dict. Rows are only turned back into dicts for the
+    aircraft a response actually returns.
+    """
+
+    def __init__(self):
+        self.tables = {field: StringTable() for field in STRING_FIELDS}
+        self.refs = {field: array('I') for field in STRING_FIELDS}
+        self.columns = {field: array('d') for field in NUMERIC_FIELDS}
+        self.on_ground = bytearray()
+        self._count = 0
+
+    @classmethod
+    def from_states(cls, states):
+        """Build from raw OpenSky state vectors, skipping ones without a position"""
+        store = cls()
+        icao24_refs, callsign_refs, country_refs = (store.refs[field].append for field in STRING_FIELDS)
+        intern_icao24, intern_callsign, intern_country = (store.tables[field].intern for field in STRING_FIELDS)
+        longitude, latitude, altitude, velocity, heading, vertical_rate = (
+            store.columns[field].append for field in NUMERIC_FIELDS
+        )
+        ground_rows = []
+        row = 0
+        for state in states or []:
+            if state[5] is None or state[6] is None:
+                continue
+            icao24_refs(intern_icao24(state[0]))
+            callsign_refs(intern_callsign((state[1] or '').strip() or 'Unknown'))
+            country_refs(intern_country(state[2] or ''))
+            longitude(state[5])
+            latitude(state[6])
+            altitude(state[7] or 0)
+            velocity(state[9] or 0)
+            heading(state[10] or 0)
+            vertical_rate(state[11] or 0)
+            if state[8]:
+                ground_rows.append(row)
+            row += 1
+        store._count = row
+        store.on_ground = bytearray((row + 7) // 8)
+        for row in ground_rows:
+            store.on_ground[row >> 3] |= 1 << (row & 7)
+        return store.freeze()
+
+    @classmethod
+    def from_dicts(cls, aircraft_list):
+        """Build from aircraft dicts as returned by the API"""
+        store = cls()
+        for aircraft in aircraft_list:
+            store.append(
+                icao24=aircraft['icao24'],
+                callsign=aircraft.get('callsign') or 'Unknown',
+                country=aircraft.get('origin_country') or aircraft.get('country'),
+                longitude=aircraft['longitude'],
+                latitude=aircraft['latitude'],
+                altitude=aircraft.get('altitude') or 0,
+                velocity=aircraft.get('velocity') or 0,
+                heading=aircraft.get('heading') or 0,
+                vertical_rate=aircraft.get('vertical_rate') or 0,
+                on_ground=aircraft.get('on_ground')
+            )
+        return store.freeze()
+
+    def append(self, icao24, callsign, country, longitude, latitude,
+               altitude=0, velocity=0, heading=0, vertical_rate=0, on_ground=False):
+        """Add one aircraft row"""
+        row = self._count
+        refs = self.refs
+        tables = self.tables
+        refs['icao24'].append(tables['icao24'].intern(icao24))
+        refs['callsign'].append(tables['callsign'].intern(callsign))
+        refs['country'].append(tables['country'].intern(country or ''))
+        columns = self.columns
+        columns['longitude'].append(longitude)
+        columns['latitude'].append(latitude)
+        columns['altitude'].append(altitude)
+        columns['velocity'].append(velocity)
+        columns['heading'].append(heading)
+        columns['vertical_rate'].append(vertical_rate)
+        if row % 8 == 0:
+            self.on_ground.append(0)
+        if on_ground:
+            self.on_ground[row >> 3] |= 1 << (row & 7)
+        self._count += 1
+
+    def freeze(self):
+        """Mark the store complete, releasing the interning indexes"""
+        for table in self.tables.values():
+            table.freeze()
+        return self
+
+    def __len__(self):
+        return self._count
+
+    def is_on_ground(self, row):
+        return bool(self.on_ground[row >> 3] & (1 << (row & 7)))
+
+    def filter(self, lamin=None, lomin=None, lamax=None, lomax=None, on_ground=None):
+        """Row indices matching a bounding box and/or ground state, as array('I').
+
+        A longitude range with lomin > lomax wraps across the antimeridian.
+        """
+        mask = [True] * self._count
+        if lamin is not None or lamax is not None:
+            lo = -90.0 if lamin is None else lamin
+            hi = 90.0 if lamax is None else lamax
+            mask = [m and lo <= lat <= hi for m, lat in zip(mask, self.columns['latitude'])]
+        if lomin is not None or lomax is not None:
+            lo = -180.0 if lomin is None else lomin
+            hi = 180.0 if lomax is None else lomax
+            if lo <= hi:
+                mask = [m and lo <= lon <= hi for m, lon in zip(mask, self.columns['longitude'])]
+            else:
+                mask = [m and (lon >= lo or lon <= hi) for m, lon in zip(mask, self.columns['longitude'])]
+        if on_ground is not None:
+            bits = self.on_ground
+            mask = [m and bool(bits[i >> 3] & (1 << (i & 7))) == on_ground for i, m in enumerate(mask)]
+        return array('I', compress(range(self._count), mask))
+
+    def row(self, i):
+        """One aircraft as the dict shape the API has always returned"""
+        tables, refs, columns = self.tables, self.refs, self.columns
+        country = tables['country'][refs['country'][i]]
+        return {
+            'icao24': tables['icao24'][refs['icao24'][i]],
+            'callsign': tables['callsign'][refs['callsign'][i]],
+            'country': country,
+            'origin_country': country,  # Add both for compatibility
+            'longitude': columns['longitude'][i],
+            'latitude': columns['latitude'][i],
+            'altitude': columns['altitude'][i],
+            'on_ground': self.is_on_ground(i),
+            'velocity': columns['velocity'][i],
+            'heading': columns['heading'][i],
+            'vertical_rate': columns['vertical_rate'][i],
+        }
+
+    def to_dicts(self, rows=None):
+        """Materialize rows (all by default) as aircraft dicts"""
+        if rows is None:
+            rows = range(self._count)
+        return [self.row(i) for i in rows]
+
+    def nbytes(self):
+        """Approximate memory held by the columns and string tables"""
+        total = len(self.on_ground)
+        for column in self.columns.values():
+            total += column.itemsize * len(column)
+        for refs in self.refs.values():
+            total += refs.itemsize * len(refs)
+        for table in self.tables.values():
+            total += sum(len(value) + 49 for value in table.values)
+        return total
+
+    def to_compact(self):
+        """JSON-friendly form for the shared cache (much smaller than a list of dicts)"""
+        return {
+            'count': self._count,
+            'tables': {field: table.values for field, table in self.tables.items()},
+            'refs': {field: refs.tolist() for field, refs in self.refs.items()},
+            'columns': {field: column.tolist() for field, column in self.columns.items()},
+            'on_ground': base64.b64encode(bytes(self.on_ground)).decode('ascii'),
+        }
+
+    @classmethod
+    def from_compact(cls, data):
+        """Inverse of to_compact()"""
+        store = cls()
+        store._count = data['count']
+        store.tables = {field: StringTable(data['tables'][field]) for field in STRING_FIELDS}
+        store.refs = {field: array('I', data['refs'][field]) for field in STRING_FIELDS}
+        store.columns = {field: array('d', data['columns'][field]) for field in NUMERIC_FIELDS}
+        store.on_ground = bytearray(base64.b64decode(data['on_ground']))
+        return store.freeze()
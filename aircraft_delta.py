@@ -0,0 +1,82 @@
+ROW_FIELDS = ('icao24', 'callsign', 'country', 'longitude', 'latitude', 'altitude',
+              'on_ground', 'velocity', 'heading', 'vertical_rate')
+MOTION_FIELDS = ('icao24', 'longitude', 'latitude', 'altitude', 'on_ground', 'velocity', 'heading', 'vertical_rate')
+
+# Decimal places kept per field: ~1 m for positions, 0.1 unit for the rest
+PRECISION = {
+    'longitude': 5,
+    'latitude': 5,
+    'altitude': 1,
+    'velocity': 1,
+    'heading': 1,
+    'vertical_rate': 1,
+}
+
+def _motion(columns, row):
+    c = columns.columns
+    return (
+        round(c['longitude'][row], PRECISION['longitude']),
+        round(c['latitude'][row], PRECISION['latitude']),
+        round(c['altitude'][row], PRECISION['altitude']),
+        columns.is_on_ground(row),
+        round(c['velocity'][row], PRECISION['velocity']),
+        round(c['heading'][row], PRECISION['heading']),
+        round(c['vertical_rate'][row], PRECISION['vertical_rate']),
+    )
+
+def _labels(columns, row):
+    tables, refs = columns.tables, columns.refs
+    return tables['callsign'][refs['callsign'][row]], tables['country'][refs['country'][row]]
+
+def _icao24(columns, row):
+    return columns.tables['icao24'][columns.refs['icao24'][row]]
+
+def full_row(columns, row):
+    """One aircraft as a positional array in ROW_FIELDS order"""
+    callsign, country = _labels(columns, row)
+    lon, lat, alt, on_ground, vel, heading, vrate = _motion(columns, row)
+    return [_icao24(columns, row), callsign, country, lon, lat, alt, on_ground, vel, heading, vrate]
+
+def diff_snapshots(base, snapshot, base_rows=None, rows=None):
+    """Compact patch turning ``base`` into ``snapshot`` for ``since=`` polling.
+
+    Aircraft are positional arrays rather than dicts: ``added`` rows (new, or
+    callsign/country changed) follow ``fields``, ``changed`` rows follow
+    ``motion_fields`` and ``removed`` lists icao24 codes. Aircraft whose rounded
+    position and motion did not change are left out entirely.
+
+    ``base_rows``/``rows`` restrict each side to a subset of rows (e.g. a bbox),
+    so aircraft leaving the area show up as removed and entering ones as added.
+    """
+    old, new = base.columns, snapshot.columns
+    if base_rows is None:
+        base_rows = range(len(old))
+    if rows is None:
+        rows = range(len(new))
+
+    previous = {_icao24(old, row): row for row in base_rows}
+    added = []
+    changed = []
+    for row in rows:
+        icao24 = _icao24(new, row)
+        old_row = previous.pop(icao24, None)
+        if old_row is None or _labels(old, old_row) != _labels(new, row):
+            added.append(full_row(new, row))
+            continue
+        motion = _motion(new, row)
+        if motion != _motion(old, old_row):
+            changed.append([icao24, *motion])
+
+    return {
+        'success': True,
+        'delta': True,
+        'base': base.version,
+        'version': snapshot.version,
+        'time': snapshot.time,
+        'count': len(rows),
+        'fields': ROW_FIELDS,
+        'added': added,
+        'motion_fields': MOTION_FIELDS,
+        'changed': changed,
+        'removed': list(previous),
+    }
@@ -0,0 +1,107 @@
+import csv
+import re
+
+from sqlalchemy import insert
+
+from database import db, RegisteredAircraft
+
+ICAO24_PATTERN = re.compile(r'^[0-9a-f]{6}$')
+
+# OpenSky CSV column (lowercased) -> RegisteredAircraft column
+CSV_COLUMNS = {
+    'icao24': 'icao24',
+    'registration': 'registration',
+    'manufacturername': 'manufacturer',
+    'model': 'model',
+    'typecode': 'typecode',
+    'operator': 'operator',
+    'owner': 'owner',
+    'built': 'built',
+}
+
+LOOKUP_CHUNK = 500  # Stay well below SQLite's bound-parameter limit
+
+def normalize_icao24(value):
+    """Lowercased icao24, or None if it isn't six hex digits"""
+    value = (value or '').strip().lower()
+    return value if ICAO24_PATTERN.match(value) else None
+
+def import_csv(path, batch_size=5000):
+    """Bulk load the OpenSky aircraft database CSV, replacing the whole registry. Returns the row count.
+
+    Handles both the older double-quoted export and the newer one that quotes
+    every field in single quotes.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        quotechar = "'" if f.read(1) == "'" else '"'
+        f.seek(0)
+        reader = csv.reader(f, quotechar=quotechar)
+        header = [name.strip().lower() for name in next(reader)]
+        positions = {CSV_COLUMNS[name]: i for i, name in enumerate(header) if name in CSV_COLUMNS}
+        if 'icao24' not in positions:
+            raise ValueError(f"{path} has no icao24 column")
+
+        # Rows missing from the new export go too; readers keep the old registry until the commit
+        db.session.query(RegisteredAircraft).delete()
+        statement = insert(RegisteredAircraft).prefix_with('OR REPLACE')
+        imported = 0
+        batch = []
+        for record in reader:
+            row = {column: (record[i].strip() or None) if i < len(record) else None
+                   for column, i in positions.items()}
+            row['icao24'] = normalize_icao24(row['icao24'])
+            if row['icao24'] is None:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                db.session.execute(statement, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(statement, batch)
+            imported += len(batch)
+        db.session.commit()
+    return imported
+
+def lookup(icao24s):
+    """{icao24: metadata dict} for the codes found in the registry (one indexed query per chunk)"""
+    icao24s = list(icao24s)
+    found = {}
+    for i in range(0, len(icao24s), LOOKUP_CHUNK):
+        chunk = icao24s[i:i + LOOKUP_CHUNK]
+        for aircraft in RegisteredAircraft.query.filter(RegisteredAircraft.icao24.in_(chunk)):
+            found[aircraft.icao24] = aircraft.to_dict()
+    return found
+
+def resolve(codes, cache):
+    """Sort a batch of requested codes: {'aircraft': {icao24: metadata}, 'unknown', 'unresolved', 'invalid'}.
+
+    The registry answers first, then ``cache`` holds earlier OpenSky lookups
+    (``opensky_aircraft_<icao24>``) and real OpenSky 404s
+    (``opensky_aircraft_unknown_<icao24>``). Codes neither knows are
+    unresolved: missing from the registry isn't unknown to OpenSky.
+    """
+    requested, invalid = [], []
+    for code in codes:
+        normalized = normalize_icao24(str(code))
+        if normalized is None:
+            invalid.append(code)
+        elif normalized not in requested:
+            requested.append(normalized)
+
+    # Skip the registry query for codes already known to be unknown
+    unknown, pending = [], []
+    for code in requested:
+        (unknown if cache.get(f"opensky_aircraft_unknown_{code}") else pending).append(code)
+    aircraft = lookup(pending)
+
+    unresolved = []
+    for code in pending:
+        if code in aircraft:
+            continue
+        cached = cache.get(f"opensky_aircraft_{code}")
+        if cached:
+            aircraft[code] = cached
+        else:
+            unresolved.append(code)
+    return {'aircraft': aircraft, 'unknown': unknown, 'unresolved': unresolved, 'invalid': invalid}
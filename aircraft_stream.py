@@ -0,0 +1,184 @@
+import json
+import math
+import threading
+
+from aircraft_clusters import CLUSTER_MAX_ZOOM, clusters_payload
+from aircraft_delta import diff_snapshots
+from spatial_index import wrap_longitudes
+
+# Subscription boxes are widened to whole multiples of this many degrees, so
+# clients looking at roughly the same area share one region and its frames
+REGION_DEGREES = 1.0
+
+def region_for(bbox):
+    """Snap a (lamin, lomin, lamax, lomax) box outwards to the region grid, None means the whole world"""
+    if bbox is None:
+        return None
+    lamin, lomin, lamax, lomax = bbox
+    lomin, lomax = wrap_longitudes(lomin, lomax)
+    step = REGION_DEGREES
+    lamin = max(math.floor(lamin / step) * step, -90.0)
+    lamax = min(math.ceil(lamax / step) * step, 90.0)
+    lomin = max(math.floor(lomin / step) * step, -180.0)
+    lomax = min(math.ceil(lomax / step) * step, 180.0)
+    if lamin <= -90.0 and lamax >= 90.0 and lomin <= -180.0 and lomax >= 180.0:
+        return None
+    return (lamin, lomin, lamax, lomax)
+
+def sse_event(event, data, event_id=None):
+    """Encode one Server-Sent Events message as bytes, data may already be JSON bytes"""
+    if not isinstance(data, bytes):
+        data = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    header = f"event: {event}\ndata: "
+    if event_id is not None:
+        header = f"id: {event_id}\n" + header
+    return header.encode('utf-8') + data + b'\n\n'
+
+def cluster_zoom(zoom):
+    """The zoom level a stream is clustered at, None when it carries individual aircraft"""
+    if zoom is None or zoom >= CLUSTER_MAX_ZOOM:
+        return None
+    return max(int(zoom), 0)
+
+class _Frames:
+    """The encoded events for one snapshot in one region, shared by all its subscribers"""
+
+    def __init__(self, key, snapshot, previous=None):
+        region, zoom = key
+        self.region = region
+        self.zoom = zoom
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.base = None
+        self.delta = None
+        self._full = None
+        self._lock = threading.Lock()
+        # Clusters are small and get resent whole, only aircraft lists are diffed
+        if previous is not None and zoom is None:
+            # Encoded here, once, on the ingest thread
+            self.base = previous.version
+            if region is None:
+                patch = diff_snapshots(previous, snapshot)
+            else:
+                patch = diff_snapshots(previous, snapshot, previous.index.query(*region), snapshot.index.query(*region))
+            self.delta = sse_event('delta', patch, self.version)
+
+    @property
+    def full(self):
+        """Complete aircraft list (or clusters), only encoded if a new or lagging subscriber needs it"""
+        if self._full is None:
+            with self._lock:
+                if self._full is None:
+                    snapshot = self.snapshot
+                    if self.zoom is not None:
+                        self._full = sse_event('clusters', clusters_payload(snapshot, self.zoom, self.region), self.version)
+                        return self._full
+                    if self.region is None:
+                        # Reuse the bytes the polling endpoint serves
+                        payload = snapshot.encoded()[0]
+                    else:
+                        aircraft = snapshot.columns.to_dicts(snapshot.index.query(*self.region))
+                        payload = {
+                            'success': True,
+                            'version': snapshot.version,
+                            'time': snapshot.time,
+                            'count': len(aircraft),
+                            'aircraft': aircraft
+                        }
+                    self._full = sse_event('snapshot', payload, self.version)
+        return self._full
+
+    def for_version(self, version):
+        """Delta if the subscriber holds the previous version, otherwise the full list"""
+        if self.delta is not None and version == self.base:
+            return self.delta
+        return self.full
+
+class Subscription:
+    """One open stream. Only the newest frames are kept, a slow client skips versions."""
+
+    def __init__(self, broadcaster, key, last_version=None):
+        self.broadcaster = broadcaster
+        self.key = key
+        self.version = last_version
+        self._frames = None
+        self._ready = threading.Event()
+
+    def _offer(self, frames):
+        self._frames = frames
+        self._ready.set()
+
+    def next_event(self, timeout):
+        """Bytes to send for the next snapshot, or None if nothing arrived within timeout"""
+        if not self._ready.wait(timeout):
+            return None
+        self._ready.clear()
+        frames = self._frames
+        if frames is None or frames.version == self.version:
+            return None
+        data = frames.for_version(self.version)
+        self.version = frames.version
+        return data
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+class AircraftBroadcaster:
+    """Fans each published AircraftSnapshot out to open SSE streams.
+
+    Subscriptions are grouped by region and cluster zoom, and every group's
+    events are encoded once per snapshot no matter how many streams share it.
+    Subscribers only hold an Event and a reference to the latest frames, so
+    under gevent workers thousands of idle connections cost a greenlet each
+    instead of a thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._regions = {}
+        self._frames = {}
+        self._snapshot = None
+
+    def subscribe(self, bbox=None, last_version=None, zoom=None):
+        key = (region_for(bbox), cluster_zoom(zoom))
+        subscription = Subscription(self, key, last_version)
+        with self._lock:
+            self._regions.setdefault(key, set()).add(subscription)
+            snapshot = self._snapshot
+            if snapshot is not None:
+                frames = self._frames.get(key)
+                if frames is None or frames.version != snapshot.version:
+                    frames = self._frames[key] = _Frames(key, snapshot)
+                subscription._offer(frames)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._regions.get(subscription.key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._regions[subscription.key]
+                self._frames.pop(subscription.key, None)
+
+    def publish(self, snapshot, previous=None):
+        """Encode the new snapshot for every subscribed region and wake its streams"""
+        with self._lock:
+            self._snapshot = snapshot
+            regions = {key: set(subscribers) for key, subscribers in self._regions.items()}
+        for key, subscribers in regions.items():
+            frames = _Frames(key, snapshot, previous)
+            with self._lock:
+                if key in self._regions:
+                    self._frames[key] = frames
+            for subscription in subscribers:
+                subscription._offer(frames)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._regions.values())
+
+    def region_count(self):
+        with self._lock:
+            return len(self._regions)
@@ -0,0 +1,125 @@
+import threading
+from array import array
+
+class TrackStore:
+    """Recent positions per icao24, in fixed-size ring buffers carved out of flat arrays.
+
+    Every tracked aircraft owns one slot of ``points`` entries in preallocated
+    float32/uint32 arrays (16 bytes a point), so memory is fixed up front at
+    ``max_aircraft * points * 16`` bytes no matter how many aircraft come and
+    go. Aircraft not seen for ``expiry_seconds`` give their slot back; when all
+    slots are taken, new aircraft are not tracked until one frees up.
+    """
+
+    def __init__(self, points=64, max_aircraft=20000, expiry_seconds=600):
+        self.points = points
+        self.max_aircraft = max_aircraft
+        self.expiry_seconds = expiry_seconds
+        size = points * max_aircraft
+        self.latitudes = array('f', bytes(4 * size))
+        self.longitudes = array('f', bytes(4 * size))
+        self.altitudes = array('f', bytes(4 * size))
+        self.times = array('I', bytes(4 * size))
+        # Per slot: next write position, number of points, last time seen
+        self.heads = array('H', bytes(2 * max_aircraft))
+        self.counts = array('H', bytes(2 * max_aircraft))
+        self.last_seen = array('I', bytes(4 * max_aircraft))
+        self.slots = {}
+        self.free_slots = list(range(max_aircraft - 1, -1, -1))
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def nbytes(self):
+        """Memory held by the preallocated buffers"""
+        arrays = (self.latitudes, self.longitudes, self.altitudes, self.times,
+                  self.heads, self.counts, self.last_seen)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def update(self, snapshot, previous=None):
+        """Append every aircraft's position from a new snapshot (an OpenSkyIngestor listener)"""
+        if snapshot.time is None:
+            return
+        now = int(snapshot.time)
+        columns = snapshot.columns
+        icao24_table, icao24_refs = columns.tables['icao24'], columns.refs['icao24']
+        lats, lons, alts = columns.columns['latitude'], columns.columns['longitude'], columns.columns['altitude']
+        points = self.points
+
+        with self._lock:
+            slots, free_slots = self.slots, self.free_slots
+            heads, counts, last_seen = self.heads, self.counts, self.last_seen
+            for row in range(len(columns)):
+                icao24 = icao24_table[icao24_refs[row]]
+                slot = slots.get(icao24)
+                if slot is None:
+                    if not free_slots:
+                        self.dropped += 1
+                        continue
+                    slot = slots[icao24] = free_slots.pop()
+                    heads[slot] = 0
+                    counts[slot] = 0
+                last_seen[slot] = now
+                count = counts[slot]
+                head = heads[slot]
+                base = slot * points
+                if count:
+                    # Skip unchanged positions (parked aircraft, repeated states)
+                    latest = base + (head - 1) % points
+                    if self.times[latest] >= now or (
+                            abs(self.latitudes[latest] - lats[row]) < 1e-5 and abs(self.longitudes[latest] - lons[row]) < 1e-5):
+                        continue
+                i = base + head
+                self.latitudes[i] = lats[row]
+                self.longitudes[i] = lons[row]
+                self.altitudes[i] = alts[row]
+                self.times[i] = now
+                heads[slot] = (head + 1) % points
+                if count < points:
+                    counts[slot] = count + 1
+            self._expire(now)
+
+    def _expire(self, now):
+        cutoff = now - self.expiry_seconds
+        last_seen = self.last_seen
+        stale = [icao24 for icao24, slot in self.slots.items() if last_seen[slot] < cutoff]
+        for icao24 in stale:
+            self.free_slots.append(self.slots.pop(icao24))
+
+    def track(self, icao24, limit=None):
+        """[[time, latitude, longitude, altitude], ...] oldest first, or None if not tracked"""
+        with self._lock:
+            slot = self.slots.get(icao24)
+            if slot is None:
+                return None
+            return self._points(slot, limit)
+
+    def tracks(self, icao24s, limit=None):
+        """{icao24: points} for the tracked aircraft among icao24s"""
+        with self._lock:
+            result = {}
+            for icao24 in icao24s:
+                slot = self.slots.get(icao24)
+                if slot is not None:
+                    result[icao24] = self._points(slot, limit)
+            return result
+
+    def _points(self, slot, limit):
+        points = self.points
+        count = self.counts[slot]
+        if limit is not None:
+            count = min(count, limit)
+        base = slot * points
+        start = self.heads[slot] - count
+        result = []
+        for n in range(count):
+            i = base + (start + n) % points
+            result.append([
+                self.times[i],
+                round(self.latitudes[i], 5),
+                round(self.longitudes[i], 5),
+                round(self.altitudes[i], 1)
+            ])
+        return result
@@ -1,10 +1,36 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, g, has_request_context, copy_current_request_context
 from flask_login import LoginManager, login_required, current_user
 import requests
 import os
+import atexit
+import time
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from cache_manager import CacheManager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from cache_manager import CacheManager, CachePolicy
+from cache_stores import SQLiteStore, RedisStore
+from singleflight import SingleFlight
+from http_clients import UpstreamClient, fan_out
+from rate_limiter import BACKGROUND, INTERACTIVE, BucketLimit, RateLimitExceeded, TokenBucketScheduler
+from opensky_ingest import AircraftSnapshot, OpenSkyIngestor
+from opensky_parser import StateStream
+import aircraft_registry
+import click
+from aircraft_columns import AircraftColumns
+from aircraft_clusters import clusters_payload
+from aircraft_delta import diff_snapshots
+from aircraft_stream import AircraftBroadcaster
+from aircraft_tracks import TrackStore
+from flight_store import FlightStore, normalize_filters
+from history_writer import HistoryWriter
+import weather_service
+from weather_service import WeatherPrewarmer, WeatherService
+import reference_catalog
+import result_blobs
+from reference_catalog import CatalogRefresher
+from password_hashing import PasswordHasher
+from sqlalchemy import event, text
+from user_identity import IdentityCache, UserIdentity
 from database import db, User, SearchHistory, APICache, UserPreferences
 from auth import auth_bp
 
@@ -20,6 +46,15 @@ def add_server_header(response):
     response.headers['X-Served-By'] = socket.gethostname()
     return response
 
+@app.after_request
+def add_cache_headers(response):
+    """Expose the age of cached upstream data served by this request"""
+    if 'cache_age' in g:
+        response.headers['Age'] = str(int(g.cache_age))
+        if g.get('cache_stale'):
+            response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
 # Ensure instance folder exists
 instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
 os.makedirs(instance_path, exist_ok=True)
@@ -36,24 +71,138 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
+# Per-namespace cache TTLs in seconds (first matching pattern wins, others expire after 24h).
+# Within max_stale_seconds past the TTL an entry is served stale while it refreshes in the background.
+CACHE_POLICIES = {
+    'opensky_aircraft_live*': CachePolicy(30, max_stale_seconds=2 * 60),   # live positions, respects OpenSky rate limits
+    'opensky_aircraft_unknown_*': 6 * 3600,                                 # icao24s neither the registry nor OpenSky know
+    'opensky_*': 24 * 3600,                                                 # aircraft metadata by icao24
+    'openweather_*': CachePolicy(10 * 60, max_stale_seconds=60 * 60),
+    'aviationstack_airports*': CachePolicy(7 * 24 * 3600, max_stale_seconds=7 * 24 * 3600),
+    'aviationstack_airlines*': CachePolicy(7 * 24 * 3600, max_stale_seconds=7 * 24 * 3600),
+    'aviationstack_airplanes*': CachePolicy(7 * 24 * 3600, max_stale_seconds=7 * 24 * 3600),
+}
+
 # Initialize cache manager
-cache = CacheManager(cache_file='cache/api_cache.json', expiry_hours=24)
+# 'journal'/'json' keep a per-process cache in memory, persisted to one file the workers share
+# (journal: every worker's writes survive a restart, json: the last writer's table does),
+# 'sqlite' (APICache table) and 'redis' (REDIS_URL) share one cache between all gunicorn workers and nodes
+CACHE_STORAGE = os.getenv('CACHE_STORAGE', 'journal')
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+if CACHE_STORAGE == 'sqlite':
+    cache_store = SQLiteStore(db_path)
+elif CACHE_STORAGE == 'redis':
+    cache_store = RedisStore(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+else:
+    cache_store = CACHE_STORAGE
+cache = CacheManager(
+    cache_file='cache/api_cache.json',
+    expiry_hours=24,
+    storage=cache_store,
+    policies=CACHE_POLICIES,
+    max_bytes=CACHE_MAX_BYTES,
+    eviction=os.getenv('CACHE_EVICTION', 'lru')
+)
 
 # API Configuration
 AVIATIONSTACK_API_KEY = os.getenv('AVIATIONSTACK_API_KEY')
 OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
 OPENSKY_BASE_URL = os.getenv('OPENSKY_BASE_URL', 'https://opensky-network.org/api')
+OPENSKY_INGEST_ENABLED = os.getenv('OPENSKY_INGEST', 'true').lower() in ('1', 'true', 'yes')
+AIRCRAFT_STREAM_KEEPALIVE = int(os.getenv('AIRCRAFT_STREAM_KEEPALIVE', 15))
+TRACK_POINTS = int(os.getenv('TRACK_POINTS', 64))
+TRACK_MAX_AIRCRAFT = int(os.getenv('TRACK_MAX_AIRCRAFT', 20000))
+TRACK_EXPIRY_SECONDS = int(os.getenv('TRACK_EXPIRY_SECONDS', 600))
+AIRCRAFT_BATCH_MAX = int(os.getenv('AIRCRAFT_BATCH_MAX', 1000))
+AIRCRAFT_BATCH_RESOLVE = int(os.getenv('AIRCRAFT_BATCH_RESOLVE', 5))
+USER_CACHE_SECONDS = int(os.getenv('USER_CACHE_SECONDS', 60))
+FLIGHT_STORE_MAX_AGE = int(os.getenv('FLIGHT_STORE_MAX_AGE', 600))
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 100))
+CATALOG_MAX_LIMIT = int(os.getenv('CATALOG_MAX_LIMIT', 1000))
+CATALOG_REFRESH_SECONDS = int(os.getenv('CATALOG_REFRESH_SECONDS', 6 * 3600))
+CATALOG_REFRESH_PAGES = int(os.getenv('CATALOG_REFRESH_PAGES', 5))
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 10))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', 2))
+WEATHER_BATCH_MAX = int(os.getenv('WEATHER_BATCH_MAX', 10))
+WEATHER_PREWARM_SECONDS = int(os.getenv('WEATHER_PREWARM_SECONDS', 300))
+WEATHER_PREWARM_MAX_NEW = int(os.getenv('WEATHER_PREWARM_MAX_NEW', 10))
+HISTORY_FLUSH_MS = int(os.getenv('HISTORY_FLUSH_MS', 200))
+HISTORY_BATCH_ROWS = int(os.getenv('HISTORY_BATCH_ROWS', 200))
+HISTORY_MAX_PENDING = int(os.getenv('HISTORY_MAX_PENDING', 5000))
 
 AVIATIONSTACK_BASE_URL = 'http://api.aviationstack.com/v1'
 OPENWEATHERMAP_BASE_URL = 'https://api.openweathermap.org/data/2.5'
 
-
-api_call_count = 0
+# One keep-alive connection pool per upstream, shared by every request thread of the worker
+upstream_clients = {
+    'opensky': UpstreamClient('opensky', OPENSKY_BASE_URL, pool_size=UPSTREAM_POOL_SIZE, retries=UPSTREAM_RETRIES),
+    'aviationstack': UpstreamClient('aviationstack', AVIATIONSTACK_BASE_URL, pool_size=UPSTREAM_POOL_SIZE, retries=UPSTREAM_RETRIES),
+    'openweather': UpstreamClient('openweather', OPENWEATHERMAP_BASE_URL, pool_size=UPSTREAM_POOL_SIZE, retries=UPSTREAM_RETRIES),
+}
+
+# Upstream call budgets, shared by all workers through instance/rate_limits.db.
+# 'N/S' means N calls per S seconds; monthly quotas are only enforced when set.
+upstream_limits = TokenBucketScheduler(
+    os.path.join(instance_path, 'rate_limits.db'),
+    limits={
+        'opensky': BucketLimit.parse(os.getenv('OPENSKY_RATE_LIMIT', '1/10')),
+        'aviationstack': BucketLimit.parse(
+            os.getenv('AVIATIONSTACK_RATE_LIMIT', '5/1'),
+            monthly_quota=int(os.getenv('AVIATIONSTACK_MONTHLY_QUOTA', 0))
+        ),
+        'openweather': BucketLimit.parse(os.getenv('OPENWEATHER_RATE_LIMIT', '60/60')),
+    },
+    max_wait=float(os.getenv('RATE_LIMIT_MAX_WAIT', 5))
+)
+
+# Concurrent cache misses for the same key share a single upstream request
+upstream_calls = SingleFlight()
+
+# Flight searches answered from earlier, broader searches when possible
+flight_store = FlightStore(max_age_seconds=FLIGHT_STORE_MAX_AGE)
+
+# Search history rows are inserted in batches by a writer thread, off the request path
+history_writer = HistoryWriter(
+    app,
+    flush_ms=HISTORY_FLUSH_MS,
+    batch_rows=HISTORY_BATCH_ROWS,
+    max_pending=HISTORY_MAX_PENDING
+)
+atexit.register(history_writer.close)
+
+# Refreshes of stale cache entries run here instead of on the request thread
+refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+# Parallel upstream calls issued on behalf of a single request
+fan_out_executor = ThreadPoolExecutor(max_workers=UPSTREAM_POOL_SIZE, thread_name_prefix='upstream-fan-out')
+
+# Password hashing runs in a small process pool with a bounded queue, see password_hashing.py
+User.password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8))
+)
+
+# current_user for authenticated requests, without a users query on every poll
+user_identities = IdentityCache(ttl_seconds=USER_CACHE_SECONDS)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def forget_cached_user(mapper, connection, user):
+    """Profile changes, password resets and account deletion drop the cached identity"""
+    user_identities.invalidate(user.id)
 
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    identity = user_identities.get(user_id)
+    if identity is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        identity = user_identities.put(UserIdentity.from_user(user))
+    return identity
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -61,6 +210,56 @@ app.register_blueprint(auth_bp)
 # Create database tables
 with app.app_context():
     db.create_all()
+    reference_catalog.ensure_schema()
+    result_blobs.ensure_schema()
+
+@app.cli.command('import-aircraft-db')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+def import_aircraft_db(csv_path):
+    """Load the OpenSky aircraft database CSV into the local icao24 registry"""
+    count = aircraft_registry.import_csv(csv_path)
+    print(f"✓ Imported {count} aircraft into the registry")
+
+@app.cli.command('import-catalog')
+@click.argument('kinds', nargs=-1, type=click.Choice(list(reference_catalog.KINDS)))
+def import_catalog(kinds):
+    """Page through aviationstack's airports/airlines/airplanes into the local catalog (resumes an interrupted run)"""
+    for kind in kinds or reference_catalog.KINDS:
+        # Someone is waiting on the import, so it queues like a request instead of yielding to them
+        fetch = lambda offset, limit, kind=kind: fetch_catalog_page(kind, offset, limit, INTERACTIVE)
+        count = 0
+        while True:
+            try:
+                count += reference_catalog.refresh(kind, fetch, page_size=CATALOG_PAGE_SIZE)
+                break
+            except RateLimitExceeded as e:
+                if e.reason == 'monthly quota':
+                    raise
+                # Pages done so far are saved, wait for the budget and resume
+                print(f"→ {e}, waiting")
+                time.sleep(e.retry_after)
+        print(f"✓ Imported {count} {kind} into the catalog")
+
+@app.cli.command('migrate-history-results')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--vacuum', is_flag=True, help='VACUUM afterwards so the file shrinks (rewrites the whole database)')
+def migrate_history_results(batch_size, vacuum):
+    """Move search results stored inline in search_history into the deduplicated result_blobs table"""
+    moved = skipped = 0
+    for count, unreadable in result_blobs.migrate(batch_size):
+        moved += count
+        skipped += unreadable
+        print(f"→ {moved} history rows migrated")
+    collected = result_blobs.collect()
+    stats = result_blobs.stats()
+    print(f"✓ Migrated {moved} history rows, {collected} unreferenced blobs removed")
+    if skipped:
+        print(f"⚠️  {skipped} rows with empty or unreadable results were left as they are")
+    print(f"✓ {stats['references']} rows share {stats['blobs']} blobs: "
+          f"{stats['raw_bytes'] / 1e6:.1f} MB of results stored in {stats['stored_bytes'] / 1e6:.1f} MB")
+    if vacuum:
+        db.session.execute(text('VACUUM'))
+        print("✓ Database vacuumed")
 
 # ===== ROUTE HANDLERS =====
 
@@ -90,10 +289,73 @@ def aircraft_map():
 
 # ===== API CALL FUNCTIONS =====
 
+@app.errorhandler(RateLimitExceeded)
+def rate_limited(e):
+    """Our own upstream budget is used up: tell the client when to come back"""
+    body = {
+        'success': False,
+        'error': 'Rate limit exceeded',
+        'message': f'{e.api_source} {e.reason} reached, please retry in {e.retry_after} seconds'
+    }
+    if request.path.startswith('/api/aircraft/'):
+        # The live aircraft clients read this list even from an error response
+        body['aircraft'] = []
+    response = jsonify(body)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def acquire_upstream(api_source, priority=None):
+    """Wait for (or be refused) an upstream call slot. Request threads are interactive,
+    background refreshes and the ingest poller yield to them; ``priority`` overrides that."""
+    if priority is None:
+        priority = INTERACTIVE if has_request_context() else BACKGROUND
+    upstream_limits.acquire(api_source, priority)
+
+def note_upstream_throttle(api_source, response):
+    """Drain the shared bucket when an upstream answers 429 anyway"""
+    if response.status_code == 429:
+        retry_after = response.headers.get('Retry-After', '')
+        upstream_limits.penalize(api_source, int(retry_after) if retry_after.isdigit() else 10)
+
+def fan_out_upstream(calls):
+    """Run several upstream calls for the current request in parallel, results in call order.
+
+    Each call runs in a copy of the request context, so it still counts as an
+    interactive caller for the rate limiter.
+    """
+    if has_request_context():
+        calls = [copy_current_request_context(call) for call in calls]
+    return fan_out(calls, fan_out_executor)
+
+def cached_or_fetch(cache_key, fetch, label):
+    """Serve cache_key from cache, calling fetch() on a miss.
+
+    Stale entries (past their TTL but within the namespace's max-stale window)
+    are served immediately, flagged with 'stale' and 'cache_age', while fetch()
+    refreshes them on the background pool.
+    """
+    found = cache.lookup(cache_key)
+    if found is None or not found[0]:
+        return upstream_calls.do(cache_key, fetch)
+
+    data, age, stale = found
+    if has_request_context():
+        g.cache_age = age
+        g.cache_stale = stale
+
+    if not stale:
+        print(f"✓ Cache hit for {label}")
+        return data
+
+    print(f"✓ Stale cache hit for {label} ({int(age)}s old), refreshing in background")
+    upstream_calls.spawn(cache_key, fetch, refresh_executor)
+    if isinstance(data, dict):
+        data = dict(data, stale=True, cache_age=int(age))
+    return data
+
 def make_api_request(endpoint, params=None, api_source='aviationstack'):
     """Make API request with smart caching"""
-    global api_call_count
-
     if params is None:
         params = {}
 
@@ -101,26 +363,33 @@ def make_api_request(endpoint, params=None, api_source='aviationstack'):
     cache_key = f"{api_source}_{endpoint}_{str(sorted(params.items()))}"
 
     # Check cache first
+    return cached_or_fetch(
+        cache_key,
+        lambda: _fetch_api_response(endpoint, params, api_source, cache_key),
+        f"{api_source}/{endpoint}"
+    )
+
+def _fetch_api_response(endpoint, params, api_source, cache_key):
+    """Fetch and cache an upstream response (runs once per in-flight cache key)"""
+    # Another request may have filled the cache while we were queued behind it
     cached_response = cache.get(cache_key)
     if cached_response:
-        print(f"✓ Cache hit for {api_source}/{endpoint}")
         return cached_response
 
     # Make API request
     try:
+        client = upstream_clients.get(api_source)
+        if client is None:
+            return {'error': {'message': f'Unknown API source: {api_source}'}}
         if api_source == 'aviationstack':
             params['access_key'] = AVIATIONSTACK_API_KEY
-            url = f"{AVIATIONSTACK_BASE_URL}/{endpoint}"
         elif api_source == 'openweather':
             params['appid'] = OPENWEATHERMAP_API_KEY
-            url = f"{OPENWEATHERMAP_BASE_URL}/{endpoint}"
-        elif api_source == 'opensky':
-            url = f"{OPENSKY_BASE_URL}/{endpoint}"
-        else:
-            return {'error': {'message': f'Unknown API source: {api_source}'}}
 
-        print(f"→ API call to {api_source}/{endpoint} (Call #{api_call_count + 1})")
-        response = requests.get(url, params=params, timeout=10)
+        acquire_upstream(api_source)
+        print(f"→ API call to {api_source}/{endpoint}")
+        response = client.get(endpoint, params=params)
+        note_upstream_throttle(api_source, response)
         response.raise_for_status()
         data = response.json()
 
@@ -129,7 +398,9 @@ def make_api_request(endpoint, params=None, api_source='aviationstack'):
 
         # Cache the response
         cache.set(cache_key, data)
-        api_call_count += 1
+        if has_request_context():
+            # Coalesced callers and background refreshes share the data but didn't fetch it
+            g.upstream_fetched = True
 
         return data
 
@@ -141,23 +412,23 @@ def make_api_request(endpoint, params=None, api_source='aviationstack'):
 @app.route('/api/flights')
 @login_required
 def get_flights():
-    """Get real-time flight data"""
-    params = {}
-
-    if request.args.get('flight_iata'):
-        params['flight_iata'] = request.args.get('flight_iata')
-    if request.args.get('dep_iata'):
-        params['dep_iata'] = request.args.get('dep_iata')
-    if request.args.get('arr_iata'):
-        params['arr_iata'] = request.args.get('arr_iata')
-    if request.args.get('airline_iata'):
-        params['airline_iata'] = request.args.get('airline_iata')
-    if request.args.get('flight_status'):
-        params['flight_status'] = request.args.get('flight_status')
-
-    params['limit'] = request.args.get('limit', 100)
-
-    data = make_api_request('flights', params, 'aviationstack')
+    """Get real-time flight data (from the local flight store when an earlier search covers it)"""
+    params = normalize_filters(request.args)
+    limit = request.args.get('limit', 100, type=int)
+
+    data = flight_store.answer(params, limit)
+    if data is not None:
+        g.cache_age = data['cache_age']
+    else:
+        g.pop('upstream_fetched', None)
+        data = make_api_request('flights', dict(params, limit=request.args.get('limit', 100)), 'aviationstack')
+        if g.pop('upstream_fetched', False):
+            # This request made the upstream call, so it stores the answer once
+            flight_store.count(params, 'upstream')
+            flight_store.ingest(params, data, limit)
+        else:
+            # From the response cache, or from another request's call for the same search
+            flight_store.count(params, 'cache')
 
     # Save to search history
     if data and isinstance(data, dict) and 'data' in data:
@@ -173,95 +444,218 @@ def get_flights():
             search_description.append(f"Airline: {params['airline_iata']}")
         if params.get('flight_status'):
             search_description.append(f"Status: {params['flight_status']}")
+        if params.get('flight_date'):
+            search_description.append(f"Date: {params['flight_date']}")
 
         search_query = " | ".join(search_description) if search_description else "Flight Search"
 
-        search = SearchHistory(
-            user_id=current_user.id,
-            search_type='flight',
-            search_query=search_query,  # Now stores readable text
-            results=data
-        )
-        db.session.add(search)
-        db.session.commit()
+        history_writer.add(current_user.id, 'flight', search_query, data)
 
     return jsonify(data)
 
 # ===== WEATHER ENDPOINTS =====
 
+def fetch_openweather(endpoint, params):
+    """One OpenWeatherMap call, bypassing the response cache (see weather_service.py)"""
+    acquire_upstream('openweather')
+    print(f"→ API call to openweather/{endpoint}")
+    response = upstream_clients['openweather'].get(endpoint, params=dict(params, appid=OPENWEATHERMAP_API_KEY))
+    note_upstream_throttle('openweather', response)
+    response.raise_for_status()
+    return response.json()
+
+# Weather per canonical location (airport code or normalized city name),
+# refreshed up to 20 locations per upstream call once their city ids are known
+weather = WeatherService(cache, fetch_openweather)
+
+# Keeps the weather of every user's favorite airports warm in the cache
+weather_prewarmer = WeatherPrewarmer(app, weather, interval=WEATHER_PREWARM_SECONDS, max_new=WEATHER_PREWARM_MAX_NEW)
+
+def fetch_weather_location(location):
+    """WeatherService.fetch_one() in its own app context, so it also runs on the background refresh pool"""
+    with app.app_context():
+        return weather.fetch_one(location)
+
+def refresh_weather_locations(locations):
+    with app.app_context():
+        weather.refresh(locations)
+
 @app.route('/api/weather/airport/<city>')
 @login_required
 def get_airport_weather(city):
-    """Get weather for an airport/city"""
-    params = {'q': city, 'units': 'metric'}
-    data = make_api_request('weather', params, 'openweather')
+    """Get weather for an airport code or city"""
+    location = weather_service.resolve(city)
+    data = cached_or_fetch(
+        weather.cache_key(location),
+        lambda: fetch_weather_location(location),
+        f"openweather/{location.key}"
+    )
     return jsonify(data)
 
-# ===== OPENSKY ENDPOINTS =====
-
-@app.route('/api/aircraft/live')
+@app.route('/api/weather/airports')
 @login_required
-def get_live_aircraft():
-    """Get all live aircraft positions from OpenSky"""
-    try:
-        # Check cache first (cache for 30 seconds to respect rate limits)
-        cache_key = "opensky_aircraft_live_all"
-        cached = cache.get(cache_key)
+def get_airports_weather():
+    """Weather for several airports/cities at once: ?city=LHR&city=Paris.
+    Cache misses are fetched together (grouped by city id where known), stale
+    entries are served as they are and refreshed in the background."""
+    cities = []
+    for city in request.args.getlist('city'):
+        city = city.strip()
+        if city and city not in cities:
+            cities.append(city)
+    if not cities:
+        return jsonify({'error': 'Missing city', 'message': 'Provide one or more city parameters'}), 400
+    if len(cities) > WEATHER_BATCH_MAX:
+        return jsonify({'error': 'Too many cities', 'message': f'At most {WEATHER_BATCH_MAX} cities per request'}), 400
+
+    locations = {city: weather_service.resolve(city) for city in cities}
+    results, stale, missing = {}, [], []
+    for location in locations.values():
+        found = cache.lookup(weather.cache_key(location))
+        if found is None or not found[0]:
+            missing.append(location)
+            continue
+        data, age, is_stale = found
+        if is_stale:
+            stale.append(location)
+            data = dict(data, stale=True, cache_age=int(age))
+        results[location.key] = data
+
+    if stale:
+        print(f"✓ Stale weather for {len(stale)} locations, refreshing in background")
+        refresh_executor.submit(refresh_weather_locations, stale)
+    if missing:
+        results.update(weather.refresh(missing, parallel=fan_out_upstream))
+    return jsonify({'success': True, 'weather': {city: results[location.key] for city, location in locations.items()}})
 
-        # Check if cache is less than 30 seconds old
-        if cached and 'timestamp' in cached:
-            cache_time = datetime.fromisoformat(cached['timestamp'])
-            if datetime.now() - cache_time < timedelta(seconds=30):
-                print("✓ OpenSky cache hit (fresh)")
-                return jsonify(cached.get('data', cached))
+# ===== OPENSKY ENDPOINTS =====
 
-        print("→ Fetching live aircraft from OpenSky")
-        response = requests.get(f"{OPENSKY_BASE_URL}/states/all", timeout=15)
-        response.raise_for_status()
-        data = response.json()
+def fetch_opensky_columns(params=None, timeout=10):
+    """Fetch OpenSky state vectors straight into AircraftColumns, coalescing identical concurrent requests.
+
+    Returns (status_code, {'time', 'total_states', 'columns'}), data is None unless the status is 200.
+    The body is parsed while it downloads, so the raw states list is never built.
+    """
+    params = params or {}
+
+    def fetch():
+        acquire_upstream('opensky')
+        with upstream_clients['opensky'].get('states/all', params=params, timeout=timeout, stream=True) as response:
+            note_upstream_throttle('opensky', response)
+            if response.status_code != 200:
+                return response.status_code, None
+            states = StateStream.from_response(response)
+            columns = AircraftColumns.from_states(states)
+            return response.status_code, {
+                'time': states.time,
+                'total_states': states.total_states,
+                'columns': columns
+            }
+
+    return upstream_calls.do(f"opensky_states_{sorted(params.items())}", fetch)
+
+# Background poller publishing the parsed global snapshot the aircraft endpoints read from
+opensky_ingestor = OpenSkyIngestor(
+    fetch_states=lambda: fetch_opensky_columns(timeout=15),
+    cache=cache,
+    poll_interval=int(os.getenv('OPENSKY_POLL_SECONDS', 15))
+)
+
+# Pushes every new snapshot to the open /api/aircraft/stream connections
+aircraft_broadcaster = AircraftBroadcaster()
+opensky_ingestor.add_listener(aircraft_broadcaster.publish)
+
+# Recent positions of every aircraft, appended from each snapshot for map trails
+aircraft_tracks = TrackStore(
+    points=TRACK_POINTS,
+    max_aircraft=TRACK_MAX_AIRCRAFT,
+    expiry_seconds=TRACK_EXPIRY_SECONDS
+)
+opensky_ingestor.add_listener(aircraft_tracks.update)
+
+@app.before_request
+def start_opensky_ingest():
+    """Start the ingest thread inside the serving process (after any gunicorn fork)"""
+    if OPENSKY_INGEST_ENABLED:
+        opensky_ingestor.start()
+    if CATALOG_REFRESH_SECONDS and AVIATIONSTACK_API_KEY:
+        catalog_refresher.start()
+    if WEATHER_PREWARM_SECONDS and OPENWEATHERMAP_API_KEY:
+        weather_prewarmer.start()
+
+def _snapshot_response(snapshot):
+    """Full snapshot response from its pre-encoded bytes, 304 if the client already has it"""
+    response = Response(status=200, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    if request.if_none_match.contains(snapshot.etag):
+        response.status_code = 304
+        return response
+
+    body, gzipped = snapshot.encoded()
+    if 'gzip' in request.accept_encodings:
+        response.set_data(gzipped)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(body)
+    return response
 
-        # Parse and format aircraft data
-        aircraft_list = []
-        if data and 'states' in data and data['states']:
-            for state in data['states']:
-                # Only include aircraft with valid coordinates
-                if state[6] is not None and state[5] is not None:
-                    # Filter out aircraft on ground if desired (optional - comment out to show all)
-                    # if state[8]:  # on_ground
-                    #     continue
-                    
-                    aircraft_list.append({
-                        'icao24': state[0],
-                        'callsign': (state[1] or '').strip() or 'Unknown',
-                        'country': state[2],
-                        'origin_country': state[2],  # Add both for compatibility
-                        'longitude': state[5],
-                        'latitude': state[6],
-                        'altitude': state[7] if state[7] else 0,
-                        'on_ground': state[8],
-                        'velocity': state[9] if state[9] else 0,
-                        'heading': state[10] if state[10] else 0,
-                        'vertical_rate': state[11] if state[11] else 0,
-                    })
-
-        print(f"✓ Processed {len(aircraft_list)} aircraft from OpenSky (total states: {len(data.get('states', []))})")
-        
-        formatted_data = {
+def _snapshot_delta(snapshot, bbox=None):
+    """Delta against the request's since= version, or None if a full response is needed"""
+    since = request.args.get('since', type=int)
+    if since is None:
+        return None
+    base = snapshot if since == snapshot.version else opensky_ingestor.snapshot_at(since)
+    if base is None:
+        # Too old (or from another deployment), the client has to start over
+        return None
+    if base is snapshot:
+        return {
             'success': True,
-            'time': data.get('time'),
-            'count': len(aircraft_list),
-            'aircraft': aircraft_list
+            'delta': True,
+            'base': since,
+            'version': snapshot.version,
+            'time': snapshot.time,
+            'count': len(snapshot.columns) if bbox is None else len(snapshot.index.query(*bbox)),
+            'added': [],
+            'changed': [],
+            'removed': []
         }
+    if bbox is None:
+        return diff_snapshots(base, snapshot)
+    return diff_snapshots(base, snapshot, base.index.query(*bbox), snapshot.index.query(*bbox))
 
-        # Cache the response with timestamp
-        cache.cache[cache_key] = {
-            'data': formatted_data,
-            'timestamp': datetime.now().isoformat()
-        }
-        cache._save_cache()
+@app.route('/api/aircraft/live')
+@login_required
+def get_live_aircraft():
+    """Get all live aircraft positions from OpenSky.
 
+    Pollers that pass back the last ``version`` as ``since`` get a delta
+    (added/changed/removed aircraft) instead of the full list. A map ``zoom``
+    below the clustering threshold gets clusters with counts instead, for the
+    map's lamin/lomin/lamax/lomax viewport when given.
+    """
+    try:
+        # Served straight from the ingest snapshot when the poller is running
+        snapshot = opensky_ingestor.snapshot()
+        if snapshot:
+            g.cache_age = snapshot.age
+            bbox = tuple(request.args.get(name, type=float) for name in ('lamin', 'lomin', 'lamax', 'lomax'))
+            clustered = clusters_payload(snapshot, request.args.get('zoom', type=int), None if None in bbox else bbox)
+            partial = clustered or _snapshot_delta(snapshot)
+            if partial:
+                return jsonify(partial)
+            return _snapshot_response(snapshot)
+
+        # Check cache first (the opensky_aircraft_live* policy keeps it for 30 seconds).
+        # Every poller that missed waits on the same upstream fetch.
+        cache_key = "opensky_aircraft_live_all"
+        formatted_data = cached_or_fetch(cache_key, lambda: _fetch_live_aircraft(cache_key), "OpenSky live aircraft")
         return jsonify(formatted_data)
 
+    except RateLimitExceeded:
+        raise
     except requests.Timeout:
         return jsonify({'success': False, 'error': 'OpenSky API timeout'}), 504
     except requests.RequestException as e:
@@ -269,6 +663,82 @@ def get_live_aircraft():
     except Exception as e:
         return jsonify({'success': False, 'error': f'Unexpected error: {str(e)}'}), 500
 
+def _fetch_live_aircraft(cache_key):
+    """Fetch, format and cache all live aircraft (runs once per in-flight refresh)"""
+    cached = cache.get(cache_key)
+    if cached:
+        return cached
+
+    print("→ Fetching live aircraft from OpenSky")
+    status_code, data = fetch_opensky_columns(timeout=15)
+    if status_code != 200:
+        raise requests.HTTPError(f"OpenSky returned status code {status_code}")
+
+    # Format aircraft data
+    columns = data['columns']
+    aircraft_list = columns.to_dicts()
+
+    print(f"✓ Processed {len(aircraft_list)} aircraft from OpenSky (total states: {data['total_states']})")
+    
+    formatted_data = {
+        'success': True,
+        'time': data['time'],
+        'count': len(aircraft_list),
+        'aircraft': aircraft_list
+    }
+
+    # Cache the response and hand it to the ingest snapshot
+    cache.set(cache_key, formatted_data)
+    if OPENSKY_INGEST_ENABLED:
+        opensky_ingestor.publish(columns, data['time'], total_states=data['total_states'])
+
+    return formatted_data
+
+@app.route('/api/aircraft/stream')
+@login_required
+def stream_aircraft():
+    """Server-Sent Events feed of live aircraft, optionally limited to a bounding box.
+
+    The first event is the full list ('snapshot'), then one 'delta' event per
+    ingest update in the same format as since= polling. Reconnecting browsers
+    send Last-Event-ID and pick up with a delta when the version is still current.
+    A low map ``zoom`` gets a 'clusters' event per update instead.
+    """
+    if not OPENSKY_INGEST_ENABLED:
+        return jsonify({'success': False, 'error': 'Live aircraft stream needs OPENSKY_INGEST enabled'}), 503
+
+    bbox = [request.args.get(name, type=float) for name in ('lamin', 'lomin', 'lamax', 'lomax')]
+    if all(value is None for value in bbox):
+        bbox = None
+    elif None in bbox:
+        return jsonify({
+            'error': 'Incomplete bounding box parameters',
+            'message': 'Please provide all of lamin, lomin, lamax, lomax or none of them'
+        }), 400
+
+    subscription = aircraft_broadcaster.subscribe(
+        bbox,
+        last_version=request.headers.get('Last-Event-ID', type=int),
+        zoom=request.args.get('zoom', type=int)
+    )
+    opensky_ingestor.snapshot()  # Wakes the poller if it went idle
+
+    def generate():
+        try:
+            yield b'retry: 5000\n\n'
+            while True:
+                data = subscription.next_event(AIRCRAFT_STREAM_KEEPALIVE)
+                # An open stream counts as a reader, so the poller never idles under it
+                opensky_ingestor.snapshot()
+                yield data or b': keepalive\n\n'
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+
 @app.route('/api/aircraft/live/box')
 @login_required
 def get_aircraft_live_box():
@@ -287,9 +757,28 @@ def get_aircraft_live_box():
                 'message': 'Please provide lamin, lomin, lamax, lomax'
             }), 400
         
+        # Answer from the spatial index over the global ingest snapshot when we have one,
+        # only asking OpenSky for the box itself when there is none
+        snapshot = opensky_ingestor.snapshot()
+        if snapshot:
+            g.cache_age = snapshot.age
+            bbox = (lamin, lomin, lamax, lomax)
+            # Clusters at low zoom, a delta for since= pollers, otherwise the aircraft in the box
+            partial = clusters_payload(snapshot, request.args.get('zoom', type=int), bbox) or _snapshot_delta(snapshot, bbox)
+            if partial:
+                return jsonify(partial)
+            rows = snapshot.index.query(lamin, lomin, lamax, lomax)
+            aircraft_list = snapshot.columns.to_dicts(rows)
+            return jsonify({
+                'success': True,
+                'version': snapshot.version,
+                'count': len(aircraft_list),
+                'aircraft': aircraft_list,
+                'timestamp': snapshot.time
+            })
+        
         # OpenSky Network API endpoint
         # Documentation: https://openskynetwork.github.io/opensky-api/rest.html
-        url = f'https://opensky-network.org/api/states/all'
         
         # Parameters for bounding box
         params = {
@@ -301,49 +790,21 @@ def get_aircraft_live_box():
         
         # Make request to OpenSky Network
         # Note: Free tier has rate limits (1 request every 10 seconds for anonymous users)
-        response = requests.get(url, params=params, timeout=10)
+        # Identical concurrent bounding boxes share one upstream request
+        status_code, data = fetch_opensky_columns(params)
         
         # Check if request was successful
-        if response.status_code == 200:
-            data = response.json()
-            
-            # OpenSky returns data in format:
-            # {
-            #   "time": timestamp,
-            #   "states": [array of aircraft states]
-            # }
+        if status_code == 200:
             
-            if data and 'states' in data and data['states']:
+            if len(data['columns']):
                 # Format the aircraft data for frontend
-                aircraft_list = []
-                
-                for state in data['states']:
-                    # OpenSky state vector format (indices):
-                    # 0: icao24, 1: callsign, 2: origin_country, 3: time_position,
-                    # 4: last_contact, 5: longitude, 6: latitude, 7: baro_altitude,
-                    # 8: on_ground, 9: velocity, 10: true_track, 11: vertical_rate,
-                    # 12: sensors, 13: geo_altitude, 14: squawk, 15: spi, 16: position_source
-                    
-                    if state[5] is not None and state[6] is not None:  # Has valid position
-                        aircraft = {
-                            'icao24': state[0],
-                            'callsign': state[1].strip() if state[1] else 'N/A',
-                            'origin_country': state[2],
-                            'longitude': state[5],
-                            'latitude': state[6],
-                            'altitude': state[7] if state[7] else 0,
-                            'velocity': state[9] if state[9] else 0,
-                            'heading': state[10] if state[10] else 0,
-                            'vertical_rate': state[11] if state[11] else 0,
-                            'on_ground': state[8]
-                        }
-                        aircraft_list.append(aircraft)
+                aircraft_list = data['columns'].to_dicts()
                 
                 return jsonify({
                     'success': True,
                     'count': len(aircraft_list),
                     'aircraft': aircraft_list,
-                    'timestamp': data.get('time', None)
+                    'timestamp': data['time']
                 })
             else:
                 # No aircraft in the bounding box
@@ -354,7 +815,7 @@ def get_aircraft_live_box():
                     'message': 'No aircraft found in this area'
                 })
         
-        elif response.status_code == 429:
+        elif status_code == 429:
             # Rate limit exceeded
             return jsonify({
                 'error': 'Rate limit exceeded',
@@ -366,10 +827,12 @@ def get_aircraft_live_box():
             # Other error from OpenSky
             return jsonify({
                 'error': 'API Error',
-                'message': f'OpenSky Network returned status code {response.status_code}',
+                'message': f'OpenSky Network returned status code {status_code}',
                 'aircraft': []
-            }), response.status_code
+            }), status_code
     
+    except RateLimitExceeded:
+        raise
     except requests.exceptions.Timeout:
         return jsonify({
             'error': 'Timeout',
@@ -401,39 +864,32 @@ def get_aircraft_live_box():
 @app.route('/api/aircraft/live/all')
 @login_required
 def get_aircraft_live_all():
-    """Get all live aircraft data from OpenSky Network"""
+    """Get all live aircraft data from OpenSky Network.
+
+    Pass the map ``zoom`` to keep the response small: below the clustering
+    threshold aircraft come back as clusters with counts.
+    """
     try:
-        url = 'https://opensky-network.org/api/states/all'
+        zoom = request.args.get('zoom', type=int)
+        snapshot = opensky_ingestor.snapshot()
+        if snapshot:
+            clustered = clusters_payload(snapshot, zoom)
+            return jsonify(clustered) if clustered else _snapshot_response(snapshot)
         
-        response = requests.get(url, timeout=10)
+        status_code, data = fetch_opensky_columns()
         
-        if response.status_code == 200:
-            data = response.json()
+        if status_code == 200:
             
-            if data and 'states' in data and data['states']:
-                aircraft_list = []
-                
-                # Limit to first 100 aircraft to avoid overwhelming the map
-                for state in data['states'][:100]:
-                    if state[5] is not None and state[6] is not None:
-                        aircraft = {
-                            'icao24': state[0],
-                            'callsign': state[1].strip() if state[1] else 'N/A',
-                            'origin_country': state[2],
-                            'longitude': state[5],
-                            'latitude': state[6],
-                            'altitude': state[7] if state[7] else 0,
-                            'velocity': state[9] if state[9] else 0,
-                            'heading': state[10] if state[10] else 0,
-                            'on_ground': state[8]
-                        }
-                        aircraft_list.append(aircraft)
-                
-                return jsonify({
-                    'success': True,
-                    'count': len(aircraft_list),
-                    'aircraft': aircraft_list
-                })
+            if len(data['columns']):
+                # One-off snapshot so the response is clustered the same way
+                snapshot = AircraftSnapshot(
+                    version=int(data['time'] or datetime.now().timestamp()),
+                    time=data['time'],
+                    fetched_at=datetime.now().timestamp(),
+                    total_states=data['total_states'],
+                    columns=data['columns']
+                )
+                return jsonify(clusters_payload(snapshot, zoom) or snapshot.payload)
             else:
                 return jsonify({
                     'success': True,
@@ -443,10 +899,12 @@ def get_aircraft_live_all():
         else:
             return jsonify({
                 'error': 'API Error',
-                'message': f'OpenSky Network returned status code {response.status_code}',
+                'message': f'OpenSky Network returned status code {status_code}',
                 'aircraft': []
-            }), response.status_code
+            }), status_code
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"Error in get_aircraft_live_all: {str(e)}")
         return jsonify({
@@ -461,52 +919,204 @@ def get_aircraft_live_all():
 def test_aircraft_api():
     """Test endpoint to verify OpenSky Network connectivity"""
     try:
-        url = 'https://opensky-network.org/api/states/all'
-        response = requests.get(url, timeout=10)
+        snapshot = opensky_ingestor.snapshot()
+        if snapshot:
+            # The ingest loop just talked to OpenSky, no need to ask again
+            return jsonify({
+                'success': True,
+                'status_code': opensky_ingestor.last_status or 200,
+                'message': 'OpenSky Network is reachable',
+                'aircraft_count': snapshot.total_states,
+                'snapshot_age': round(snapshot.age, 1)
+            })
+        
+        status_code, data = fetch_opensky_columns()
         
         return jsonify({
-            'success': response.status_code == 200,
-            'status_code': response.status_code,
-            'message': 'OpenSky Network is reachable' if response.status_code == 200 else 'OpenSky Network error',
-            'aircraft_count': len(response.json().get('states', [])) if response.status_code == 200 else 0
+            'success': status_code == 200,
+            'status_code': status_code,
+            'message': 'OpenSky Network is reachable' if status_code == 200 else 'OpenSky Network error',
+            'aircraft_count': data['total_states'] if status_code == 200 else 0
         })
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
+@app.route('/api/aircraft/<icao24>/track')
+@login_required
+def get_aircraft_track(icao24):
+    """Recent positions of one aircraft as [time, latitude, longitude, altitude] points"""
+    opensky_ingestor.snapshot()  # Keeps the poller, and with it the tracks, running
+    points = aircraft_tracks.track(icao24.lower(), request.args.get('limit', type=int))
+    if points is None:
+        return jsonify({'success': False, 'error': f'No recent track for {icao24}'}), 404
+    return jsonify({
+        'success': True,
+        'icao24': icao24.lower(),
+        'fields': ['time', 'latitude', 'longitude', 'altitude'],
+        'points': points
+    })
+
+@app.route('/api/aircraft/tracks')
+@login_required
+def get_aircraft_tracks():
+    """Trails of every aircraft currently inside a bounding box"""
+    lamin = request.args.get('lamin', type=float)
+    lomin = request.args.get('lomin', type=float)
+    lamax = request.args.get('lamax', type=float)
+    lomax = request.args.get('lomax', type=float)
+    if None in [lamin, lomin, lamax, lomax]:
+        return jsonify({
+            'error': 'Missing bounding box parameters',
+            'message': 'Please provide lamin, lomin, lamax, lomax'
+        }), 400
+
+    snapshot = opensky_ingestor.snapshot()
+    if not snapshot:
+        return jsonify({'success': False, 'error': 'No live aircraft snapshot available yet'}), 503
+
+    columns = snapshot.columns
+    icao24s = [columns.tables['icao24'][columns.refs['icao24'][row]]
+               for row in snapshot.index.query(lamin, lomin, lamax, lomax)]
+    tracks = aircraft_tracks.tracks(icao24s, request.args.get('limit', type=int))
+    g.cache_age = snapshot.age
+    return jsonify({
+        'success': True,
+        'version': snapshot.version,
+        'count': len(tracks),
+        'fields': ['time', 'latitude', 'longitude', 'altitude'],
+        'tracks': tracks
+    })
+
 @app.route('/api/aircraft/<icao24>')
 @login_required
 def get_aircraft_by_icao(icao24):
-    """Get aircraft information by ICAO24 code"""
+    """Get aircraft information by ICAO24 code (local registry first, then OpenSky)"""
     try:
+        icao24 = aircraft_registry.normalize_icao24(icao24) or icao24
+        registered = aircraft_registry.lookup([icao24]).get(icao24)
+        if registered:
+            return jsonify(registered)
+
         cache_key = f"opensky_aircraft_{icao24}"
         cached = cache.get(cache_key)
         if cached:
             return jsonify(cached)
+        if cache.get(f"opensky_aircraft_unknown_{icao24}"):
+            return jsonify({'error': f'Aircraft {icao24} not found'}), 404
 
-        print(f"→ Fetching aircraft info for {icao24}")
-        response = requests.get(f"{OPENSKY_BASE_URL}/aircraft/icao/{icao24}", timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        # Cache the response
-        cache.set(cache_key, data)
-
-        return jsonify(data)
+        return jsonify(upstream_calls.do(cache_key, lambda: fetch_aircraft_info(icao24)))
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         return jsonify({'error': f'Aircraft not found or API error: {str(e)}'}), 404
 
+def fetch_aircraft_info(icao24):
+    """Fetch and cache one aircraft's OpenSky metadata, remembering a 404 as unknown"""
+    acquire_upstream('opensky')
+    print(f"→ Fetching aircraft info for {icao24}")
+    response = upstream_clients['opensky'].get(f"aircraft/icao/{icao24}")
+    note_upstream_throttle('opensky', response)
+    if response.status_code == 404:
+        # Remember the miss so repeated clicks don't go upstream again
+        cache.set(f"opensky_aircraft_unknown_{icao24}", True)
+    response.raise_for_status()
+    data = response.json()
+
+    # Cache the response
+    cache.set(f"opensky_aircraft_{icao24}", data)
+    return data
+
+def resolve_aircraft_later(codes):
+    """Look up a few unresolved codes on the background pool, as the OpenSky budget allows"""
+    def resolve(icao24):
+        try:
+            fetch_aircraft_info(icao24)
+        except (RateLimitExceeded, requests.exceptions.RequestException):
+            pass  # Still unresolved, a later batch asks again
+
+    for icao24 in codes[:AIRCRAFT_BATCH_RESOLVE]:
+        upstream_calls.spawn(f"opensky_aircraft_resolve_{icao24}", lambda icao24=icao24: resolve(icao24),
+                             refresh_executor)
+
+@app.route('/api/aircraft/batch', methods=['POST'])
+@login_required
+def get_aircraft_batch():
+    """Resolve many icao24 codes at once from the local registry.
+
+    Body: {"icao24": ["a1b2c3", ...]}. Codes the registry doesn't know are
+    answered from earlier OpenSky lookups when cached. Codes OpenSky answered
+    404 for are reported as unknown; the rest as unresolved, without waiting
+    for OpenSky: up to AIRCRAFT_BATCH_RESOLVE of them are looked up in the
+    background, so asking again later returns them.
+    """
+    payload = request.get_json(silent=True) or {}
+    codes = payload.get('icao24')
+    if not isinstance(codes, list):
+        return jsonify({'error': 'Invalid request', 'message': 'Send a JSON body with an "icao24" list'}), 400
+    if len(codes) > AIRCRAFT_BATCH_MAX:
+        return jsonify({'error': 'Too many codes', 'message': f'At most {AIRCRAFT_BATCH_MAX} icao24 codes per request'}), 400
+
+    resolved = aircraft_registry.resolve(codes, cache)
+    resolve_aircraft_later(resolved['unresolved'])
+    return jsonify(dict(resolved, success=True, count=len(resolved['aircraft'])))
+
+# ===== REFERENCE CATALOG =====
+
+def fetch_catalog_page(kind, offset, limit, priority=None):
+    """One page of an aviationstack reference list, bypassing the response cache"""
+    acquire_upstream('aviationstack', priority)
+    print(f"→ API call to aviationstack/{kind} (offset {offset})")
+    response = upstream_clients['aviationstack'].get(kind, params={
+        'access_key': AVIATIONSTACK_API_KEY,
+        'limit': limit,
+        'offset': offset
+    })
+    note_upstream_throttle('aviationstack', response)
+    response.raise_for_status()
+    return response.json()
+
+# Keeps imported airports/airlines/airplanes current, a few pages per run
+catalog_refresher = CatalogRefresher(
+    app,
+    fetch_catalog_page,
+    interval=CATALOG_REFRESH_SECONDS,
+    pages_per_step=CATALOG_REFRESH_PAGES,
+    page_size=CATALOG_PAGE_SIZE
+)
+
+def catalog_response(kind):
+    """Serve a reference list from the local catalog (search, country, offset/limit, cursor).
+    Until the catalog has been imported, falls back to the first 100 rows from aviationstack."""
+    if not reference_catalog.has_entries(kind):
+        return jsonify(make_api_request(kind, {'limit': 100}, 'aviationstack'))
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), CATALOG_MAX_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    try:
+        data = reference_catalog.query(
+            kind,
+            search=request.args.get('search', '').strip() or None,
+            country=request.args.get('country', '').strip() or None,
+            offset=offset,
+            limit=limit,
+            cursor=request.args.get('cursor') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': 'Invalid request', 'message': str(e)}), 400
+    return jsonify(data)
+
 # ===== AIRPORT ENDPOINTS =====
 
 @app.route('/api/airports')
 @login_required
 def get_airports():
     """Get airport data"""
-    params = {'limit': 100}
-    data = make_api_request('airports', params, 'aviationstack')
-    return jsonify(data)
+    return catalog_response('airports')
 
 # ===== AIRLINE ENDPOINTS =====
 
@@ -514,9 +1124,7 @@ def get_airports():
 @login_required
 def get_airlines():
     """Get airline data"""
-    params = {'limit': 100}
-    data = make_api_request('airlines', params, 'aviationstack')
-    return jsonify(data)
+    return catalog_response('airlines')
 
 # ===== AIRCRAFT ENDPOINTS =====
 
@@ -524,9 +1132,7 @@ def get_airlines():
 @login_required
 def get_aircraft():
     """Get aircraft data"""
-    params = {'limit': 100}
-    data = make_api_request('airplanes', params, 'aviationstack')
-    return jsonify(data)
+    return catalog_response('airplanes')
 
 # ===== HISTORY ENDPOINTS =====
 
@@ -534,6 +1140,7 @@ def get_aircraft():
 @login_required
 def get_search_history():
     """Get user's search history"""
+    history_writer.flush()
     history = SearchHistory.query.filter_by(user_id=current_user.id).order_by(SearchHistory.timestamp.desc()).limit(50).all()
     return jsonify([h.to_dict() for h in history])
 
@@ -541,6 +1148,7 @@ def get_search_history():
 @login_required
 def clear_search_history():
     """Clear user's search history"""
+    history_writer.flush()
     SearchHistory.query.filter_by(user_id=current_user.id).delete()
     db.session.commit()
     return jsonify({'message': 'History cleared'})
@@ -554,7 +1162,13 @@ def cache_info():
     info = cache.get_cache_info()
     return jsonify({
         'total_cached_items': len(info),
-        'api_calls_made': api_call_count,
+        'total_cached_bytes': cache.total_bytes,
+        'max_cache_bytes': cache.max_bytes,
+        'evictions': cache.evictions,
+        'api_calls_made': upstream_limits.total_calls(),
+        'upstream_usage': upstream_limits.usage(),
+        'flight_store': flight_store.stats(),
+        'history_writer': history_writer.stats(),
         'cache_details': info
     })
 
@@ -658,7 +1272,7 @@ if __name__ == '__main__':
     print(f"Database: SQLite (instance/flighthub.db)")
     print(f"Authentication: Enabled ✓")
     print(f"API Keys configured: ✓")
-    print(f"Cache enabled: ✓ (24 hour expiry)")
+    print(f"Cache enabled: ✓ (per-namespace expiry, {CACHE_STORAGE} storage, {CACHE_MAX_BYTES // (1024 * 1024)} MB budget)")
     print(f"Starting Flask server...")
     print("=" * 60)
 
@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, request, session, flash, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime, timedelta
-import requests
 import os
 from database import db, User, UserPreferences
+from google_oidc import GoogleOIDC, LoginTiming
+from http_clients import UpstreamClient
+from password_hashing import PasswordHashingBusy
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -12,6 +14,20 @@ GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
+# Keep-alive connections to Google's discovery, token, JWKS and userinfo endpoints
+google_http = UpstreamClient('google', pool_size=4)
+
+# Discovery document and signing keys, cached for as long as Google's Cache-Control allows
+google_oidc = GoogleOIDC(google_http, GOOGLE_DISCOVERY_URL, GOOGLE_CLIENT_ID)
+
+@auth_bp.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(e):
+    """Too many logins/signups hashing at once: turn this one away instead of queueing it"""
+    flash('❌ Too many sign-in attempts right now, please try again in a moment', 'error')
+    google_oauth_enabled = bool(GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET)
+    response = render_template('auth/login.html', google_oauth_enabled=google_oauth_enabled)
+    return response, 503, {'Retry-After': str(e.retry_after)}
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Login page"""
@@ -25,6 +41,14 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if user and user.check_password(password):
+            # Hash parameters changed since this password was set: upgrade it while we have it.
+            # needs_rehash() may hash too (once, to learn the configured prefix), so it can be busy as well.
+            try:
+                if user.password_needs_rehash():
+                    user.set_password(password)
+                    db.session.commit()
+            except PasswordHashingBusy:
+                pass  # Next login will do it
             login_user(user)
             flash('✅ Logged in successfully!', 'success')
             return redirect(url_for('dashboard'))
@@ -153,8 +177,9 @@ def google_login():
         return redirect(url_for('auth.login'))
     
     try:
-        google_config = requests.get(GOOGLE_DISCOVERY_URL).json()
-        authorization_endpoint = google_config["authorization_endpoint"]
+        timing = LoginTiming()
+        with timing.step('discovery'):
+            authorization_endpoint = google_oidc.config(timing)["authorization_endpoint"]
         
         # Determine redirect URI based on environment
         if request.host.startswith('localhost') or request.host.startswith('127.0.0.1'):
@@ -176,7 +201,7 @@ def google_login():
             f"&access_type=offline"
         )
         
-        print(f"🔗 Redirecting to Google...")
+        print(f"🔗 Redirecting to Google... ({timing.summary()})")
         return redirect(request_uri)
         
     except Exception as e:
@@ -218,7 +243,9 @@ def google_callback():
     
     try:
         # Get token from Google
-        google_config = requests.get(GOOGLE_DISCOVERY_URL).json()
+        timing = LoginTiming()
+        with timing.step('discovery'):
+            google_config = google_oidc.config(timing)
         token_endpoint = google_config["token_endpoint"]
         
         # Determine redirect URI based on environment (same logic as in google_login)
@@ -237,7 +264,8 @@ def google_callback():
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_endpoint, data=token_data)
+        with timing.step('token', upstream=1):
+            response = google_http.post(token_endpoint, data=token_data)
         
         # Check if token request was successful
         if response.status_code != 200:
@@ -262,19 +290,24 @@ def google_callback():
             flash('❌ Google login failed. Please use email/password login.', 'error')
             return redirect(url_for('auth.login'))
         
-        # Get user info from Google
-        userinfo_endpoint = google_config["userinfo_endpoint"]
-        userinfo_response = requests.get(
-            userinfo_endpoint,
-            headers={"Authorization": f"Bearer {tokens['access_token']}"}
-        )
-        
-        if userinfo_response.status_code != 200:
-            print(f"Google OAuth UserInfo Error: Status {userinfo_response.status_code}")
-            flash('❌ Failed to get user information from Google. Please use email/password login.', 'error')
-            return redirect(url_for('auth.login'))
-        
-        userinfo = userinfo_response.json()
+        # Get user info from the ID token, verified against Google's cached signing keys
+        if 'id_token' in tokens:
+            with timing.step('verify id_token'):
+                userinfo = google_oidc.verify_id_token(tokens['id_token'], timing)
+        else:
+            # No ID token (shouldn't happen with the openid scope): ask the userinfo endpoint
+            with timing.step('userinfo', upstream=1):
+                userinfo_response = google_http.get(
+                    google_config["userinfo_endpoint"],
+                    headers={"Authorization": f"Bearer {tokens['access_token']}"}
+                )
+
+            if userinfo_response.status_code != 200:
+                print(f"Google OAuth UserInfo Error: Status {userinfo_response.status_code}")
+                flash('❌ Failed to get user information from Google. Please use email/password login.', 'error')
+                return redirect(url_for('auth.login'))
+
+            userinfo = userinfo_response.json()
         print(f"✓ Got user info for: {userinfo.get('email')}")
         
         # Check if user exists
@@ -308,7 +341,7 @@ def google_callback():
         
         # Login user
         login_user(user)
-        print(f"✓ User logged in: {user.email}")
+        print(f"✓ User logged in: {user.email} ({timing.summary()})")
         flash(f'✅ Welcome, {user.username}!', 'success')
         return redirect(url_for('dashboard'))
     
@@ -0,0 +1,67 @@
+"""Memory and filter cost of a live aircraft snapshot: list of dicts vs AircraftColumns.
+
+Usage: python benchmarks/aircraft_snapshot_memory.py [aircraft]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aircraft_columns import AircraftColumns
+from opensky_parser import parse_states
+
+COUNTRIES = ['United States', 'Germany', 'United Kingdom', 'France', 'China', 'Canada', 'Spain', 'Ireland']
+
+def synthetic_states(count):
+    """State vectors shaped like an OpenSky states/all response"""
+    rng = random.Random(42)
+    states = []
+    for i in range(count):
+        states.append([
+            f"{rng.randrange(16 ** 6):06x}", f"{rng.choice(['DAL', 'UAL', 'BAW', 'DLH'])}{i % 9999:<5}",
+            rng.choice(COUNTRIES), 1700000000, 1700000000,
+            rng.uniform(-180, 180), rng.uniform(-85, 85), rng.uniform(0, 12000), rng.random() < 0.1,
+            rng.uniform(0, 280), rng.uniform(0, 360), rng.uniform(-20, 20), None,
+            rng.uniform(0, 12000), None, False, 0
+        ])
+    return states
+
+def measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 12000
+    states = synthetic_states(count)
+    bbox = {'lamin': 35.0, 'lomin': -10.0, 'lamax': 60.0, 'lomax': 30.0}
+
+    dicts, dict_bytes, dict_build = measure(lambda: parse_states(states))
+    columns, column_bytes, column_build = measure(lambda: AircraftColumns.from_states(states))
+
+    started = time.perf_counter()
+    for _ in range(20):
+        matches = [a for a in dicts if bbox['lamin'] <= a['latitude'] <= bbox['lamax']
+                   and bbox['lomin'] <= a['longitude'] <= bbox['lomax']]
+    dict_filter = (time.perf_counter() - started) / 20
+
+    started = time.perf_counter()
+    for _ in range(20):
+        rows = columns.filter(**bbox)
+    column_filter = (time.perf_counter() - started) / 20
+    assert len(rows) == len(matches)
+
+    print(f"Live aircraft snapshot, {len(columns)} aircraft")
+    print(f"{'representation':<16}{'memory MB':>12}{'bytes/ac':>10}{'build ms':>10}{'bbox ms':>10}")
+    print(f"{'list of dicts':<16}{dict_bytes / 1e6:>12.2f}{dict_bytes / count:>10.0f}{dict_build * 1000:>10.1f}{dict_filter * 1000:>10.2f}")
+    print(f"{'columns':<16}{column_bytes / 1e6:>12.2f}{column_bytes / count:>10.0f}{column_build * 1000:>10.1f}{column_filter * 1000:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Bounding-box query latency vs. aircraft count: GridIndex vs. a column scan.
+
+Usage: python benchmarks/bbox_query_latency.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aircraft_columns import AircraftColumns
+from benchmarks.aircraft_snapshot_memory import synthetic_states
+from spatial_index import GridIndex
+
+BOXES = {
+    'city (2x2 deg)': (40.0, -75.0, 42.0, -73.0),
+    'country (10x15)': (45.0, -5.0, 55.0, 10.0),
+    'continent (40x60)': (30.0, -20.0, 70.0, 40.0),
+    'antimeridian': (-50.0, 170.0, 10.0, -170.0),
+}
+
+def timed(fn, repeat=50):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+def main():
+    print(f"{'aircraft':>9}  {'box':<20}{'matches':>8}{'build ms':>10}{'grid ms':>10}{'scan ms':>10}")
+    for count in (1000, 5000, 10000, 20000):
+        columns = AircraftColumns.from_states(synthetic_states(count))
+        build, index = timed(lambda: GridIndex.for_columns(columns), repeat=5)
+        for name, (lamin, lomin, lamax, lomax) in BOXES.items():
+            grid, rows = timed(lambda: index.query(lamin, lomin, lamax, lomax))
+            scan, expected = timed(lambda: columns.filter(lamin=lamin, lomin=lomin, lamax=lamax, lomax=lomax), repeat=5)
+            assert sorted(rows) == sorted(expected)
+            print(f"{count:>9}  {name:<20}{len(rows):>8}{build * 1000:>10.2f}{grid * 1000:>10.3f}{scan * 1000:>10.3f}")
+
+if __name__ == '__main__':
+    main()
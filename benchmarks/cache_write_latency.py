@@ -0,0 +1,44 @@
+"""Cache write latency as the cache grows, for each CacheManager storage mode.
+
+Usage: python benchmarks/cache_write_latency.py [entries] [entry_kb]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_manager import CacheManager
+
+def measure(storage, total_entries, entry_kb, checkpoints):
+    payload = {'data': ['x' * 64] * (entry_kb * 1024 // 70)}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheManager(cache_file=os.path.join(tmp, 'api_cache.json'), storage=storage)
+        results = []
+        window = []
+        for i in range(1, total_entries + 1):
+            start = time.perf_counter()
+            cache.set(f"bench_{i}", payload)
+            window.append(time.perf_counter() - start)
+            if i in checkpoints:
+                window.sort()
+                results.append((i, sum(window) / len(window), window[int(len(window) * 0.99) - 1]))
+                window = []
+        cache.close()
+    return results
+
+def main():
+    total_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    entry_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    checkpoints = {n for n in (10, 100, 250, 500, 1000, 2000, 5000, 10000) if n <= total_entries}
+    checkpoints.add(total_entries)
+
+    print(f"Cache write latency ({entry_kb} KB entries)")
+    print(f"{'storage':<10}{'entries':>10}{'mean ms':>12}{'p99 ms':>12}")
+    for storage in ('json', 'journal'):
+        for entries, mean, p99 in measure(storage, total_entries, entry_kb, checkpoints):
+            print(f"{storage:<10}{entries:>10}{mean * 1000:>12.3f}{p99 * 1000:>12.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""/api/flights latency and SQLite write lock contention with inline vs write-behind history inserts.
+
+Many logged-in users search concurrently through the Flask test client with
+the aviationstack call stubbed out, so what is left is the request itself
+and its search history write. Meanwhile a bystander thread makes a small
+write transaction every 10ms, like the other writers of instance/flighthub.db
+(logins, preferences, the flight store); its latency is how long the
+database-wide write lock keeps others waiting. Creates throwaway users in
+instance/flighthub.db and deletes them and their history afterwards.
+
+Usage: python benchmarks/history_write_behind.py [users] [searches_per_user]
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['OPENSKY_INGEST'] = 'false'
+
+from sqlalchemy import event, text
+
+import app as flighthub
+from benchmarks.search_history_storage import synthetic_response
+from database import db, User, SearchHistory
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+
+def run(app, user_ids, searches):
+    latencies, errors = [], []
+    bystander = []
+    done = threading.Event()
+
+    def search(user_id, worker):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        for i in range(searches):
+            started = time.perf_counter()
+            status = client.get(f"/api/flights?dep_iata=B{worker % 20:02d}&flight_status=s{i % 5}").status_code
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+
+    def bystand():
+        with app.app_context():
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    db.session.execute(text("UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE id = :id"),
+                                       {'id': user_ids[0]})
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    errors.append('bystander')
+                bystander.append(time.perf_counter() - started)
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=search, args=(user_id, i)) for i, user_id in enumerate(user_ids)]
+    watcher = threading.Thread(target=bystand)
+    watcher.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    flighthub.history_writer.flush(timeout=60)
+    done.set()
+    watcher.join()
+    return latencies, errors, bystander, elapsed
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    searches = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    app = flighthub.app
+
+    rng = random.Random(7)
+    responses = [synthetic_response(rng, 50) for _ in range(100)]
+    # Upstream answers come straight from memory: only the history write is left
+    flighthub.flight_store.answer = lambda filters, limit: None
+    flighthub.flight_store.ingest = lambda filters, response, limit: 0
+    flighthub.make_api_request = lambda endpoint, params, api_source: responses[hash(str(params)) % len(responses)]
+
+    commits = [0]
+    with app.app_context():
+        @event.listens_for(db.engine, 'commit')
+        def count_commit(conn):
+            commits[0] += 1
+
+        tag = uuid.uuid4().hex[:8]
+        bench_users = [User(email=f'bench-{tag}-{i}@example.com', username=f'bench-{tag}-{i}') for i in range(users)]
+        db.session.add_all(bench_users)
+        db.session.commit()
+        user_ids = [user.id for user in bench_users]
+
+    writer = flighthub.history_writer
+    print(f"{users} concurrent users x {searches} /api/flights searches")
+    print(f"{'history insert':<16}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"{'commits':>9}{'bystander p50/p99/max ms':>28}")
+    try:
+        for label, flush_ms in (('inline', 0), ('write-behind', 200)):
+            writer.close()
+            writer.flush_ms = flush_ms
+            commits[0] = 0
+            latencies, errors, bystander, elapsed = run(app, user_ids, searches)
+            print(f"{label:<16}{len(latencies) / elapsed:8.0f}{percentile(latencies, 0.5):9.1f}"
+                  f"{percentile(latencies, 0.95):9.1f}{percentile(latencies, 0.99):9.1f}{len(errors):8d}"
+                  f"{commits[0] - len(bystander):9d}"
+                  f"{percentile(bystander, 0.5):12.1f} /{percentile(bystander, 0.99):6.1f} /"
+                  f"{max(bystander) * 1000:7.1f}")
+    finally:
+        writer.close()
+        with app.app_context():
+            SearchHistory.query.filter(SearchHistory.user_id.in_(user_ids)).delete()
+            User.query.filter(User.id.in_(user_ids)).delete()
+            db.session.commit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Login throughput and API latency while a burst of logins hashes passwords.
+
+Models one gthread worker: --threads request threads shared by closed-loop
+login clients (each verifying a password) and API clients (each encoding a
+small aircraft payload, about what /api/aircraft/live does on a cache hit).
+Compares verifying inline on the request thread with PasswordHasher's
+process pool and admission control.
+
+Usage: python benchmarks/login_throughput.py [--threads 8] [--logins 16] [--api 4] [--seconds 5] [--method scrypt]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from password_hashing import PasswordHasher, PasswordHashingBusy
+
+PAYLOAD = {'success': True, 'aircraft': [
+    {'icao24': f'{i:06x}', 'callsign': f'TST{i}', 'latitude': 51.0 + i / 1000, 'longitude': -0.5 + i / 1000,
+     'altitude': 10000, 'velocity': 230.5, 'heading': 90.0, 'on_ground': False}
+    for i in range(200)
+]}
+
+def run(label, hasher, pwhash, args):
+    worker = ThreadPoolExecutor(max_workers=args.threads)
+    stop = threading.Event()
+    logins, rejected, api_latencies = [0], [0], []
+    lock = threading.Lock()
+
+    def login():
+        try:
+            assert hasher.verify(pwhash, 'correct horse')
+            with lock:
+                logins[0] += 1
+            return True
+        except PasswordHashingBusy:
+            with lock:
+                rejected[0] += 1
+            return False
+
+    def login_client():
+        while not stop.is_set():
+            if not worker.submit(login).result():
+                time.sleep(0.1)  # Turned away with a 503, the login form retries a little later
+
+    def api_client():
+        while not stop.is_set():
+            started = time.perf_counter()
+            worker.submit(json.dumps, PAYLOAD).result()
+            with lock:
+                api_latencies.append(time.perf_counter() - started)
+
+    hasher.verify(pwhash, 'correct horse')  # Start the pool outside the measurement
+    clients = [threading.Thread(target=login_client) for _ in range(args.logins)]
+    clients += [threading.Thread(target=api_client) for _ in range(args.api)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    worker.shutdown()
+
+    api_latencies.sort()
+    p95 = api_latencies[int(len(api_latencies) * 0.95)] if api_latencies else 0
+    print(f"{label:<34} {logins[0] / elapsed:7.1f} logins/s  {rejected[0] / elapsed:8.1f} rejected/s  "
+          f"API {len(api_latencies) / elapsed:8.0f} req/s  p50 {statistics.median(api_latencies or [0]) * 1000:7.2f} ms  "
+          f"p95 {p95 * 1000:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=16)
+    parser.add_argument('--api', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--method', default='scrypt')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-pending', type=int, default=4)
+    args = parser.parse_args()
+
+    pwhash = generate_password_hash('correct horse', args.method)
+    print(f"{args.method} hashes, {args.threads} request threads, {args.logins} login clients, "
+          f"{args.api} API clients, {os.cpu_count()} CPUs")
+
+    baseline = PasswordHasher(args.method, workers=0)
+    args_no_logins = argparse.Namespace(**dict(vars(args), logins=0))
+    run('API only', baseline, pwhash, args_no_logins)
+    run('inline hashing', baseline, pwhash, args)
+    pooled = PasswordHasher(args.method, workers=args.workers, max_pending=args.max_pending)
+    run(f'pool x{args.workers}, max {args.max_pending} pending', pooled, pwhash, args)
+    pooled.shutdown()
+
+if __name__ == '__main__':
+    main()
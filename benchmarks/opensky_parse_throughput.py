@@ -0,0 +1,57 @@
+"""OpenSky states/all parse throughput and peak memory: json.loads vs StateStream.
+
+Usage: python benchmarks/opensky_parse_throughput.py [aircraft]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aircraft_columns import AircraftColumns
+from benchmarks.aircraft_snapshot_memory import synthetic_states
+from opensky_parser import StateStream
+
+CHUNK_SIZE = 65536
+
+def chunks(body):
+    """The body as requests' iter_content() would hand it over"""
+    for i in range(0, len(body), CHUNK_SIZE):
+        yield body[i:i + CHUNK_SIZE]
+
+def full_json(body):
+    """The old path: join the body, json.loads it, then build the columns"""
+    data = json.loads(b''.join(chunks(body)))
+    return AircraftColumns.from_states(data['states'])
+
+def streamed(body):
+    return AircraftColumns.from_states(StateStream(chunks(body)))
+
+def measure(parse, body, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(body)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 12000
+    states = synthetic_states(count)
+    body = json.dumps({'time': 1700000000, 'states': states}).encode('utf-8')
+    print(f"{count} states, {len(body) / 1e6:.1f} MB body\n")
+    print(f"{'parser':<14}{'states/s':>12}{'ms':>10}{'peak MB':>10}")
+    for name, parse in (('json.loads', full_json), ('StateStream', streamed)):
+        columns, elapsed, peak = measure(parse, body)
+        assert len(columns) == count
+        print(f"{name:<14}{count / elapsed:>12,.0f}{elapsed * 1000:>10.1f}{peak / 1e6:>10.1f}")
+
+if __name__ == '__main__':
+    main()
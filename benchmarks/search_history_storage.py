@@ -0,0 +1,174 @@
+"""Size and throughput of SearchHistory results stored inline vs in deduplicated result_blobs.
+
+Searches repeat with Zipf-like popularity over ``distinct`` different
+aviationstack-shaped responses. Inline rows are written for a sample (a
+million inline rows would take tens of GB) and their size is extrapolated;
+the sample is then migrated with result_blobs.migrate(). The blob layout is
+written through result_blobs.store() for the same sample and bulk-filled to
+the full row count, its refcount triggers firing for every row.
+
+Usage: python benchmarks/search_history_storage.py [rows] [distinct] [flights_per_result] [sample]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, text
+
+import result_blobs
+from database import db, SearchHistory
+
+AIRPORTS = ['JFK', 'LHR', 'CDG', 'FRA', 'DXB', 'SIN', 'HND', 'LAX', 'ORD', 'AMS', 'MAD', 'IST']
+AIRLINES = [('British Airways', 'BA', 'BAW'), ('Lufthansa', 'LH', 'DLH'), ('Delta Air Lines', 'DL', 'DAL'),
+            ('Emirates', 'EK', 'UAE'), ('Air France', 'AF', 'AFR'), ('KLM', 'KL', 'KLM')]
+BATCH = 500
+
+def synthetic_response(rng, flights):
+    """An aviationstack /flights response"""
+    day = f"2026-10-{rng.randint(1, 28):02d}"
+    data = []
+    for _ in range(flights):
+        name, iata, icao = rng.choice(AIRLINES)
+        number = rng.randint(1, 9999)
+        dep, arr = rng.sample(AIRPORTS, 2)
+        scheduled = f"{day}T{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}:00+00:00"
+        data.append({
+            'flight_date': day,
+            'flight_status': rng.choice(['scheduled', 'active', 'landed', 'cancelled']),
+            'departure': {'airport': f"{dep} International", 'timezone': 'Europe/London', 'iata': dep,
+                          'icao': f"K{dep}", 'terminal': str(rng.randint(1, 5)), 'gate': f"B{rng.randint(1, 60)}",
+                          'delay': rng.choice([None, 5, 12, 40]), 'scheduled': scheduled, 'estimated': scheduled,
+                          'actual': None, 'estimated_runway': None, 'actual_runway': None},
+            'arrival': {'airport': f"{arr} International", 'timezone': 'America/New_York', 'iata': arr,
+                        'icao': f"K{arr}", 'terminal': str(rng.randint(1, 5)), 'gate': None,
+                        'baggage': str(rng.randint(1, 12)), 'delay': None, 'scheduled': scheduled,
+                        'estimated': scheduled, 'actual': None, 'estimated_runway': None, 'actual_runway': None},
+            'airline': {'name': name, 'iata': iata, 'icao': icao},
+            'flight': {'number': str(number), 'iata': f"{iata}{number}", 'icao': f"{icao}{number}",
+                       'codeshared': None},
+            'aircraft': None,
+            'live': None
+        })
+    return {'pagination': {'limit': 100, 'offset': 0, 'count': flights, 'total': flights}, 'data': data}
+
+def popularity(rng, distinct, rows):
+    """Which response each search got: response i is picked with weight 1 / (i + 1)"""
+    weights = [1 / (i + 1) for i in range(distinct)]
+    return rng.choices(range(distinct), weights=weights, k=rows)
+
+def history_row(i, users, started):
+    return {'user_id': i % users + 1, 'search_type': 'flight', 'search_query': f"From: {AIRPORTS[i % 12]}",
+            'timestamp': started + timedelta(seconds=i)}
+
+def database(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        result_blobs.ensure_schema()
+    return app
+
+def file_mb(path):
+    return os.path.getsize(path) / 1e6
+
+def write_sample(app, picks, responses, users, inline):
+    """Insert the sample through the ORM like get_flights does, committing every BATCH rows. Returns rows/s."""
+    started = datetime(2026, 1, 1)
+    with app.app_context():
+        begin = time.perf_counter()
+        for i, pick in enumerate(picks):
+            row = history_row(i, users, started)
+            if inline:
+                row['results'] = responses[pick]
+            else:
+                row['result_hash'] = result_blobs.store(responses[pick])
+            db.session.add(SearchHistory(**row))
+            if i % BATCH == BATCH - 1:
+                db.session.commit()
+        db.session.commit()
+        return len(picks) / (time.perf_counter() - begin)
+
+def read_latency(app, users):
+    """Mean ms to load and serialize one user's 50 latest history rows, like /api/history"""
+    with app.app_context():
+        begin = time.perf_counter()
+        for user_id in range(1, users + 1):
+            history = (SearchHistory.query.filter_by(user_id=user_id)
+                       .order_by(SearchHistory.timestamp.desc()).limit(50).all())
+            [h.to_dict() for h in history]
+            db.session.expunge_all()
+        return (time.perf_counter() - begin) / users * 1000
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    flights = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    sample = min(int(sys.argv[4]) if len(sys.argv) > 4 else 20000, rows)
+    users = max(1, sample // 100)  # Every user has a full 50-row history page in the sample
+
+    rng = random.Random(42)
+    responses = [synthetic_response(rng, flights) for _ in range(distinct)]
+    picks = popularity(rng, distinct, rows)
+    raw_mb = sum(len(result_blobs.canonical(responses[pick])) for pick in picks[:sample]) / 1e6 * rows / sample
+    print(f"{rows} history rows, {distinct} distinct responses of {flights} flights, "
+          f"{raw_mb / rows * 1e6 / 1024:.1f} KB of JSON per row")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inline_path = os.path.join(tmp, 'inline.db')
+        inline_app = database(inline_path)
+        inline_rate = write_sample(inline_app, picks[:sample], responses, users, inline=True)
+        inline_mb = file_mb(inline_path)
+        inline_read = read_latency(inline_app, users)
+        print(f"\nInline results ({sample} rows written, {rows} extrapolated)")
+        print(f"  insert        {inline_rate:10.0f} rows/s")
+        print(f"  database      {inline_mb:10.1f} MB  ({inline_mb / sample * 1e6:.0f} bytes/row)"
+              f"  -> {inline_mb * rows / sample / 1000:.1f} GB for {rows} rows")
+        print(f"  read history  {inline_read:10.2f} ms per user page")
+
+        with inline_app.app_context():
+            begin = time.perf_counter()
+            migrated = sum(moved for moved, skipped in result_blobs.migrate(batch_size=1000))
+            migrate_rate = migrated / (time.perf_counter() - begin)
+            db.session.execute(text('VACUUM'))
+            db.session.commit()
+        print("\nMigration of the inline sample")
+        print(f"  migrate       {migrate_rate:10.0f} rows/s")
+        print(f"  database      {file_mb(inline_path):10.1f} MB after VACUUM")
+
+        blob_path = os.path.join(tmp, 'blobs.db')
+        blob_app = database(blob_path)
+        blob_rate = write_sample(blob_app, picks[:sample], responses, users, inline=False)
+        with blob_app.app_context():
+            # The rest goes in bulk, with the hash computed once per distinct response
+            hashes = [result_blobs.store(response) for response in responses]
+            started = datetime(2026, 1, 1)
+            begin = time.perf_counter()
+            for first in range(sample, rows, 10000):
+                db.session.execute(insert(SearchHistory), [
+                    dict(history_row(i, users, started), result_hash=hashes[picks[i]])
+                    for i in range(first, min(first + 10000, rows))
+                ])
+                db.session.commit()
+            bulk_rate = (rows - sample) / (time.perf_counter() - begin) if rows > sample else 0
+            result_blobs.collect(min_age_seconds=0)  # Responses no search picked
+            stats = result_blobs.stats()
+        blob_mb = file_mb(blob_path)
+        blob_read = read_latency(blob_app, users)
+        print(f"\nresult_blobs ({rows} rows written)")
+        print(f"  insert        {blob_rate:10.0f} rows/s through store() + ORM")
+        print(f"  bulk insert   {bulk_rate:10.0f} rows/s with refcount triggers")
+        print(f"  blobs         {stats['blobs']:10d}  ({stats['raw_bytes'] / 1e6:.1f} MB of JSON in "
+              f"{stats['stored_bytes'] / 1e6:.1f} MB compressed, {stats['references']} references)")
+        print(f"  database      {blob_mb:10.1f} MB  ({blob_mb / rows * 1e6:.0f} bytes/row)")
+        print(f"  read history  {blob_read:10.2f} ms per user page")
+        print(f"\n{inline_mb * rows / sample / blob_mb:.0f}x smaller than inline results")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Upstream call latency against a local stub server: a new connection per call
+(module-level requests.get) vs a pooled UpstreamClient, and sequential vs fan-out.
+
+The stub adds --handshake-ms to every new connection (standing in for the TCP
+and TLS round trips to a remote API) and --latency-ms to every response. With
+--tls it also serves real TLS from a throwaway self-signed certificate
+(needs the openssl command).
+
+Usage: python benchmarks/upstream_connection_reuse.py [--calls 200] [--handshake-ms 30] [--latency-ms 20] [--fan-out 8] [--tls]
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from http_clients import UpstreamClient, fan_out
+
+BODY = b'{"name": "London", "main": {"temp": 11.2, "humidity": 81}, "wind": {"speed": 4.1}}'
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handshake, latency, certfile=None):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.handshake = handshake
+        self.latency = latency
+        self.connections = 0
+        self.lock = threading.Lock()
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+    wbufsize = 65536  # Headers and body in one send, or Nagle + delayed ACK stall every keep-alive response
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        if isinstance(self.connection, ssl.SSLSocket):
+            self.connection.do_handshake()
+        time.sleep(self.server.handshake)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+def self_signed_cert(directory):
+    path = os.path.join(directory, 'stub.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=127.0.0.1', '-keyout', path, '-out', path],
+        check=True, capture_output=True
+    )
+    return path
+
+def run(label, server, calls):
+    server.connections = 0
+    started = time.perf_counter()
+    calls()
+    elapsed = time.perf_counter() - started
+    return label, elapsed, server.connections
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--handshake-ms', type=float, default=30)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--fan-out', type=int, default=8)
+    parser.add_argument('--tls', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile = self_signed_cert(tmp) if args.tls else None
+        server = StubServer(args.handshake_ms / 1000, args.latency_ms / 1000, certfile)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        scheme = 'https' if args.tls else 'http'
+        url = f"{scheme}://127.0.0.1:{server.server_address[1]}/weather"
+        warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+        client = UpstreamClient('stub', pool_size=args.fan_out)
+        executor = ThreadPoolExecutor(max_workers=args.fan_out)
+
+        def fresh():
+            for _ in range(args.calls):
+                requests.get(url, timeout=10, verify=False).json()
+
+        def pooled():
+            for _ in range(args.calls):
+                client.get(url, verify=False).json()
+
+        def fanned():
+            for i in range(0, args.calls, args.fan_out):
+                batch = min(args.fan_out, args.calls - i)
+                fan_out([lambda: client.get(url, verify=False).json()] * batch, executor)
+
+        pooled()  # Warm the pool so it holds --fan-out open connections
+        fanned()
+        results = [
+            run('requests.get per call', server, fresh),
+            run('pooled UpstreamClient', server, pooled),
+            run(f'pooled + fan_out x{args.fan_out}', server, fanned),
+        ]
+        server.shutdown()
+        executor.shutdown()
+
+    print(f"{args.calls} calls to a {'TLS ' if args.tls else ''}stub, "
+          f"{args.handshake_ms:.0f} ms per new connection, {args.latency_ms:.0f} ms per response")
+    baseline = results[0][1]
+    for label, elapsed, connections in results:
+        print(f"{label:<28} {elapsed * 1000:8.0f} ms total  {elapsed / args.calls * 1000:6.1f} ms/call  "
+              f"{connections:4d} connections  {baseline / elapsed:5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Requests/s of authenticated /api/aircraft/live polls with and without the user identity cache.
+
+Polls with since=<current version> (the empty delta every open map tab asks
+for between snapshots) through the Flask test client, so what is left is
+mostly session, user loader and routing cost. Creates a throwaway user in
+instance/flighthub.db and deletes it afterwards.
+
+Usage: python benchmarks/user_loader_requests.py [requests]
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['OPENSKY_INGEST'] = 'false'  # The snapshot below is published by hand
+
+from sqlalchemy import event
+
+import app as flighthub
+from aircraft_columns import AircraftColumns
+from benchmarks.aircraft_snapshot_memory import synthetic_states
+from database import db, User
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = flighthub.app
+    ingestor = flighthub.opensky_ingestor
+    ingestor.publish(AircraftColumns.from_states(synthetic_states(10000)), int(time.time()))
+    url = f"/api/aircraft/live?since={ingestor.snapshot().version}"
+
+    queries = [0]
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*args):
+            queries[0] += 1
+
+        tag = uuid.uuid4().hex[:8]
+        user = User(email=f'bench-{tag}@example.com', username=f'bench-{tag}')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        print(f"{requests} GET {url.split('?')[0]}?since=<version> polls")
+        for label, ttl in (('User.query.get per request', 0), ('identity cache', 60)):
+            flighthub.user_identities.ttl_seconds = ttl
+            flighthub.user_identities.clear()
+            assert client.get(url).status_code == 200
+            queries[0] = 0
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.get(url)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<28} {requests / elapsed:8.0f} req/s  {elapsed / requests * 1e6:7.0f} us/req  "
+                  f"{queries[0] / requests:5.2f} SQL queries/req")
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+
+if __name__ == '__main__':
+    main()
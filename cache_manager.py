@@ -1,16 +1,364 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, use one process per cache file
+    fcntl = None
+
+class JSONFileStore:
+    """Persists the whole cache as a single JSON document (rewritten on every write)"""
+    
+    shared = False
+    
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+    
+    def load(self):
+        """Load cache from file"""
+        return _read_json_file(self.cache_file)
+    
+    def attach(self, get_cache, lock):
+        """Nothing to schedule for the plain JSON store"""
+        pass
+    
+    def write_entry(self, cache, key, retention):
+        """Persist a new or updated entry"""
+        self._save(cache)
+    
+    def delete_entries(self, cache, keys):
+        """Persist the removal of entries"""
+        self._save(cache)
+    
+    def sweep(self):
+        """Expiry is driven by the manager's in-memory table"""
+        return 0
+    
+    def clear(self):
+        """Persist an empty cache"""
+        self._save({})
+    
+    def close(self):
+        pass
+    
+    def _save(self, cache):
+        # Written aside and renamed, so workers sharing the file never interleave (the last one wins)
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+class JournalStore:
+    """Persists the cache as a snapshot plus an append-only journal of set/delete records.
+    
+    A write only appends one line sized like the entry itself. A background thread
+    folds the journal back into the snapshot once it outgrows it, using an atomic
+    rename so a crash at any point leaves a loadable snapshot + journal pair.
+    
+    Every gunicorn worker appends to the same journal, each keeping its own
+    in-memory table. Appends hold a shared flock on ``{cache_file}.lock`` and
+    rotating the journal an exclusive one, so no record lands in a journal
+    that was already rotated away; a writer reopens the journal when it finds
+    it rotated. The snapshot is rebuilt from the files, not from one worker's
+    table, and only one worker compacts at a time.
+    """
+    
+    shared = False
+    
+    def __init__(self, cache_file, compact_min_bytes=4 * 1024 * 1024, compact_interval=30, fsync=False):
+        self.cache_file = cache_file
+        self.journal_file = f"{cache_file}.journal"
+        self.compacting_file = f"{cache_file}.journal.compacting"
+        self.lock_file = f"{cache_file}.lock"
+        self.compact_lock_file = f"{cache_file}.compact.lock"
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_interval = compact_interval
+        self.fsync = fsync
+        self._journal = None
+        self._lock_fd = None
+        self._compact_lock_fd = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+        self._get_cache = None
+        self._lock = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def load(self):
+        """Load the snapshot and replay any journal records written after it"""
+        cache = _read_json_file(self.cache_file)
+        if os.path.exists(self.cache_file):
+            self._snapshot_bytes = os.path.getsize(self.cache_file)
+        
+        # A leftover compacting journal means we crashed mid-compaction; replaying it
+        # on top of either the old or the new snapshot yields the same state.
+        for path in (self.compacting_file, self.journal_file):
+            self._replay(path, cache)
+        
+        self._open_lock_files()
+        with self._flock(self._lock_fd, fcntl and fcntl.LOCK_EX):
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal_bytes = self._journal.tell()
+            if self._journal_bytes and not self._ends_with_newline(self.journal_file):
+                # Terminate a torn record so the next append starts on its own line
+                self._journal.write('\n')
+                self._journal.flush()
+                self._journal_bytes += 1
+        return cache
+    
+    def attach(self, get_cache, lock):
+        """Start background compaction over the manager's live cache"""
+        self._get_cache = get_cache
+        self._lock = lock
+        self._start_compactor()
+        if hasattr(os, 'register_at_fork'):
+            # Threads do not survive fork (gunicorn --preload), restart in each worker
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def write_entry(self, cache, key, retention):
+        """Append a set record for one entry, returning the bytes written"""
+        return self._append({'op': 'set', 'key': key, 'entry': cache[key]})
+    
+    def delete_entries(self, cache, keys):
+        """Append a delete record per entry"""
+        for key in keys:
+            self._append({'op': 'del', 'key': key})
+    
+    def sweep(self):
+        """Expiry is driven by the manager's in-memory table"""
+        return 0
+    
+    def clear(self):
+        """Append a clear record"""
+        self._append({'op': 'clear'})
+    
+    def needs_compaction(self):
+        """Journal (with every worker's records) has grown past the snapshot it would be folded into"""
+        return self._journal_bytes > max(self.compact_min_bytes, self._snapshot_bytes)
+    
+    def compact(self):
+        """Fold the journal into a fresh snapshot, False if another worker is already compacting.
+        
+        Must be called without holding the cache lock; it is taken only long
+        enough to rotate the journal file.
+        """
+        with self._flock(self._compact_lock_fd, fcntl and fcntl.LOCK_EX | fcntl.LOCK_NB) as locked:
+            if not locked:
+                return False
+            # A compacting journal left by a crash is folded as is, the new one waits for the next run
+            if not os.path.exists(self.compacting_file):
+                with self._lock, self._flock(self._lock_fd, fcntl and fcntl.LOCK_EX):
+                    self._reopen_if_rotated()
+                    self._journal.close()
+                    os.replace(self.journal_file, self.compacting_file)
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                    self._journal_bytes = 0
+            
+            entries = _read_json_file(self.cache_file)
+            self._replay(self.compacting_file, entries)
+            tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.cache_file)
+            os.remove(self.compacting_file)
+            self._snapshot_bytes = os.path.getsize(self.cache_file)
+            return True
+    
+    def close(self):
+        """Stop the compactor and close the journal"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for name in ('_journal', '_lock_fd', '_compact_lock_fd'):
+            f = getattr(self, name)
+            if f is not None:
+                f.close()
+                setattr(self, name, None)
+    
+    def _start_compactor(self):
+        if self.compact_interval and self._thread is None and not self._stopped.is_set():
+            self._thread = threading.Thread(target=self._compact_loop, name='cache-journal-compactor', daemon=True)
+            self._thread.start()
+    
+    def _after_fork(self):
+        # flock is held per open file: the child needs its own to be locked out by its siblings
+        if self._lock_fd is not None:
+            self._lock_fd.close()
+            self._compact_lock_fd.close()
+            self._open_lock_files()
+        self._thread = None
+        self._start_compactor()
+    
+    def _open_lock_files(self):
+        self._lock_fd = open(self.lock_file, 'a')
+        self._compact_lock_fd = open(self.compact_lock_file, 'a')
+    
+    @staticmethod
+    @contextmanager
+    def _flock(f, operation):
+        """Hold flock ``operation`` on f; yields False if a LOCK_NB request was refused"""
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, operation)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _reopen_if_rotated(self):
+        """Follow another worker's compaction to the new journal file"""
+        try:
+            rotated = os.stat(self.journal_file).st_ino != os.fstat(self._journal.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self._journal.close()
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            if os.path.exists(self.cache_file):
+                self._snapshot_bytes = os.path.getsize(self.cache_file)
+    
+    def _append(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._flock(self._lock_fd, fcntl and fcntl.LOCK_SH):
+            self._reopen_if_rotated()
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            # Appending, so this is the end of the file: every worker's records count towards compaction
+            self._journal_bytes = self._journal.tell()
+        if self.needs_compaction():
+            self._wakeup.set()
+        return len(line)
+    
+    def _compact_loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if self.needs_compaction():
+                try:
+                    self.compact()
+                except OSError as e:
+                    print(f"⚠️  Cache journal compaction failed: {e}")
+    
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+    
+    @staticmethod
+    def _replay(path, cache):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-append
+                    continue
+                op = record.get('op')
+                if op == 'set':
+                    cache[record['key']] = record['entry']
+                elif op == 'del':
+                    cache.pop(record['key'], None)
+                elif op == 'clear':
+                    cache.clear()
+
+CACHE_STORES = {
+    'json': JSONFileStore,
+    'journal': JournalStore,
+}
+
+def _read_json_file(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+class CachePolicy:
+    """Freshness policy for a cache namespace
+    
+    Entries are fresh for ``ttl_seconds``. For ``max_stale_seconds`` after that they
+    are kept so callers can serve them stale while a refresh runs, then dropped.
+    """
+    
+    def __init__(self, ttl_seconds, max_stale_seconds=0):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_stale = timedelta(seconds=max_stale_seconds)
+        self.retention = self.ttl + self.max_stale
+
+EVICTION_STRATEGIES = ('lru', 'lfu')
+
 class CacheManager:
-    """Manages API response caching to minimize API calls"""
+    """Manages API response caching to minimize API calls
+    
+    Keys are matched against ``policies`` (fnmatch patterns, first match wins) to
+    pick a per-namespace TTL, falling back to ``expiry_hours``. When ``max_bytes``
+    is set, entries are evicted (least recently or least frequently used) to keep
+    the in-memory size of the cache under that budget.
+    
+    ``storage`` is either the name of a file store ('json', 'journal') or a store
+    instance. With file stores the in-memory table is the whole cache of the
+    process; the file only persists it across restarts. Shared stores (SQLiteStore, RedisStore in cache_stores) are
+    the source of truth for every worker and the in-memory table is just a
+    bounded local tier in front of them.
+    """
     
-    def __init__(self, cache_file='cache/api_cache.json', expiry_hours=24):
+    def __init__(self, cache_file='cache/api_cache.json', expiry_hours=24, storage='json',
+                 policies=None, max_bytes=None, eviction='lru', sweep_interval=60):
         self.cache_file = cache_file
         self.expiry_hours = expiry_hours
+        if isinstance(storage, str) and storage not in CACHE_STORES:
+            raise ValueError(f"Unknown cache storage: {storage}")
+        if eviction not in EVICTION_STRATEGIES:
+            raise ValueError(f"Unknown eviction strategy: {eviction}")
+        self.default_policy = CachePolicy(expiry_hours * 3600)
+        self.policies = [
+            (pattern, policy if isinstance(policy, CachePolicy) else CachePolicy(policy))
+            for pattern, policy in (policies or {}).items()
+        ]
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.sweep_interval = sweep_interval
+        self.total_bytes = 0
+        self.evictions = 0
+        self._sizes = {}
+        self._hits = {}
+        self._last_sweep = time.monotonic()
         self._ensure_cache_directory()
-        self.cache = self._load_cache()
+        self._lock = threading.RLock()
+        self.store = CACHE_STORES[storage](cache_file) if isinstance(storage, str) else storage
+        self.cache = OrderedDict(self.store.load())
+        self.store.attach(lambda: self.cache, self._lock)
+        with self._lock:
+            for key, value in self.cache.items():
+                self._account(key, _entry_size(value))
+            self.purge_expired()
+            self._evict_to_budget()
     
     def _ensure_cache_directory(self):
         """Create cache directory if it doesn't exist"""
@@ -18,59 +366,171 @@ class CacheManager:
         if cache_dir and not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
     
-    def _load_cache(self):
-        """Load cache from file"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
-    
-    def _save_cache(self):
-        """Save cache to file"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=2)
+    def policy_for(self, key):
+        """Return the CachePolicy governing a key"""
+        for pattern, policy in self.policies:
+            if fnmatchcase(key, pattern):
+                return policy
+        return self.default_policy
+    
+    @staticmethod
+    def _age(value, now=None):
+        return (now or datetime.now()) - datetime.fromisoformat(value['timestamp'])
+    
+    def _is_expired(self, key, value, now=None):
+        return self._age(value, now) >= self.policy_for(key).ttl
+    
+    def _is_retained(self, key, value, now=None):
+        return self._age(value, now) < self.policy_for(key).retention
     
     def get(self, key):
         """Get cached data if not expired"""
-        if key in self.cache:
-            cached_data = self.cache[key]
-            cached_time = datetime.fromisoformat(cached_data['timestamp'])
-            
-            # Check if cache is still valid
-            if datetime.now() - cached_time < timedelta(hours=self.expiry_hours):
-                return cached_data['data']
-            else:
-                # Cache expired, remove it
-                del self.cache[key]
-                self._save_cache()
+        found = self.lookup(key)
+        if found is not None and not found[2]:
+            return found[0]
         return None
     
+    def lookup(self, key):
+        """Get cached data even if stale.
+        
+        Returns ``(data, age_seconds, stale)`` for an entry that is fresh or still
+        within its namespace's max-stale window, otherwise None.
+        """
+        with self._lock:
+            now = datetime.now()
+            entry = self._local_entry(key, now)
+            if not self.store.shared or (entry is not None and not self._is_expired(key, entry, now)):
+                return self._found(key, entry, now)
+        
+        # Another worker may already hold a fresher copy (fetched without the lock, it may be network I/O)
+        shared_entry = self.store.get(key)
+        with self._lock:
+            entry = self._local_entry(key, now)
+            if shared_entry is not None and (entry is None or self._age(shared_entry, now) < self._age(entry, now)):
+                entry = self.cache[key] = shared_entry
+                self._account(key, _entry_size(shared_entry))
+            return self._found(key, entry, now)
+    
+    def _local_entry(self, key, now):
+        """The in-memory entry for key, dropping it once past its max-stale window"""
+        entry = self.cache.get(key)
+        if entry is not None and not self._is_retained(key, entry, now):
+            # Shared stores expire their own copy, which may be fresher than this one
+            self._remove([key], from_store=not self.store.shared)
+            return None
+        return entry
+    
+    def _found(self, key, entry, now):
+        if entry is None or not self._is_retained(key, entry, now):
+            return None
+        
+        self.cache.move_to_end(key)
+        self._hits[key] += 1
+        self._evict_to_budget()
+        age = self._age(entry, now)
+        return entry['data'], age.total_seconds(), age >= self.policy_for(key).ttl
+    
     def set(self, key, data):
         """Store data in cache"""
-        self.cache[key] = {
-            'data': data,
-            'timestamp': datetime.now().isoformat()
-        }
-        self._save_cache()
+        with self._lock:
+            self.cache[key] = {
+                'data': data,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.cache.move_to_end(key)
+            written = self.store.write_entry(self.cache, key, self.policy_for(key).retention)
+            self._account(key, written or _entry_size(self.cache[key]))
+            if self.max_bytes and self._sizes[key] > self.max_bytes:
+                # Larger than the whole budget, caching it would only flush everything else
+                self._remove([key], from_store=not self.store.shared)
+                return
+            
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self.purge_expired()
+            self._evict_to_budget()
     
     def clear(self):
         """Clear all cache"""
-        self.cache = {}
-        self._save_cache()
+        with self._lock:
+            self.cache = OrderedDict()
+            self._sizes = {}
+            self._hits = {}
+            self.total_bytes = 0
+            self.store.clear()
+    
+    def purge_expired(self):
+        """Drop every entry past its namespace TTL and max-stale window"""
+        with self._lock:
+            now = datetime.now()
+            expired = [key for key, value in self.cache.items() if not self._is_retained(key, value, now)]
+            if expired:
+                # Only the local copies: a shared store sweeps its own, and another worker may have refreshed them
+                self._remove(expired, from_store=not self.store.shared)
+            swept = self.store.sweep()
+            self._last_sweep = time.monotonic()
+            return len(expired) + swept
+    
+    def close(self):
+        """Flush and release the underlying store"""
+        self.store.close()
+    
+    def _account(self, key, size):
+        self.total_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self._hits.setdefault(key, 0)
+    
+    def _remove(self, keys, from_store=True):
+        for key in keys:
+            del self.cache[key]
+            self.total_bytes -= self._sizes.pop(key, 0)
+            self._hits.pop(key, None)
+        if from_store:
+            self.store.delete_entries(self.cache, keys)
+    
+    def _evict_to_budget(self):
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+        
+        # Evict down to 90% of the budget so a full cache doesn't evict on every set
+        target = self.max_bytes * 0.9
+        if self.eviction == 'lru':
+            candidates = iter(self.cache)
+        else:
+            # OrderedDict order breaks ties in favour of the least recently used
+            recency = {key: i for i, key in enumerate(self.cache)}
+            candidates = iter(sorted(self.cache, key=lambda k: (self._hits[k], recency[k])))
+        
+        victims = []
+        freed = 0
+        for key in candidates:
+            if self.total_bytes - freed <= target:
+                break
+            victims.append(key)
+            freed += self._sizes[key]
+        # Shared stores keep evicted entries for other workers, only the local copy goes
+        self._remove(victims, from_store=not self.store.shared)
+        self.evictions += len(victims)
     
     def get_cache_info(self):
         """Get information about cached items"""
         info = []
-        for key, value in self.cache.items():
+        with self._lock:
+            items = [(key, value, self._sizes.get(key, 0)) for key, value in self.cache.items()]
+        now = datetime.now()
+        for key, value, size in items:
             cached_time = datetime.fromisoformat(value['timestamp'])
-            age = datetime.now() - cached_time
+            age = now - cached_time
             info.append({
                 'key': key,
                 'cached_at': value['timestamp'],
                 'age_hours': age.total_seconds() / 3600,
-                'expired': age > timedelta(hours=self.expiry_hours)
+                'ttl_seconds': self.policy_for(key).ttl.total_seconds(),
+                'max_stale_seconds': self.policy_for(key).max_stale.total_seconds(),
+                'size_bytes': size,
+                'expired': self._is_expired(key, value, now)
             })
-        return info
\ No newline at end of file
+        return info
+
+def _entry_size(entry):
+    """Approximate footprint of an entry as its compact JSON encoding"""
+    return len(json.dumps(entry, separators=(',', ':')))
@@ -0,0 +1,344 @@
+import json
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from sqlalchemy import create_engine
+
+from database import APICache
+
+# Same text format SQLAlchemy uses for DateTime columns on SQLite, so rows stay
+# readable through the APICache model and sort correctly as strings.
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+def _to_utc(timestamp):
+    """Local ISO timestamp (as stored in cache entries) -> naive UTC datetime"""
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).replace(tzinfo=None)
+
+def _from_utc(value):
+    """Naive UTC datetime -> local ISO timestamp"""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None).isoformat()
+
+class _ConnectionPool:
+    """At most ``size`` connections, each used by one caller at a time.
+
+    Connections are checked out per operation rather than kept per thread:
+    under gevent workers every greenlet is a thread to threading.local(), so
+    per-thread connections would pile up with every request. A connection
+    that failed with OSError/ConnectionError is closed instead of returned.
+    """
+
+    def __init__(self, connect, size=8):
+        self.connect = connect
+        self.size = size
+        self._idle = []
+        self._open = 0
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def connection(self):
+        conn, generation = self._checkout()
+        try:
+            yield conn
+        except (OSError, ConnectionError):
+            self._release(conn, generation, broken=True)
+            raise
+        except BaseException:
+            self._release(conn, generation)
+            raise
+        self._release(conn, generation)
+
+    def _checkout(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._idle or self._open < self.size)
+            if self._idle:
+                return self._idle.pop(), self._generation
+            self._open += 1
+            generation = self._generation
+        try:
+            return self.connect(), generation
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn, generation, broken=False):
+        with self._cond:
+            current = generation == self._generation
+            if current:
+                if broken:
+                    self._open -= 1
+                else:
+                    self._idle.append(conn)
+                self._cond.notify()
+        if broken or not current:
+            try:
+                conn.close()
+            except (OSError, sqlite3.Error):
+                pass
+
+    def close(self):
+        """Close the idle connections; those in use are closed when they come back"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open = 0
+            self._generation += 1
+            self._cond.notify_all()
+        for conn in idle:
+            try:
+                conn.close()
+            except (OSError, sqlite3.Error):
+                pass
+
+class SQLiteStore:
+    """Cache store shared by every worker through the APICache table.
+
+    Uses its own pool of at most ``pool_size`` sqlite3 connections in WAL mode
+    so readers never block on a writer, upserts on the unique cache_key and
+    sweeps expired rows through the expires_at index.
+    """
+
+    shared = True
+
+    def __init__(self, db_path, busy_timeout_ms=5000, pool_size=8):
+        self.db_path = db_path
+        self.table = APICache.__tablename__
+        self.busy_timeout_ms = busy_timeout_ms
+        self._pool = _ConnectionPool(self._connect, pool_size)
+
+        # Create the table (and its indexes) from the model if the app hasn't yet
+        engine = create_engine(f'sqlite:///{db_path}')
+        APICache.__table__.create(bind=engine, checkfirst=True)
+        engine.dispose()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def load(self):
+        """Entries are read on demand, nothing to preload"""
+        return {}
+
+    def attach(self, get_cache, lock):
+        pass
+
+    def get(self, key):
+        """Fetch an unexpired entry, or None"""
+        now = datetime.utcnow().strftime(SQLITE_DATETIME_FORMAT)
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute(
+                    f"SELECT CAST(data AS TEXT), created_at FROM {self.table} WHERE cache_key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️  SQLite cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return {
+            'data': json.loads(row[0]) if row[0] is not None else None,
+            'timestamp': _from_utc(datetime.strptime(row[1], SQLITE_DATETIME_FORMAT))
+        }
+
+    def write_entry(self, cache, key, retention):
+        """Upsert one entry, returning the size of its payload"""
+        entry = cache[key]
+        payload = json.dumps(entry['data'], separators=(',', ':'))
+        created_at = _to_utc(entry['timestamp'])
+        expires_at = created_at + retention
+        try:
+            with self._pool.connection() as conn, conn:
+                conn.execute(
+                    f"""INSERT INTO {self.table} (cache_key, api_source, data, expires_at, created_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(cache_key) DO UPDATE SET
+                            api_source = excluded.api_source,
+                            data = excluded.data,
+                            expires_at = excluded.expires_at,
+                            created_at = excluded.created_at""",
+                    (key, key.split('_', 1)[0], payload,
+                     expires_at.strftime(SQLITE_DATETIME_FORMAT), created_at.strftime(SQLITE_DATETIME_FORMAT))
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️  SQLite cache write failed: {e}")
+        return len(payload)
+
+    def delete_entries(self, cache, keys):
+        """Delete entries by key"""
+        if not keys:
+            return
+        placeholders = ','.join('?' * len(keys))
+        try:
+            with self._pool.connection() as conn, conn:
+                conn.execute(f"DELETE FROM {self.table} WHERE cache_key IN ({placeholders})", list(keys))
+        except sqlite3.Error as e:
+            print(f"⚠️  SQLite cache delete failed: {e}")
+
+    def sweep(self):
+        """Delete expired rows, returning how many were removed"""
+        now = datetime.utcnow().strftime(SQLITE_DATETIME_FORMAT)
+        try:
+            with self._pool.connection() as conn, conn:
+                return conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+        except sqlite3.Error as e:
+            print(f"⚠️  SQLite cache sweep failed: {e}")
+            return 0
+
+    def clear(self):
+        """Delete every cached row"""
+        try:
+            with self._pool.connection() as conn, conn:
+                conn.execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            print(f"⚠️  SQLite cache clear failed: {e}")
+
+    def close(self):
+        self._pool.close()
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+    pass
+
+class RESPConnection:
+    """Minimal RESP2 client connection (enough for GET/SET/DEL/SCAN)"""
+
+    def __init__(self, host, port, db=0, password=None, timeout=2):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile('rb')
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        """Send one command and return its decoded reply"""
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(f'${len(arg)}\r\n'.encode())
+            parts.append(arg)
+            parts.append(b'\r\n')
+        self.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f'Unexpected reply: {line!r}')
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+class RedisStore:
+    """Cache store shared by every worker and node through a Redis-protocol server.
+
+    Entries live under a key prefix with a server-side TTL, so expiry sweeps are
+    Redis' job. Any server speaking RESP works (Redis, Valkey, KeyDB or a local
+    stand-in), no client library required.
+    """
+
+    shared = True
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='flighthub:cache:', timeout=2, pool_size=8):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._pool = _ConnectionPool(
+            lambda: RESPConnection(self.host, self.port, self.db, self.password, self.timeout), pool_size
+        )
+
+    def _execute(self, *args):
+        """Run a command, reconnecting once if the connection went away"""
+        for attempt in range(2):
+            try:
+                with self._pool.connection() as conn:
+                    return conn.execute(*args)
+            except (OSError, ConnectionError):
+                # The pool has closed that connection, the retry gets another one
+                if attempt:
+                    raise
+
+    def load(self):
+        """Entries are read on demand, nothing to preload"""
+        return {}
+
+    def attach(self, get_cache, lock):
+        pass
+
+    def get(self, key):
+        """Fetch an unexpired entry, or None"""
+        try:
+            value = self._execute('GET', self.prefix + key)
+        except (OSError, ConnectionError, RedisError) as e:
+            print(f"⚠️  Redis cache read failed: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def write_entry(self, cache, key, retention):
+        """SET one entry with a server-side expiry, returning its size"""
+        payload = json.dumps(cache[key], separators=(',', ':'))
+        ttl_ms = max(1, int(retention.total_seconds() * 1000))
+        try:
+            self._execute('SET', self.prefix + key, payload, 'PX', ttl_ms)
+        except (OSError, ConnectionError, RedisError) as e:
+            print(f"⚠️  Redis cache write failed: {e}")
+        return len(payload)
+
+    def delete_entries(self, cache, keys):
+        """Delete entries by key"""
+        if not keys:
+            return
+        try:
+            self._execute('DEL', *[self.prefix + key for key in keys])
+        except (OSError, ConnectionError, RedisError) as e:
+            print(f"⚠️  Redis cache delete failed: {e}")
+
+    def sweep(self):
+        """Redis expires keys itself"""
+        return 0
+
+    def clear(self):
+        """Delete every key under the prefix"""
+        cursor = b'0'
+        while True:
+            cursor, keys = self._execute('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            if keys:
+                self._execute('DEL', *keys)
+            if cursor in (b'0', 0):
+                break
+
+    def close(self):
+        self._pool.close()
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import PasswordHasher
 from datetime import datetime
 import json
+import zlib
 
 db = SQLAlchemy()
 
@@ -22,14 +23,21 @@ class User(UserMixin, db.Model):
     # Relationships
     search_history = db.relationship('SearchHistory', backref='user', lazy=True, cascade='all, delete-orphan')
     preferences = db.relationship('UserPreferences', backref='user', uselist=False, cascade='all, delete-orphan')
+
+    # Hashes inline until app.py installs the configured process pool
+    password_hasher = PasswordHasher(workers=0)
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = self.password_hasher.hash(password)
     
     def check_password(self, password):
         """Check if password is correct"""
-        return check_password_hash(self.password_hash, password)
+        return self.password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash uses other parameters than the configured ones"""
+        return self.password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -48,11 +56,16 @@ class SearchHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     search_type = db.Column(db.String(50), nullable=False)  # 'flight', 'airport', 'airline'
     search_query = db.Column(db.String(255), nullable=False)
-    results = db.Column(db.JSON, nullable=True)
+    results = db.Column(db.JSON, nullable=True)  # inline results of rows from before result_blobs
+    result_hash = db.Column(db.LargeBinary(32), db.ForeignKey('result_blobs.hash'), nullable=True, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    
-    def to_dict(self):
-        """Return all relevant info including results"""
+
+    result_blob = db.relationship('ResultBlob', lazy='selectin')
+
+    def result_data(self):
+        """The stored results, from the shared blob or the inline column of a row not migrated yet"""
+        if self.result_blob is not None:
+            return self.result_blob.load()
         # Ensure results is always a dict/list, not None
         results_data = self.results or {}
         # If stored as string in SQLite, parse JSON
@@ -61,24 +74,34 @@ class SearchHistory(db.Model):
                 results_data = json.loads(results_data)
             except json.JSONDecodeError:
                 results_data = {}
-        
-        return {
-            'id': self.id,
-            'search_type': self.search_type,
-            'search_query': self.search_query,
-            'results': results_data,  #  include results
-            'timestamp': self.timestamp.isoformat()
-        }
+        return results_data
 
     def to_dict(self):
+        """Return all relevant info including results"""
         return {
             'id': self.id,
             'search_type': self.search_type,
             'search_query': self.search_query,
-            'results': self.results or {},
+            'results': self.result_data(),
             'timestamp': self.timestamp.isoformat()
         }
 
+class ResultBlob(db.Model):
+    """Search results shared by every history row with the same content (see result_blobs.py)"""
+    __tablename__ = 'result_blobs'
+
+    hash = db.Column(db.LargeBinary(32), primary_key=True)  # SHA-256 of the canonical JSON
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed canonical JSON
+    size = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    refcount = db.Column(db.Integer, nullable=False, default=0)  # maintained by triggers on search_history
+    created_at = db.Column(db.Float, nullable=False)
+
+    def load(self):
+        """The decoded results, decoded once however many history rows of the session share them"""
+        if getattr(self, '_decoded', None) is None:
+            self._decoded = json.loads(zlib.decompress(self.data))
+        return self._decoded
+
 class APICache(db.Model):
     """Cache API responses"""
     __tablename__ = 'api_cache'
@@ -116,4 +139,74 @@ class UserPreferences(db.Model):
             'favorite_airports': self.favorite_airports or [],
             'theme': self.theme,
             'notifications_enabled': self.notifications_enabled
-        }
\ No newline at end of file
+        }
+
+class RegisteredAircraft(db.Model):
+    """Aircraft metadata imported from the OpenSky aircraft database CSV"""
+    __tablename__ = 'aircraft_registry'
+
+    icao24 = db.Column(db.String(6), primary_key=True)
+    registration = db.Column(db.String(20), nullable=True, index=True)
+    manufacturer = db.Column(db.String(120), nullable=True)
+    model = db.Column(db.String(120), nullable=True)
+    typecode = db.Column(db.String(10), nullable=True)
+    operator = db.Column(db.String(120), nullable=True)
+    owner = db.Column(db.String(200), nullable=True)
+    built = db.Column(db.String(20), nullable=True)
+
+    def to_dict(self):
+        return {
+            'icao24': self.icao24,
+            'registration': self.registration,
+            'manufacturer': self.manufacturer,
+            'model': self.model,
+            'typecode': self.typecode,
+            'operator': self.operator,
+            'owner': self.owner,
+            'built': self.built
+        }
+
+class FlightRecord(db.Model):
+    """One aviationstack flight, kept so later searches can be answered locally (see flight_store.py)"""
+    __tablename__ = 'flight_records'
+    __table_args__ = (
+        db.Index('ix_flight_records_dep', 'dep_iata', 'flight_date'),
+        db.Index('ix_flight_records_arr', 'arr_iata', 'flight_date'),
+        db.Index('ix_flight_records_airline', 'airline_iata', 'flight_date'),
+    )
+
+    # flight_date|flight_iata|dep_iata, one row per operated leg
+    key = db.Column(db.String(40), primary_key=True)
+    flight_iata = db.Column(db.String(10), nullable=True, index=True)
+    flight_date = db.Column(db.String(10), nullable=True, index=True)
+    dep_iata = db.Column(db.String(4), nullable=True)
+    arr_iata = db.Column(db.String(4), nullable=True)
+    airline_iata = db.Column(db.String(4), nullable=True)
+    flight_status = db.Column(db.String(20), nullable=True, index=True)
+    dep_scheduled = db.Column(db.String(30), nullable=True)
+    data = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.Float, nullable=False, index=True)
+
+class FlightCoverage(db.Model):
+    """A complete (untruncated) aviationstack flights answer for a set of filters and when it was fetched"""
+    __tablename__ = 'flight_coverage'
+
+    filters = db.Column(db.String(255), primary_key=True)  # canonical JSON of the filters
+    fetched_at = db.Column(db.Float, nullable=False, index=True)
+    total = db.Column(db.Integer, nullable=False)
+
+class FlightCoverageRecord(db.Model):
+    """Which FlightRecords a FlightCoverage answer held, so later narrower searches don't leak into it"""
+    __tablename__ = 'flight_coverage_records'
+
+    filters = db.Column(db.String(255), primary_key=True)
+    record_key = db.Column(db.String(40), primary_key=True)
+
+class WeatherLocation(db.Model):
+    """A canonical weather location and the OpenWeatherMap city id learned for it (see weather_service.py)"""
+    __tablename__ = 'weather_locations'
+
+    key = db.Column(db.String(120), primary_key=True)  # 'airport:LHR' or 'q:london'
+    owm_id = db.Column(db.Integer, nullable=True)
+    name = db.Column(db.String(120), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+
+from sqlalchemy import insert
+
+from database import db, FlightRecord, FlightCoverage, FlightCoverageRecord
+
+# Request filters the store can answer, all of them FlightRecord columns
+FILTERS = ('flight_iata', 'flight_date', 'dep_iata', 'arr_iata', 'airline_iata', 'flight_status')
+OUTCOMES = ('exact', 'superset', 'cache', 'upstream')
+
+def normalize_filters(args):
+    """The non-empty FILTERS of a request, in the case aviationstack uses (IATA codes upper, status lower)"""
+    filters = {}
+    for name in FILTERS:
+        value = (args.get(name) or '').strip()
+        if value:
+            filters[name] = value.lower() if name == 'flight_status' else value.upper()
+    return filters
+
+def filter_shape(filters):
+    """'dep_iata+flight_status' style name of which filters a request uses"""
+    return '+'.join(sorted(filters)) or 'none'
+
+def flight_row(flight, fetched_at):
+    """FlightRecord column values of one aviationstack flight"""
+    departure = flight.get('departure') or {}
+    arrival = flight.get('arrival') or {}
+    airline = flight.get('airline') or {}
+    number = flight.get('flight') or {}
+    flight_iata = number.get('iata') or number.get('icao') or number.get('number')
+    return {
+        'key': f"{flight.get('flight_date')}|{flight_iata}|{departure.get('iata')}",
+        'flight_iata': flight_iata,
+        'flight_date': flight.get('flight_date'),
+        'dep_iata': departure.get('iata'),
+        'arr_iata': arrival.get('iata'),
+        'airline_iata': airline.get('iata'),
+        'flight_status': flight.get('flight_status'),
+        'dep_scheduled': departure.get('scheduled'),
+        'data': flight,
+        'fetched_at': fetched_at
+    }
+
+class FlightStore:
+    """Indexed local copy of aviationstack flights with a query planner in front of it.
+
+    Every complete (untruncated) upstream answer is stored as FlightRecord
+    rows plus a FlightCoverage row for its filters, linked to the rows it
+    held by FlightCoverageRecord. A later search whose
+    filters include all the filters of a coverage row younger than
+    ``max_age_seconds`` asks for a subset of what that answer held, so it is
+    served from the table instead of upstream; the freshest such coverage
+    wins. ``dep_iata=JFK&flight_status=active`` is answered from an earlier
+    ``dep_iata=JFK`` search, for example. ``flight_date`` must match exactly:
+    without it aviationstack answers for recent days only, not every date.
+
+    Per filter shape, counts how each search was answered: 'exact' (stored
+    answer for the same filters), 'superset', 'cache' (the exact-key
+    response cache) or 'upstream'.
+    """
+
+    def __init__(self, max_age_seconds=600):
+        self.max_age_seconds = max_age_seconds
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def count(self, filters, outcome):
+        with self._lock:
+            counters = self._counters.setdefault(filter_shape(filters), dict.fromkeys(OUTCOMES, 0))
+            counters[outcome] += 1
+
+    def stats(self):
+        """{shape: {outcome: count, ..., 'requests', 'local_hit_rate'}}"""
+        with self._lock:
+            result = {}
+            for shape, counters in self._counters.items():
+                requests = sum(counters.values())
+                result[shape] = dict(counters, requests=requests,
+                                     local_hit_rate=round((counters['exact'] + counters['superset']) / requests, 3))
+            return result
+
+    def plan(self, filters, now=None):
+        """The freshest usable coverage whose filters are a subset of ``filters`` with the same flight_date, or None"""
+        now = now or time.time()
+        best = None
+        candidates = FlightCoverage.query.filter(FlightCoverage.fetched_at >= now - self.max_age_seconds)
+        for coverage in candidates:
+            covered = json.loads(coverage.filters)
+            if covered.get('flight_date') != filters.get('flight_date'):
+                continue
+            if all(filters.get(name) == value for name, value in covered.items()):
+                if best is None or coverage.fetched_at > best.fetched_at:
+                    best = coverage
+        return best
+
+    def answer(self, filters, limit=100):
+        """An aviationstack-shaped response from the local table, or None if nothing covers it"""
+        coverage = self.plan(filters)
+        if coverage is None:
+            return None
+        # Only the rows of that answer: others may have been stored since by searches outside its scope
+        query = FlightRecord.query.filter_by(**filters).join(
+            FlightCoverageRecord, FlightCoverageRecord.record_key == FlightRecord.key
+        ).filter(FlightCoverageRecord.filters == coverage.filters)
+        total = query.count()
+        rows = query.order_by(FlightRecord.flight_date.desc(), FlightRecord.dep_scheduled).limit(limit).all()
+        superset = json.loads(coverage.filters)
+        self.count(filters, 'exact' if superset == filters else 'superset')
+        return {
+            'pagination': {'limit': limit, 'offset': 0, 'count': len(rows), 'total': total},
+            'data': [row.data for row in rows],
+            'source': 'local',
+            'superset': superset,
+            'cache_age': int(time.time() - coverage.fetched_at)
+        }
+
+    def ingest(self, filters, response, limit=100):
+        """Store an upstream flights response; only complete ones become coverage. Returns the rows stored."""
+        if not isinstance(response, dict) or not isinstance(response.get('data'), list):
+            return 0
+        flights = response['data']
+        pagination = response.get('pagination') or {}
+        total = pagination.get('total', len(flights))
+        if pagination.get('offset', 0) or total > len(flights) or (not pagination and len(flights) >= limit):
+            return 0  # Truncated: can't tell what is missing
+
+        now = time.time()
+        key = json.dumps(filters, sort_keys=True)
+        rows = [flight_row(flight, now) for flight in flights if isinstance(flight, dict)]
+        FlightCoverageRecord.query.filter_by(filters=key).delete()
+        if rows:
+            db.session.execute(insert(FlightRecord).prefix_with('OR REPLACE'), rows)
+            db.session.execute(insert(FlightCoverageRecord).prefix_with('OR IGNORE'),
+                               [{'filters': key, 'record_key': row['key']} for row in rows])
+        db.session.execute(insert(FlightCoverage).prefix_with('OR REPLACE'), [{
+            'filters': key,
+            'fetched_at': now,
+            'total': total
+        }])
+        # Nothing older than max_age can serve a search any more
+        cutoff = now - self.max_age_seconds
+        expired = [coverage.filters for coverage in FlightCoverage.query.filter(FlightCoverage.fetched_at < cutoff)]
+        if expired:
+            FlightCoverageRecord.query.filter(FlightCoverageRecord.filters.in_(expired)).delete(synchronize_session=False)
+            FlightCoverage.query.filter(FlightCoverage.filters.in_(expired)).delete(synchronize_session=False)
+        FlightRecord.query.filter(FlightRecord.fetched_at < cutoff).delete()
+        db.session.commit()
+        return len(rows)
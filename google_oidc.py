@@ -0,0 +1,140 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import jwt
+
+GOOGLE_ISSUERS = ('https://accounts.google.com', 'accounts.google.com')
+MAX_AGE_PATTERN = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+def cache_lifetime(response, default=0):
+    """Seconds a response may be reused according to its Cache-Control (minus Age) header"""
+    cache_control = response.headers.get('Cache-Control', '')
+    if re.search(r'no-store|no-cache', cache_control, re.IGNORECASE):
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    if not match:
+        return default
+    age = response.headers.get('Age', '')
+    return max(int(match.group(1)) - (int(age) if age.isdigit() else 0), 0)
+
+class CachedDocument:
+    """A JSON document fetched over HTTP and kept for as long as its Cache-Control allows.
+
+    Concurrent callers share one refresh. If a refresh fails while an
+    expired copy is still held, the expired copy is served instead.
+    """
+
+    def __init__(self, client, url, default_ttl=300):
+        self.client = client
+        self.url = url
+        self.default_ttl = default_ttl
+        self.data = None
+        self.expires_at = 0
+        self.fetched_at = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def get(self, force=False, timing=None):
+        if not force and self.data is not None and time.time() < self.expires_at:
+            return self.data
+        with self._lock:
+            if not force and self.data is not None and time.time() < self.expires_at:
+                return self.data  # Another thread refreshed it while we waited
+            try:
+                if timing:
+                    timing.upstream += 1
+                response = self.client.get(self.url)
+                response.raise_for_status()
+                self.data = response.json()
+                self.fetched_at = time.time()
+                self.expires_at = self.fetched_at + cache_lifetime(response, self.default_ttl)
+                self.fetches += 1
+            except Exception as e:
+                if self.data is None:
+                    raise
+                print(f"⚠️ Refreshing {self.url} failed ({e}), using the cached copy")
+            return self.data
+
+class LoginTiming:
+    """Wall time per step of one login and the number of upstream calls it made"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = []
+        self.upstream = 0
+
+    @contextmanager
+    def step(self, name, upstream=0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.upstream += upstream
+            self.steps.append((name, (time.perf_counter() - started) * 1000))
+
+    def summary(self):
+        total = (time.perf_counter() - self.started) * 1000
+        steps = ', '.join(f"{name} {ms:.1f}ms" for name, ms in self.steps)
+        return f"{self.upstream} upstream call(s), {total:.1f}ms ({steps})"
+
+class GoogleOIDC:
+    """Google's OpenID configuration and signing keys, cached per process.
+
+    The discovery document and the JWKS are refetched only when their
+    Cache-Control lifetime runs out, and ID tokens from the token endpoint are
+    verified locally against the cached keys, so a sign-in needs no discovery
+    or userinfo round trip. A token signed with a key id we don't know yet
+    (Google rotated its keys) refreshes the JWKS once before failing, at most
+    every ``min_key_refresh`` seconds so forged tokens can't hammer Google.
+    """
+
+    def __init__(self, client, discovery_url, client_id, leeway=60, min_key_refresh=60):
+        self.client = client
+        self.client_id = client_id
+        self.leeway = leeway
+        self.min_key_refresh = min_key_refresh
+        self.discovery = CachedDocument(client, discovery_url, default_ttl=3600)
+        self._jwks = None
+        self._keys = {}
+        self._keys_source = None
+
+    def config(self, timing=None):
+        return self.discovery.get(timing=timing)
+
+    def _jwks_document(self, timing=None):
+        jwks_uri = self.config(timing)['jwks_uri']
+        if self._jwks is None or self._jwks.url != jwks_uri:
+            self._jwks = CachedDocument(self.client, jwks_uri, default_ttl=3600)
+        return self._jwks
+
+    def _load_keys(self, jwks):
+        if jwks is not self._keys_source:
+            self._keys = {key['kid']: jwt.PyJWK(key) for key in jwks.get('keys', []) if 'kid' in key}
+            self._keys_source = jwks
+
+    def signing_key(self, kid, timing=None):
+        document = self._jwks_document(timing)
+        self._load_keys(document.get(timing=timing))
+        if kid not in self._keys and time.time() - document.fetched_at >= self.min_key_refresh:
+            self._load_keys(document.get(force=True, timing=timing))
+        if kid not in self._keys:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        return self._keys[kid]
+
+    def verify_id_token(self, id_token, timing=None):
+        """Claims of a Google ID token after checking its signature, audience, issuer and expiry"""
+        header = jwt.get_unverified_header(id_token)
+        key = self.signing_key(header.get('kid'), timing)
+        claims = jwt.decode(
+            id_token,
+            key.key,
+            algorithms=['RS256'],
+            audience=self.client_id,
+            leeway=self.leeway,
+            options={'require': ['exp', 'iat', 'iss', 'aud', 'sub']}
+        )
+        if claims['iss'] not in GOOGLE_ISSUERS:
+            raise jwt.InvalidIssuerError(f"Unexpected issuer {claims['iss']}")
+        return claims
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert
+
+import result_blobs
+from database import db, SearchHistory
+
+class HistoryWriter:
+    """Write-behind queue for SearchHistory rows.
+
+    add() only appends to an in-memory queue; a writer thread inserts the
+    queued rows in one transaction once ``batch_rows`` are waiting or
+    ``flush_ms`` after the first of them arrived, so requests never wait for
+    SQLite's write lock or fsync. Result blobs are stored by the writer too.
+
+    At most ``max_pending`` rows are held: past that, add() waits up to
+    ``max_wait`` seconds for the writer and then drops the row (counted in
+    ``dropped``); a batch that fails to write is counted in ``failed``.
+    close() writes out what is still queued. ``flush_ms=0``
+    writes each row inline instead.
+
+    A row only becomes visible to queries once written; call flush() first
+    where that matters (this worker's rows only).
+    """
+
+    def __init__(self, app, flush_ms=200, batch_rows=200, max_pending=5000, max_wait=1.0):
+        self.app = app
+        self.flush_ms = flush_ms
+        self.batch_rows = batch_rows
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self._pending = deque()
+        self._accepted = 0
+        self._done = 0
+        self._urgent = False
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, user_id, search_type, search_query, results):
+        """Queue one history row; False if it was dropped because the queue stayed full"""
+        row = {'user_id': user_id, 'search_type': search_type, 'search_query': search_query,
+               'results': results, 'timestamp': datetime.utcnow()}
+        if self.flush_ms <= 0:
+            self._write([row])
+            return True
+
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._pending) < self.max_pending, self.max_wait):
+                self.dropped += 1
+                print(f"⚠️  Search history queue full ({self.max_pending} rows), dropping a row")
+                return False
+            self._pending.append((time.monotonic(), row))
+            self._accepted += 1
+            if len(self._pending) in (1, self.batch_rows):
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=5.0):
+        """Write out everything queued so far; False if that took longer than ``timeout``"""
+        with self._cond:
+            target = self._accepted
+            if self._done >= target:
+                return True
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= target, timeout)
+
+    def stats(self):
+        with self._cond:
+            return {'pending': len(self._pending), 'written': self.written, 'failed': self.failed,
+                    'dropped': self.dropped, 'batches': self.batches}
+
+    def start(self):
+        """Start the writer thread (idempotent; also restarts it in a forked worker)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Write out the queue and stop the writer thread"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _next_batch(self):
+        """Wait for a batch to be due and take it off the queue; None once stopped and drained"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._stopped)
+            if not self._pending:
+                return None
+            self._cond.wait_for(
+                lambda: len(self._pending) >= self.batch_rows or self._urgent or self._stopped,
+                max(self._pending[0][0] + self.flush_ms / 1000 - time.monotonic(), 0)
+            )
+            batch = [self._pending.popleft()[1] for _ in range(min(self.batch_rows, len(self._pending)))]
+            if not self._pending:
+                self._urgent = False
+            self._cond.notify_all()  # Room for waiting add() calls
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+            with self._cond:
+                self._done += len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        """Insert rows in one transaction"""
+        with self.app.app_context():
+            try:
+                rows = []
+                for row in batch:
+                    row = dict(row)
+                    row['result_hash'] = result_blobs.store(row.pop('results'))
+                    rows.append(row)
+                db.session.execute(insert(SearchHistory), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  Could not write {len(batch)} search history rows: {e}")
+                with self._cond:
+                    self.failed += len(batch)
+                return
+        with self._cond:
+            self.written += len(batch)
+            self.batches += 1
@@ -0,0 +1,75 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds; the connect timeout is just over a TCP retransmission window
+DEFAULT_TIMEOUT = (3.05, 10)
+
+class UpstreamClient:
+    """Keep-alive HTTP client for one upstream API.
+
+    Wraps a requests.Session whose adapter keeps up to ``pool_size`` idle
+    connections per host, so consecutive calls reuse an open TCP/TLS
+    connection instead of paying a new handshake each time. Idempotent
+    requests are retried ``retries`` times on connection errors and 502/503/504
+    with exponential backoff; a 429 is never retried here, it goes back to the
+    caller so the shared rate limiter can be penalized. Requests without an
+    explicit timeout get DEFAULT_TIMEOUT.
+    """
+
+    def __init__(self, name, base_url='', pool_size=10, retries=2, backoff_factor=0.3, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=False,  # Never park a request thread for a server-chosen delay
+            raise_on_status=False  # Hand the last response back instead of raising RetryError
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')) or not self.base_url:
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+def fan_out(calls, executor):
+    """Run zero-argument callables concurrently on executor, returning their results in order.
+
+    Every call is waited for; if any raised, the first exception (in call
+    order) is re-raised afterwards.
+    """
+    futures = [executor.submit(call) for call in calls]
+    results, error = [], None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            if error is None:
+                error = e
+    if error is not None:
+        raise error
+    return results
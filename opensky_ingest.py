@@ -0,0 +1,275 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from aircraft_clusters import ClusterLevels
+from aircraft_columns import AircraftColumns
+from spatial_index import GridIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process election, every process ingests
+    fcntl = None
+
+class AircraftSnapshot:
+    """One published set of live aircraft. Treat as immutable: it is shared by every request.
+
+    ``version`` is the OpenSky data time, so it increases with every update and
+    is the same in every worker that republished the leader's snapshot.
+    """
+
+    __slots__ = ('version', 'time', 'fetched_at', 'total_states', 'columns', 'index', 'clusters',
+                 '_encoded', '_encode_lock')
+
+    def __init__(self, version, time, fetched_at, total_states, columns):
+        self.version = version
+        self.time = time
+        self.fetched_at = fetched_at
+        self.total_states = total_states
+        self.columns = columns
+        # Built here, on the ingest thread, so bbox and zoom queries never pay for them
+        self.index = GridIndex.for_columns(columns)
+        self.clusters = ClusterLevels.for_columns(columns)
+        self._encoded = None
+        self._encode_lock = threading.Lock()
+
+    @property
+    def payload(self):
+        """Full /api/aircraft/live response body, built on every call: only its encoded() bytes are kept"""
+        aircraft = self.columns.to_dicts()
+        return {
+            'success': True,
+            'version': self.version,
+            'time': self.time,
+            'count': len(aircraft),
+            'aircraft': aircraft
+        }
+
+    @property
+    def etag(self):
+        """Strong ETag for the full payload, the OpenSky time identifies its contents"""
+        return f"aircraft-{self.time if self.time is not None else self.version}"
+
+    def encoded(self):
+        """(json_bytes, gzip_bytes) of the payload, encoded once however many clients ask"""
+        if self._encoded is None:
+            with self._encode_lock:
+                if self._encoded is None:
+                    body = json.dumps(self.payload, separators=(',', ':')).encode('utf-8')
+                    self._encoded = (body, gzip.compress(body, compresslevel=6))
+        return self._encoded
+
+    def release(self):
+        """Drop the encoded bytes of a snapshot that is no longer current; diffs only need ``columns``"""
+        self._encoded = None
+
+    @property
+    def age(self):
+        """Seconds since this snapshot was fetched from OpenSky"""
+        return time.time() - self.fetched_at
+
+class OpenSkyIngestor:
+    """Polls OpenSky states/all on a background thread and publishes AircraftSnapshots.
+
+    With a shared cache store, the workers elect one leader through a file lock:
+    the leader polls OpenSky and writes the compact columnar snapshot to the
+    shared cache under ``cache_key``, the others only read it back. With a per-process store
+    every process polls on its own.
+
+    Polling pauses after ``idle_timeout`` seconds without a snapshot() reader so an
+    idle deployment doesn't burn the anonymous OpenSky quota; an idle leader
+    releases the lock so a worker that still has readers can take over.
+
+    ``fetch_states()`` returns ``(status_code, {'time', 'total_states', 'columns'})``.
+    """
+
+    def __init__(self, fetch_states, cache, cache_key='opensky_aircraft_live_snapshot',
+                 poll_interval=15, max_backoff=120, max_snapshot_age=120, idle_timeout=300,
+                 history_size=8, lock_file='cache/opensky_ingest.lock'):
+        self.fetch_states = fetch_states
+        self.cache = cache
+        self.cache_key = cache_key
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.max_snapshot_age = max_snapshot_age
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self.lock_file = lock_file
+        self.last_status = None
+        self.last_error = None
+        self.is_leader = False
+        self._snapshot = None
+        self._history = OrderedDict()
+        self._listeners = []
+        self._last_read = 0
+        self._idle = False
+        self._lock_fd = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the polling thread (idempotent, safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='opensky-ingest', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._release_leadership()
+
+    def snapshot(self):
+        """Latest snapshot, or None if there is none recent enough to serve"""
+        self._last_read = time.monotonic()
+        snapshot = self._snapshot
+        if self._idle or snapshot is None or snapshot.age > self.max_snapshot_age:
+            # Nothing usable, make sure the poller is awake for the next request
+            self._wakeup.set()
+            return None
+        return snapshot
+
+    def add_listener(self, listener):
+        """Call listener(snapshot, previous) after every publish()"""
+        self._listeners.append(listener)
+
+    def snapshot_at(self, version):
+        """A recent snapshot by version, to diff against for since= requests"""
+        return self._history.get(version)
+
+    def publish(self, columns, opensky_time, fetched_at=None, total_states=None):
+        """Replace the current snapshot with a new set of aircraft columns"""
+        fetched_at = fetched_at or time.time()
+        snapshot = AircraftSnapshot(
+            version=int(opensky_time or fetched_at),
+            time=opensky_time,
+            fetched_at=fetched_at,
+            total_states=total_states if total_states is not None else len(columns),
+            columns=columns
+        )
+        # Encoded before it goes live, so no request pays for the JSON and gzip work
+        snapshot.encoded()
+        history = self._history.copy()
+        history[snapshot.version] = snapshot
+        history.move_to_end(snapshot.version)
+        while len(history) > self.history_size:
+            history.popitem(last=False)
+        previous = self._snapshot
+        # Swap in whole objects so readers on other threads never see a half update
+        self._history = history
+        self._snapshot = snapshot
+        if previous is not None:
+            # Kept in history for since= diffs only
+            previous.release()
+        for listener in self._listeners:
+            try:
+                listener(snapshot, previous)
+            except Exception as e:
+                print(f"⚠️  Snapshot listener failed: {e}")
+        return snapshot
+
+    def _run(self):
+        delay = 0
+        while not self._stopped.is_set():
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if time.monotonic() - self._last_read > self.idle_timeout:
+                # Nobody is looking at aircraft, sleep until snapshot() wakes us. A follower
+                # whose clients are still watching takes over the polling.
+                self._idle = True
+                if self.is_leader:
+                    print(f"→ Process {os.getpid()} is idle, giving up OpenSky ingest leadership")
+                    self._release_leadership()
+                delay = None
+                continue
+            self._idle = False
+
+            try:
+                if self._acquire_leadership():
+                    ok = self._poll_upstream()
+                else:
+                    ok = self._poll_shared_cache()
+                self.last_error = None
+            except Exception as e:
+                ok = False
+                self.last_error = str(e)
+                print(f"⚠️  OpenSky ingest failed: {e}")
+
+            if ok:
+                delay = self.poll_interval
+            else:
+                delay = min(max(delay or self.poll_interval, self.poll_interval) * 2, self.max_backoff)
+
+    def _poll_upstream(self):
+        started = time.time()
+        status_code, data = self.fetch_states()
+        self.last_status = status_code
+        if status_code != 200:
+            print(f"⚠️  OpenSky ingest got status code {status_code}, backing off")
+            return False
+
+        columns = data['columns']
+        snapshot = self.publish(columns, data['time'], fetched_at=started, total_states=data['total_states'])
+        if self.cache is not None and self.cache.store.shared:
+            # For the followers; a per-process store has none, and the snapshot is several hundred KB
+            self.cache.set(self.cache_key, {
+                'time': snapshot.time,
+                'total_states': snapshot.total_states,
+                'columns': columns.to_compact()
+            })
+        print(f"✓ Ingested {len(columns)} aircraft from OpenSky (snapshot v{snapshot.version})")
+        return True
+
+    def _poll_shared_cache(self):
+        entry = self.cache.store.get(self.cache_key)
+        if entry is None:
+            return True
+        data = entry['data']
+        current = self._snapshot
+        if current is None or current.time != data.get('time'):
+            fetched_at = datetime.fromisoformat(entry['timestamp']).timestamp()
+            columns = AircraftColumns.from_compact(data['columns'])
+            self.publish(columns, data.get('time'), fetched_at=fetched_at, total_states=data.get('total_states'))
+        return True
+
+    def _acquire_leadership(self):
+        """True if this process should poll OpenSky itself"""
+        if self.cache is None or not self.cache.store.shared or fcntl is None:
+            return True
+        if self.is_leader:
+            return True
+        if self._lock_fd is None:
+            lock_dir = os.path.dirname(self.lock_file)
+            if lock_dir:
+                os.makedirs(lock_dir, exist_ok=True)
+            self._lock_fd = open(self.lock_file, 'a')
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self.is_leader = True
+        print(f"✓ Process {os.getpid()} is now the OpenSky ingest leader")
+        return True
+
+    def _release_leadership(self):
+        if self._lock_fd is not None:
+            if fcntl is not None and self.is_leader:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            self._lock_fd.close()
+            self._lock_fd = None
+        self.is_leader = False
@@ -0,0 +1,153 @@
+import codecs
+import json
+
+# OpenSky state vector indices
+# 0: icao24, 1: callsign, 2: origin_country, 3: time_position,
+# 4: last_contact, 5: longitude, 6: latitude, 7: baro_altitude,
+# 8: on_ground, 9: velocity, 10: true_track, 11: vertical_rate,
+# 12: sensors, 13: geo_altitude, 14: squawk, 15: spi, 16: position_source
+USED_FIELDS = 12  # Everything after vertical_rate is dropped while parsing
+
+_WHITESPACE = ' \t\n\r'
+
+class StateStream:
+    """Iterates the state vectors of an OpenSky states/all body as it downloads.
+
+    The body is decoded chunk by chunk and every element of ``states`` is
+    decoded on its own, so the whole response never sits in memory as one
+    string or one list; combined with AircraftColumns.from_states each state
+    is dropped right after it is copied into the columns. States without a
+    position (and, with ``on_ground`` set, on the wrong side of it) are skipped
+    and only the fields the app uses are kept.
+
+    ``time`` and the other top-level values are filled in as they are reached,
+    ``total_states`` counts every state seen, filtered or not.
+    """
+
+    def __init__(self, chunks, on_ground=None):
+        self.chunks = iter(chunks)
+        self.on_ground = on_ground
+        self.time = None
+        self.fields = {}
+        self.total_states = 0
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    @classmethod
+    def from_response(cls, response, chunk_size=65536, **filters):
+        return cls(response.iter_content(chunk_size=chunk_size), **filters)
+
+    @classmethod
+    def from_bytes(cls, body, chunk_size=65536, **filters):
+        return cls((body[i:i + chunk_size] for i in range(0, len(body), chunk_size)), **filters)
+
+    def __iter__(self):
+        on_ground = self.on_ground
+        self._expect('{')
+        while True:
+            if self._next_char() == '}':
+                self._pos += 1
+                return
+            if self._next_char() == ',':
+                self._pos += 1
+                continue
+            key = self._value()
+            self._expect(':')
+            if key != 'states':
+                self.fields[key] = self._value()
+                if key == 'time':
+                    self.time = self.fields[key]
+                continue
+            if self._next_char() == 'n':
+                self._value()  # "states": null when nothing is flying in the box
+                continue
+
+            self._expect('[')
+            while True:
+                char = self._next_char()
+                if char == ']':
+                    self._pos += 1
+                    break
+                if char == ',':
+                    self._pos += 1
+                    continue
+                state = self._value()
+                self.total_states += 1
+                if state[5] is None or state[6] is None:
+                    continue
+                if on_ground is not None and bool(state[8]) != on_ground:
+                    continue
+                yield state[:USED_FIELDS]
+
+    def _fill(self):
+        """Read the next chunk into the buffer, False at the end of the body"""
+        if self._eof:
+            return False
+        if self._pos > 65536:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        for chunk in self.chunks:
+            text = self._text.decode(chunk)
+            if text:
+                self._buf += text
+                return True
+        self._buf += self._text.decode(b'', final=True)
+        self._eof = True
+        return False
+
+    def _next_char(self):
+        """Skip whitespace and return the next character without consuming it"""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise ValueError('OpenSky response ended unexpectedly')
+
+    def _expect(self, char):
+        if self._next_char() != char:
+            raise ValueError(f"Malformed OpenSky response: expected {char!r} at offset {self._pos}")
+        self._pos += 1
+
+    def _value(self):
+        """Decode the JSON value at the cursor, reading more of the body as needed"""
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+def parse_states(states):
+    """Convert OpenSky state vectors into aircraft dicts (the AircraftColumns.row() shape), skipping ones without a position"""
+    aircraft_list = []
+    for state in states or []:
+        if state[5] is None or state[6] is None:
+            continue
+        aircraft_list.append({
+            'icao24': state[0],
+            'callsign': (state[1] or '').strip() or 'Unknown',
+            'country': state[2],
+            'origin_country': state[2],  # Add both for compatibility
+            'longitude': state[5],
+            'latitude': state[6],
+            'altitude': state[7] or 0,
+            'on_ground': bool(state[8]),
+            'velocity': state[9] or 0,
+            'heading': state[10] or 0,
+            'vertical_rate': state[11] or 0,
+        })
+    return aircraft_list
@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class PasswordHashingBusy(Exception):
+    """Too many password hashes queued; retry_after is in seconds"""
+
+    def __init__(self, retry_after=1):
+        super().__init__(f"Password hashing is saturated, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """Password hashing and verification off the request thread.
+
+    Hashes run in a pool of ``workers`` processes, so a burst of logins uses
+    those cores and no more instead of every request thread. At most
+    ``max_pending`` hashes may be running or queued; past that, callers get
+    PasswordHashingBusy right away instead of tying up a request thread
+    behind the queue. ``workers=0`` hashes inline.
+
+    ``method`` is a werkzeug hash method ('scrypt', 'scrypt:32768:8:1',
+    'pbkdf2:sha256:600000', ...). Hashes made with other parameters still
+    verify, and needs_rehash() tells when to replace them.
+    """
+
+    def __init__(self, method='scrypt', workers=2, max_pending=8, timeout=30):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._prefix = None
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # fork, not spawn: spawn would re-import app.py (cache journal and all) when run as a script.
+                # The workers only ever call into werkzeug/hashlib, never the parent's threads or connections.
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHashingBusy()
+        try:
+            pool = self._executor()
+            try:
+                return pool.submit(fn, *args).result(self.timeout)
+            except BrokenProcessPool:
+                # A worker died (OOM killer, ...): start a fresh pool for the next caller
+                with self._pool_lock:
+                    if self._pool is pool:
+                        self._pool = None
+                raise
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with other parameters than the configured method"""
+        if not pwhash:
+            return False
+        if self._prefix is None:
+            # Let werkzeug fill in its defaults ('scrypt' -> 'scrypt:32768:8:1'), once, in the pool
+            self._prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,194 @@
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+class RateLimitExceeded(Exception):
+    """No upstream call allowed right now; retry_after is in seconds"""
+
+    def __init__(self, api_source, retry_after, reason='rate limit'):
+        super().__init__(f"{api_source} {reason} reached, retry in {retry_after}s")
+        self.api_source = api_source
+        self.retry_after = retry_after
+        self.reason = reason
+
+class BucketLimit:
+    """``requests`` calls per ``seconds`` (the bucket also holds at most ``requests``),
+    optionally capped at ``monthly_quota`` calls per calendar month (UTC)"""
+
+    def __init__(self, requests, seconds, monthly_quota=None):
+        self.rate = requests / seconds
+        self.burst = max(requests, 1)
+        self.monthly_quota = monthly_quota or None
+
+    @classmethod
+    def parse(cls, spec, monthly_quota=None):
+        """'1/10' -> one call every 10 seconds"""
+        requests, seconds = spec.split('/')
+        return cls(float(requests), float(seconds), monthly_quota)
+
+def _month(now):
+    return datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m')
+
+def _seconds_to_next_month(now):
+    current = datetime.fromtimestamp(now, timezone.utc)
+    if current.month == 12:
+        following = current.replace(year=current.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        following = current.replace(month=current.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return following.timestamp() - now
+
+class TokenBucketScheduler:
+    """Token buckets per api_source, kept in SQLite so every worker draws from the same bucket.
+
+    Each acquire() is one BEGIN IMMEDIATE transaction, serialized across
+    processes by SQLite's write lock. Interactive callers may queue: the
+    bucket goes into debt and the caller sleeps until its token would have
+    been refilled, as long as that is within ``max_wait``. Background callers
+    (cache refreshes, the ingest poller) never queue and leave the last
+    ``background_reserve`` of the bucket to interactive ones. Anything that
+    can't be served raises RateLimitExceeded with a Retry-After.
+
+    Call counts per source and month are kept in the same table, so quota
+    usage is accurate across workers and restarts.
+    """
+
+    def __init__(self, db_path, limits, max_wait=5.0, background_reserve=0.2, busy_timeout_ms=5000):
+        self.db_path = db_path
+        self.limits = limits
+        self.max_wait = max_wait
+        self.background_reserve = background_reserve
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                " api_source TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " month TEXT NOT NULL,"
+                " month_calls INTEGER NOT NULL DEFAULT 0,"
+                " total_calls INTEGER NOT NULL DEFAULT 0,"
+                " rejected INTEGER NOT NULL DEFAULT 0,"
+                " throttled INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _row(self, conn, api_source, limit, now):
+        row = conn.execute(
+            "SELECT tokens, updated_at, month, month_calls FROM rate_limits WHERE api_source = ?",
+            (api_source,)
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO rate_limits (api_source, tokens, updated_at, month) VALUES (?, ?, ?, ?)",
+                (api_source, limit.burst, now, _month(now))
+            )
+            return limit.burst, _month(now), 0
+        tokens, updated_at, month, month_calls = row
+        tokens = min(limit.burst, tokens + max(now - updated_at, 0) * limit.rate)
+        if month != _month(now):
+            month, month_calls = _month(now), 0
+        return tokens, month, month_calls
+
+    def acquire(self, api_source, priority=INTERACTIVE):
+        """Take one call's worth of budget for api_source, sleeping if the caller is queued"""
+        limit = self.limits.get(api_source)
+        if limit is None:
+            return 0
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, month, month_calls = self._row(conn, api_source, limit, now)
+            error = None
+            if limit.monthly_quota and month_calls >= limit.monthly_quota:
+                error = RateLimitExceeded(api_source, math.ceil(_seconds_to_next_month(now)), 'monthly quota')
+            elif priority == BACKGROUND:
+                floor = limit.burst * self.background_reserve if limit.burst > 1 else 0
+                if tokens - 1 < floor:
+                    error = RateLimitExceeded(api_source, math.ceil((1 + floor - tokens) / limit.rate))
+            elif (1 - tokens) / limit.rate > self.max_wait:
+                error = RateLimitExceeded(api_source, math.ceil((1 - tokens) / limit.rate))
+
+            if error is not None:
+                conn.execute(
+                    "UPDATE rate_limits SET tokens = ?, updated_at = ?, month = ?, month_calls = ?,"
+                    " rejected = rejected + 1 WHERE api_source = ?",
+                    (tokens, now, month, month_calls, api_source)
+                )
+                conn.execute('COMMIT')
+                raise error
+
+            conn.execute(
+                "UPDATE rate_limits SET tokens = ?, updated_at = ?, month = ?, month_calls = ?,"
+                " total_calls = total_calls + 1 WHERE api_source = ?",
+                (tokens - 1, now, month, month_calls + 1, api_source)
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+        # In debt: wait for our turn
+        wait = max(0.0, (1 - tokens) / limit.rate)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, api_source, retry_after):
+        """Upstream answered 429: empty the bucket for everyone until retry_after has passed"""
+        limit = self.limits.get(api_source)
+        if limit is None:
+            return
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, month, month_calls = self._row(conn, api_source, limit, now)
+            conn.execute(
+                "UPDATE rate_limits SET tokens = ?, updated_at = ?, month = ?, month_calls = ?,"
+                " throttled = throttled + 1 WHERE api_source = ?",
+                (min(tokens, -retry_after * limit.rate), now, month, month_calls, api_source)
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+    def usage(self):
+        """Per-source call accounting shared by all workers"""
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT api_source, tokens, updated_at, month, month_calls, total_calls, rejected, throttled FROM rate_limits"
+        ).fetchall()
+        result = {}
+        for api_source, tokens, updated_at, month, month_calls, total_calls, rejected, throttled in rows:
+            limit = self.limits.get(api_source)
+            if limit is not None:
+                tokens = min(limit.burst, tokens + max(now - updated_at, 0) * limit.rate)
+            result[api_source] = {
+                'calls': total_calls,
+                'calls_this_month': month_calls if month == _month(now) else 0,
+                'monthly_quota': limit.monthly_quota if limit else None,
+                'rejected': rejected,
+                'throttled': throttled,
+                'tokens': round(tokens, 2)
+            }
+        return result
+
+    def total_calls(self):
+        return sum(source['calls'] for source in self.usage().values())
@@ -0,0 +1,307 @@
+import base64
+import json
+import re
+import threading
+import time
+
+from sqlalchemy import text
+
+from database import db
+
+# Catalog kind (also the aviationstack endpoint) -> which record fields fill the indexed columns.
+# 'extra' is searchable too: the city code of an airport, an airline's callsign, an airplane's model.
+KINDS = {
+    'airports': {'name': 'airport_name', 'iata': 'iata_code', 'icao': 'icao_code',
+                 'country': 'country_name', 'country_iso2': 'country_iso2', 'extra': 'city_iata_code',
+                 'id': ('id', 'airport_id')},
+    'airlines': {'name': 'airline_name', 'iata': 'iata_code', 'icao': 'icao_code',
+                 'country': 'country_name', 'country_iso2': 'country_iso2', 'extra': 'callsign',
+                 'id': ('id', 'airline_id')},
+    'airplanes': {'name': 'registration_number', 'iata': 'iata_type', 'icao': 'icao_code_hex',
+                  'country': None, 'country_iso2': None, 'extra': 'model_name',
+                  'id': ('id', 'airplane_id')},
+}
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS catalog_entries (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        upstream_id TEXT NOT NULL,
+        name TEXT NOT NULL DEFAULT '', iata TEXT, icao TEXT, country TEXT, country_iso2 TEXT, extra TEXT,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (kind, upstream_id))""",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_entries_name ON catalog_entries (kind, name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_entries_country ON catalog_entries (kind, country_iso2, name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_entries_iata ON catalog_entries (kind, iata)",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_entries_icao ON catalog_entries (kind, icao)",
+    # External-content FTS5 index over catalog_entries, kept in sync by the triggers below
+    """CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+        name, iata, icao, country, extra,
+        content='catalog_entries', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS catalog_entries_ai AFTER INSERT ON catalog_entries BEGIN
+        INSERT INTO catalog_fts (rowid, name, iata, icao, country, extra)
+        VALUES (new.id, new.name, new.iata, new.icao, new.country, new.extra);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS catalog_entries_ad AFTER DELETE ON catalog_entries BEGIN
+        INSERT INTO catalog_fts (catalog_fts, rowid, name, iata, icao, country, extra)
+        VALUES ('delete', old.id, old.name, old.iata, old.icao, old.country, old.extra);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS catalog_entries_au AFTER UPDATE ON catalog_entries BEGIN
+        INSERT INTO catalog_fts (catalog_fts, rowid, name, iata, icao, country, extra)
+        VALUES ('delete', old.id, old.name, old.iata, old.icao, old.country, old.extra);
+        INSERT INTO catalog_fts (rowid, name, iata, icao, country, extra)
+        VALUES (new.id, new.name, new.iata, new.icao, new.country, new.extra);
+    END""",
+    # Refresh progress per kind: the next page to fetch and when the current pass started
+    """CREATE TABLE IF NOT EXISTS catalog_state (
+        kind TEXT PRIMARY KEY,
+        next_offset INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        pass_started_at REAL,
+        completed_at REAL,
+        claimed_at REAL NOT NULL DEFAULT 0)""",
+]
+
+UPSERT = text(
+    "INSERT INTO catalog_entries (kind, upstream_id, name, iata, icao, country, country_iso2, extra, data, updated_at)"
+    " VALUES (:kind, :upstream_id, :name, :iata, :icao, :country, :country_iso2, :extra, :data, :updated_at)"
+    " ON CONFLICT (kind, upstream_id) DO UPDATE SET"
+    " name = excluded.name, iata = excluded.iata, icao = excluded.icao, country = excluded.country,"
+    " country_iso2 = excluded.country_iso2, extra = excluded.extra, data = excluded.data,"
+    " updated_at = excluded.updated_at"
+)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def ensure_schema():
+    for statement in SCHEMA:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+def fts_query(search):
+    """Every word of a free-text search as a quoted prefix term, so 'heath lon' finds London Heathrow"""
+    return ' '.join(f'"{token}"*' for token in TOKEN_PATTERN.findall(search))
+
+def encode_cursor(name, row_id):
+    return base64.urlsafe_b64encode(json.dumps([name, row_id]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(name, id) of the last row of the previous page; ValueError if the cursor is not one of ours"""
+    try:
+        name, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return name, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def entry_row(kind, record, now):
+    fields = KINDS[kind]
+    upstream_id = next((record.get(key) for key in fields['id'] if record.get(key) not in (None, '')), None)
+    if upstream_id is None:
+        upstream_id = f"{record.get(fields['iata'])}|{record.get(fields['name'])}"
+    value = lambda field: (str(record.get(field)).strip() or None) if field and record.get(field) is not None else None
+    return {
+        'kind': kind,
+        'upstream_id': str(upstream_id),
+        'name': value(fields['name']) or '',
+        'iata': value(fields['iata']),
+        'icao': value(fields['icao']),
+        'country': value(fields['country']),
+        'country_iso2': (value(fields['country_iso2']) or '').upper() or None,
+        'extra': value(fields['extra']),
+        'data': json.dumps(record, separators=(',', ':')),
+        'updated_at': now
+    }
+
+def upsert(kind, records, now=None, commit=True):
+    """Insert or update aviationstack records of one kind, returns how many were written"""
+    now = now or time.time()
+    rows = [entry_row(kind, record, now) for record in records if isinstance(record, dict)]
+    if rows:
+        db.session.execute(UPSERT, rows)
+        if commit:
+            db.session.commit()
+    return len(rows)
+
+def has_entries(kind):
+    """True once anything of this kind was imported"""
+    return db.session.execute(
+        text("SELECT 1 FROM catalog_entries WHERE kind = :kind LIMIT 1"), {'kind': kind}
+    ).first() is not None
+
+def find(kind, code):
+    """The record whose IATA or ICAO code is ``code`` (upper case), or None"""
+    row = db.session.execute(text(
+        "SELECT data FROM catalog_entries WHERE kind = :kind AND (iata = :code OR icao = :code) LIMIT 1"
+    ), {'kind': kind, 'code': code}).first()
+    return json.loads(row[0]) if row else None
+
+def query(kind, search=None, country=None, offset=0, limit=100, cursor=None):
+    """A page of catalog entries in name order, shaped like an aviationstack response.
+
+    ``search`` is matched against name, codes, country and the kind's extra
+    field (prefix match per word). ``country`` is an ISO2 code or a country
+    name. Pass ``cursor`` (the previous page's next_cursor) for keyset
+    pagination, which stays fast deep into the list; ``offset`` also works.
+    """
+    where = ["e.kind = :kind"]
+    params = {'kind': kind}
+    if search and fts_query(search):
+        where.append("e.id IN (SELECT rowid FROM catalog_fts WHERE catalog_fts MATCH :match)")
+        params['match'] = fts_query(search)
+    if country:
+        if len(country) == 2:
+            where.append("e.country_iso2 = :country")
+            params['country'] = country.upper()
+        else:
+            where.append("e.country = :country COLLATE NOCASE")
+            params['country'] = country
+    filters = ' AND '.join(where)
+    total = db.session.execute(text(f"SELECT COUNT(*) FROM catalog_entries e WHERE {filters}"), params).scalar()
+
+    page_filters = filters
+    if cursor:
+        after_name, after_id = decode_cursor(cursor)
+        page_filters += " AND (e.name, e.id) > (:after_name, :after_id)"
+        params.update(after_name=after_name, after_id=after_id)
+        offset = 0
+    rows = db.session.execute(text(
+        f"SELECT e.id, e.name, e.data FROM catalog_entries e WHERE {page_filters}"
+        " ORDER BY e.name, e.id LIMIT :limit OFFSET :offset"
+    ), dict(params, limit=limit, offset=offset)).fetchall()
+
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    return {
+        'pagination': {
+            'limit': limit,
+            'offset': offset,
+            'count': len(rows),
+            'total': total,
+            'next_cursor': next_cursor
+        },
+        'data': [json.loads(row[2]) for row in rows],
+        'source': 'catalog'
+    }
+
+def state(kind):
+    row = db.session.execute(text(
+        "SELECT next_offset, total, pass_started_at, completed_at FROM catalog_state WHERE kind = :kind"
+    ), {'kind': kind}).fetchone()
+    if row is None:
+        return {'next_offset': 0, 'total': None, 'pass_started_at': None, 'completed_at': None}
+    return dict(zip(('next_offset', 'total', 'pass_started_at', 'completed_at'), row))
+
+def claim(kind, interval):
+    """Take the next refresh step for kind if nobody (in any worker) took one in the last ``interval`` seconds"""
+    now = time.time()
+    db.session.execute(text("INSERT OR IGNORE INTO catalog_state (kind) VALUES (:kind)"), {'kind': kind})
+    claimed = db.session.execute(text(
+        "UPDATE catalog_state SET claimed_at = :now WHERE kind = :kind AND claimed_at <= :before"
+    ), {'kind': kind, 'now': now, 'before': now - interval}).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+def refresh(kind, fetch_page, page_size=100, max_pages=None):
+    """Fetch up to ``max_pages`` pages of a kind, continuing where the last call stopped.
+
+    ``fetch_page(offset, limit)`` returns the aviationstack response. Each
+    page is written in one transaction with the offset after it, so an
+    interrupted refresh resumes from the last page written. Once a pass
+    reaches pagination.total (or an empty page), entries it didn't see (gone
+    upstream) are deleted and the next call starts a new pass from offset 0.
+    Returns the number of records written.
+    """
+    db.session.execute(text("INSERT OR IGNORE INTO catalog_state (kind) VALUES (:kind)"), {'kind': kind})
+    db.session.commit()
+    progress = state(kind)
+    offset = progress['next_offset']
+    pass_started_at = progress['pass_started_at'] if offset else time.time()
+    written = pages = 0
+    total = progress['total']
+    while max_pages is None or pages < max_pages:
+        response = fetch_page(offset, page_size)
+        if not isinstance(response, dict) or 'data' not in response:
+            message = (response or {}).get('error', {}).get('message') if isinstance(response, dict) else None
+            raise RuntimeError(f"aviationstack {kind} page at offset {offset} failed: {message or response}")
+        records = response['data'] or []
+        written += upsert(kind, records, commit=False)
+        pages += 1
+        offset += len(records)
+        total = (response.get('pagination') or {}).get('total', total)
+        # A short page isn't the end: aviationstack may return fewer rows than asked for
+        finished = not records or (total is not None and offset >= total)
+        if finished:
+            # Everything still upstream was rewritten during this pass
+            db.session.execute(text(
+                "DELETE FROM catalog_entries WHERE kind = :kind AND updated_at < :started"
+            ), {'kind': kind, 'started': pass_started_at})
+        db.session.execute(text(
+            "UPDATE catalog_state SET next_offset = :next_offset, total = :total, pass_started_at = :started,"
+            " completed_at = COALESCE(:completed_at, completed_at) WHERE kind = :kind"
+        ), {
+            'kind': kind,
+            'next_offset': 0 if finished else offset,
+            'total': total,
+            'started': None if finished else pass_started_at,
+            'completed_at': time.time() if finished else None
+        })
+        db.session.commit()
+        if finished:
+            break
+    return written
+
+class CatalogRefresher:
+    """Background thread that keeps the catalog current a few pages at a time.
+
+    Every ``interval`` seconds each imported kind gets one refresh() step of
+    ``pages_per_step`` pages. Steps are claimed in catalog_state, so with
+    several gunicorn workers only one of them spends the upstream quota. The
+    first full import is left to ``flask import-catalog``.
+    """
+
+    def __init__(self, app, fetch_page, kinds=tuple(KINDS), interval=3600, pages_per_step=5, page_size=100):
+        self.app = app
+        self.fetch_page = fetch_page
+        self.kinds = kinds
+        self.interval = interval
+        self.pages_per_step = pages_per_step
+        self.page_size = page_size
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the refresh thread (idempotent, safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='catalog-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def step(self):
+        with self.app.app_context():
+            for kind in self.kinds:
+                if not has_entries(kind) or not claim(kind, self.interval):
+                    continue
+                try:
+                    written = refresh(kind, lambda offset, limit: self.fetch_page(kind, offset, limit),
+                                      self.page_size, self.pages_per_step)
+                    print(f"✓ Catalog refresh: {written} {kind} updated")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"⚠️  Catalog refresh of {kind} failed: {e}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.step()
+            self._stopped.wait(self.interval)
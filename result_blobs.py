@@ -0,0 +1,119 @@
+import hashlib
+import json
+import time
+import zlib
+
+from sqlalchemy import text
+
+from database import db
+
+# Per-response fields that would make identical results hash differently
+VOLATILE_KEYS = ('cache_age', 'stale')
+COMPRESSION_LEVEL = 6
+
+SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS ix_search_history_result_hash ON search_history (result_hash)",
+    # result_blobs.refcount counts the search_history rows pointing at each blob; the last one out deletes it
+    """CREATE TRIGGER IF NOT EXISTS search_history_result_ai AFTER INSERT ON search_history
+    WHEN new.result_hash IS NOT NULL BEGIN
+        UPDATE result_blobs SET refcount = refcount + 1 WHERE hash = new.result_hash;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_history_result_ad AFTER DELETE ON search_history
+    WHEN old.result_hash IS NOT NULL BEGIN
+        UPDATE result_blobs SET refcount = refcount - 1 WHERE hash = old.result_hash;
+        DELETE FROM result_blobs WHERE hash = old.result_hash AND refcount <= 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_history_result_au AFTER UPDATE OF result_hash ON search_history
+    WHEN old.result_hash IS NOT new.result_hash BEGIN
+        UPDATE result_blobs SET refcount = refcount + 1 WHERE hash = new.result_hash;
+        UPDATE result_blobs SET refcount = refcount - 1 WHERE hash = old.result_hash;
+        DELETE FROM result_blobs WHERE hash = old.result_hash AND refcount <= 0;
+    END""",
+]
+
+EXISTS = text("SELECT 1 FROM result_blobs WHERE hash = :hash")
+INSERT = text(
+    "INSERT INTO result_blobs (hash, data, size, refcount, created_at)"
+    " VALUES (:hash, :data, :size, 0, :created_at) ON CONFLICT (hash) DO NOTHING"
+)
+
+def ensure_schema():
+    columns = {row[1] for row in db.session.execute(text("PRAGMA table_info(search_history)"))}
+    if 'result_hash' not in columns:
+        # Databases created before result_blobs
+        db.session.execute(text("ALTER TABLE search_history ADD COLUMN result_hash BLOB REFERENCES result_blobs (hash)"))
+    for statement in SCHEMA:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+def canonical(data):
+    """Compact, key-sorted JSON of ``data`` without VOLATILE_KEYS, so equal results give equal bytes"""
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in VOLATILE_KEYS}
+    return json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+
+def store(data):
+    """Make sure a blob holding ``data`` exists and return its hash for SearchHistory.result_hash.
+
+    Add the history row in the same transaction: the blob's refcount only
+    goes up when a row points at it, and a blob nobody points at may be
+    collected.
+    """
+    raw = canonical(data)
+    digest = hashlib.sha256(raw).digest()
+    # Nothing pending in the session matters here, so don't flush it early
+    with db.session.no_autoflush:
+        # Popular searches repeat, so skip compressing what is already stored
+        if db.session.execute(EXISTS, {'hash': digest}).first() is None:
+            db.session.execute(INSERT, {
+                'hash': digest,
+                'data': zlib.compress(raw, COMPRESSION_LEVEL),
+                'size': len(raw),
+                'created_at': time.time()
+            })
+    return digest
+
+def migrate(batch_size=1000):
+    """Move inline SearchHistory.results into result_blobs, one transaction per batch.
+    Yields (moved, skipped) for each batch; rows whose results are empty or not
+    valid JSON are skipped and keep their inline results."""
+    select = text(
+        "SELECT id, results FROM search_history WHERE id > :after AND results IS NOT NULL AND result_hash IS NULL"
+        " ORDER BY id LIMIT :limit"
+    )
+    update = text("UPDATE search_history SET result_hash = :hash, results = NULL WHERE id = :id")
+    after = 0
+    while True:
+        rows = db.session.execute(select, {'after': after, 'limit': batch_size}).all()
+        if not rows:
+            return
+        updates = []
+        for row_id, results in rows:
+            try:
+                data = json.loads(results) if isinstance(results, str) else results
+            except json.JSONDecodeError:
+                data = None
+            if data:
+                updates.append({'id': row_id, 'hash': store(data)})
+        if updates:
+            db.session.execute(update, updates)
+        db.session.commit()
+        after = rows[-1][0]
+        yield len(updates), len(rows) - len(updates)
+
+def collect(min_age_seconds=3600):
+    """Delete blobs no history row points at (left behind by a store() whose row was never added)"""
+    deleted = db.session.execute(
+        text("DELETE FROM result_blobs WHERE refcount <= 0 AND created_at < :cutoff"),
+        {'cutoff': time.time() - min_age_seconds}
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+def stats():
+    """{'blobs', 'references', 'raw_bytes', 'stored_bytes'} of the blob table"""
+    blobs, references, raw_bytes, stored_bytes = db.session.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(refcount), 0), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0)"
+        " FROM result_blobs"
+    )).one()
+    return {'blobs': blobs, 'references': references, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
@@ -0,0 +1,80 @@
+import threading
+
+class _Call:
+    """An in-flight call that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running block until it finishes and receive the same result (or the
+    same exception). Nothing is remembered once the call completes, caching the
+    result is left to the function itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers using the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if leader:
+            self._run(key, call, fn)
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def spawn(self, key, fn, executor):
+        """Start fn() on an executor unless a call for key is already in flight.
+
+        Returns True if a new call was started. Foreground do() callers for the
+        same key join the background call instead of starting their own.
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+            self.executions += 1
+
+        def run():
+            self._run(key, call, fn)
+            if call.error is not None:
+                print(f"⚠️  Background refresh of {key} failed: {call.error}")
+
+        executor.submit(run)
+        return True
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Keys currently being fetched"""
+        with self._lock:
+            return list(self._calls)
@@ -0,0 +1,100 @@
+import math
+from array import array
+
+def wrap_longitudes(lomin, lomax):
+    """(lomin, lomax) of a map box moved into [-180, 180).
+
+    Leaflet keeps counting past the antimeridian (lomax=200 after panning
+    east across it); such a box comes back with lomin > lomax, which the
+    queries answer as the two boxes on either side of it. A box 360 degrees
+    wide or more is the whole world.
+    """
+    if lomax - lomin >= 360:
+        return -180.0, 180.0
+    wrap = lambda lon: (lon + 180) % 360 - 180
+    return wrap(lomin), wrap(lomax)
+
+class GridIndex:
+    """Uniform latitude/longitude grid over the rows of an AircraftColumns store.
+
+    Rows are bucketed by cell once per snapshot (counting sort into a flat
+    array plus per-cell offsets), so a bounding-box query only visits the
+    cells it overlaps: rows in cells fully inside the box are taken as-is and
+    only rows in the edge cells are checked against the box.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_degrees=2.0):
+        self.cell_degrees = cell_degrees
+        self.lat_cells = math.ceil(180 / cell_degrees)
+        self.lon_cells = math.ceil(360 / cell_degrees)
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+        cell_count = self.lat_cells * self.lon_cells
+        cells = array('I', (self._cell(lat, lon) for lat, lon in zip(latitudes, longitudes)))
+        counts = array('I', bytes(4 * (cell_count + 1)))
+        for cell in cells:
+            counts[cell + 1] += 1
+        for i in range(cell_count):
+            counts[i + 1] += counts[i]
+        self.offsets = counts
+        self.rows = array('I', bytes(4 * len(cells)))
+        cursor = array('I', counts)
+        for row, cell in enumerate(cells):
+            self.rows[cursor[cell]] = row
+            cursor[cell] += 1
+
+    @classmethod
+    def for_columns(cls, columns, cell_degrees=2.0):
+        return cls(columns.columns['latitude'], columns.columns['longitude'], cell_degrees)
+
+    def _lat_cell(self, lat):
+        return min(max(int((lat + 90) / self.cell_degrees), 0), self.lat_cells - 1)
+
+    def _lon_cell(self, lon):
+        return min(max(int((lon + 180) / self.cell_degrees), 0), self.lon_cells - 1)
+
+    def _cell(self, lat, lon):
+        return self._lat_cell(lat) * self.lon_cells + self._lon_cell(lon)
+
+    def query(self, lamin, lomin, lamax, lomax):
+        """Row indices inside the box, as array('I').
+
+        Longitudes are wrapped with wrap_longitudes(). A box with lomin > lomax
+        crosses the antimeridian and is answered as the two boxes on either
+        side of it.
+        """
+        lamin, lamax = max(lamin, -90.0), min(lamax, 90.0)
+        if lamin > lamax:
+            return array('I')
+        lomin, lomax = wrap_longitudes(lomin, lomax)
+        if lomin > lomax:
+            result = self._query(lamin, lomin, lamax, 180.0)
+            result.extend(self._query(lamin, -180.0, lamax, lomax))
+            return result
+        return self._query(lamin, max(lomin, -180.0), lamax, min(lomax, 180.0))
+
+    def _query(self, lamin, lomin, lamax, lomax):
+        result = array('I')
+        rows, offsets = self.rows, self.offsets
+        lats, lons = self.latitudes, self.longitudes
+        size = self.cell_degrees
+        first_lat, last_lat = self._lat_cell(lamin), self._lat_cell(lamax)
+        first_lon, last_lon = self._lon_cell(lomin), self._lon_cell(lomax)
+
+        for lat_cell in range(first_lat, last_lat + 1):
+            cell_lamin = lat_cell * size - 90
+            lat_inside = cell_lamin >= lamin and cell_lamin + size <= lamax
+            base = lat_cell * self.lon_cells
+            for lon_cell in range(first_lon, last_lon + 1):
+                start, end = offsets[base + lon_cell], offsets[base + lon_cell + 1]
+                if start == end:
+                    continue
+                cell_lomin = lon_cell * size - 180
+                if lat_inside and cell_lomin >= lomin and cell_lomin + size <= lomax:
+                    result.extend(rows[start:end])
+                    continue
+                for row in rows[start:end]:
+                    if lamin <= lats[row] <= lamax and lomin <= lons[row] <= lomax:
+                        result.append(row)
+        return result
@@ -544,7 +544,85 @@ function formatTime(dateString) {
     }
 }
 
+// LIVE AIRCRAFT DELTAS
+// Keeps the last full aircraft list and applies the server's since= deltas to it
+class LiveAircraftFeed {
+    constructor() {
+        this.reset();
+    }
+
+    reset() {
+        this.aircraft = new Map();
+        this.version = null;
+        this.query = null;
+    }
+
+    // Add since= when polling the same endpoint/box as last time
+    url(baseUrl) {
+        if (this.query !== baseUrl) {
+            this.reset();
+            this.query = baseUrl;
+        }
+        if (this.version === null) return baseUrl;
+        return `${baseUrl}${baseUrl.includes('?') ? '&' : '?'}since=${this.version}`;
+    }
+
+    // Merge a response into the current list and return all aircraft
+    apply(data) {
+        if (!data.delta) {
+            this.aircraft = new Map((data.aircraft || []).map(ac => [ac.icao24, ac]));
+            this.version = data.version ?? null;
+            return Array.from(this.aircraft.values());
+        }
+
+        (data.added || []).forEach(values => {
+            const ac = {};
+            data.fields.forEach((field, i) => { ac[field] = values[i]; });
+            ac.origin_country = ac.country;
+            this.aircraft.set(ac.icao24, ac);
+        });
+        (data.changed || []).forEach(values => {
+            const ac = this.aircraft.get(values[0]);
+            if (!ac) return;
+            data.motion_fields.forEach((field, i) => { ac[field] = values[i]; });
+        });
+        (data.removed || []).forEach(icao24 => this.aircraft.delete(icao24));
+        this.version = data.version;
+        return Array.from(this.aircraft.values());
+    }
+}
+
+// Subscribes to an /api/aircraft/stream URL, calling onFallback if the stream can't be used
+function openAircraftStream(url, onData, onFallback) {
+    if (!window.EventSource) {
+        onFallback();
+        return null;
+    }
+
+    const source = new EventSource(url);
+    let failures = 0;
+    const handle = event => {
+        failures = 0;
+        onData(JSON.parse(event.data));
+    };
+    source.addEventListener('snapshot', handle);
+    source.addEventListener('delta', handle);
+    // Sent instead of snapshots for a low map zoom, shaped like the clustered polling response
+    source.addEventListener('clusters', handle);
+    source.onerror = () => {
+        // The browser reconnects by itself; give up after repeated failures or a hard error
+        failures++;
+        if (source.readyState === EventSource.CLOSED || failures >= 3) {
+            source.close();
+            onFallback();
+        }
+    };
+    return source;
+}
+
 // LIVE AIRCRAFT MAP
+const liveAircraftFeed = new LiveAircraftFeed();
+
 async function loadLiveAircraft(bounds = null) {
     showLoading();
 
@@ -556,15 +634,15 @@ async function loadLiveAircraft(bounds = null) {
     }
 
     try {
-        const response = await fetch(url);
+        const response = await fetch(liveAircraftFeed.url(url));
         const data = await response.json();
 
-        if (!data.success || !data.aircraft) {
+        if (!data.success || !(data.aircraft || data.delta)) {
             console.warn('No live aircraft data:', data.error || 'Unknown error');
             return;
         }
 
-        aircraftData = data.aircraft; // store for search/filter if needed
+        aircraftData = liveAircraftFeed.apply(data); // store for search/filter if needed
 
         updateAircraftMarkers(aircraftData);
 
@@ -625,10 +703,16 @@ document.addEventListener('DOMContentLoaded', function() {
     setupTabs();
     loadCacheInfo();
 
-    // If map tab exists, start loading live aircraft every 10s
+    // If map tab exists, stream live aircraft (or poll every 10s without SSE)
     if (document.getElementById('aircraft-map')) {
-        loadLiveAircraft();
-        setInterval(() => loadLiveAircraft(), 10000); // refresh every 10s
+        openAircraftStream('/api/aircraft/stream', data => {
+            aircraftData = liveAircraftFeed.apply(data);
+            updateAircraftMarkers(aircraftData);
+        }, () => {
+            liveAircraftFeed.reset();
+            loadLiveAircraft();
+            setInterval(() => loadLiveAircraft(), 10000); // refresh every 10s
+        });
     }
 });
 
@@ -0,0 +1,61 @@
+"""In-process stand-in for a Redis server: just enough RESP2 (GET/SET PX/DEL/SCAN) for RedisStore."""
+import fnmatch
+import socketserver
+import threading
+import time
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self.server.execute(args))
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RESPHandler)
+        self.data = {}  # key -> (value, expires_at monotonic or None)
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def _live(self, key):
+        value = self.data.get(key)
+        if value is not None and value[1] is not None and value[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, args):
+        command = args[0].upper()
+        with self.lock:
+            if command in (b'AUTH', b'SELECT'):
+                return b'+OK\r\n'
+            if command == b'GET':
+                value = self._live(args[1])
+                return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value[0]), value[0])
+            if command == b'SET':
+                expires_at = None
+                if len(args) == 5 and args[3].upper() == b'PX':
+                    expires_at = time.monotonic() + int(args[4]) / 1000
+                self.data[args[1]] = (args[2], expires_at)
+                return b'+OK\r\n'
+            if command == b'DEL':
+                return b':%d\r\n' % sum(self.data.pop(key, None) is not None for key in args[1:])
+            if command == b'SCAN':
+                pattern = args[args.index(b'MATCH') + 1].decode() if b'MATCH' in args else '*'
+                keys = [key for key in list(self.data) if self._live(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+                return b'*2\r\n$1\r\n0\r\n*%d\r\n' % len(keys) + b''.join(
+                    b'$%d\r\n%s\r\n' % (len(key), key) for key in keys)
+            return b'-ERR unknown command\r\n'
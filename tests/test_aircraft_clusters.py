@@ -0,0 +1,31 @@
+import random
+import time
+
+from aircraft_clusters import GLOBAL_CLUSTER_ZOOM, clusters_payload
+from aircraft_columns import AircraftColumns
+from opensky_ingest import AircraftSnapshot
+
+def snapshot(count=5000):
+    rng = random.Random(3)
+    states = [[f'{i:06x}', f'T{i}', 'Nowhere', 1700000000, 1700000000, rng.uniform(-180, 180),
+               rng.uniform(-80, 80), 10000.0, False, 200.0, 90.0, 0.0, None, 10000.0, None, False, 0]
+              for i in range(count)]
+    return AircraftSnapshot(1700000000, 1700000000, time.time(), count, AircraftColumns.from_states(states))
+
+def entries(payload):
+    return len(payload['clusters']) + len(payload['aircraft'])
+
+def test_worldwide_request_is_served_coarse_clusters():
+    payload = clusters_payload(snapshot(), 7)
+    assert payload['zoom'] == GLOBAL_CLUSTER_ZOOM
+    assert payload['count'] == 5000
+    assert entries(payload) <= 32 * 16
+
+def test_viewport_request_gets_its_own_zoom_level():
+    current = snapshot()
+    payload = clusters_payload(current, 7, (40.0, -10.0, 50.0, 10.0))
+    assert payload['zoom'] == 7
+    assert payload['count'] == len(current.index.query(40.0, -10.0, 50.0, 10.0))
+
+def test_individual_aircraft_from_the_clustering_threshold():
+    assert clusters_payload(snapshot(100), 8) is None
@@ -0,0 +1,41 @@
+import pytest
+from flask import Flask
+
+import aircraft_registry
+from database import db
+
+class DictCache:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'registry.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        csv_path = tmp_path / 'aircraftDatabase.csv'
+        csv_path.write_text("icao24,registration,model\na1b2c3,G-ABCD,A320\na1b2c4,G-ABCE,A321\n")
+        aircraft_registry.import_csv(str(csv_path))
+        yield app
+
+def test_batch_sorts_codes_by_what_is_known_about_them(app):
+    cache = DictCache({'opensky_aircraft_ffffff': {'icao24': 'ffffff', 'model': 'B738'},
+                       'opensky_aircraft_unknown_eeeeee': True})
+    resolved = aircraft_registry.resolve(['A1B2C3', 'ffffff', 'eeeeee', 'dddddd', 'nope', 'a1b2c3'], cache)
+    assert sorted(resolved['aircraft']) == ['a1b2c3', 'ffffff']
+    assert resolved['aircraft']['a1b2c3']['registration'] == 'G-ABCD'
+    assert resolved['unknown'] == ['eeeeee']
+    # Only a real OpenSky 404 makes a code unknown, missing from the registry leaves it unresolved
+    assert resolved['unresolved'] == ['dddddd']
+    assert resolved['invalid'] == ['nope']
+
+def test_reimport_drops_aircraft_gone_from_the_export(app, tmp_path):
+    csv_path = tmp_path / 'aircraftDatabase.csv'
+    csv_path.write_text("icao24,registration\na1b2c3,G-ABCD\n")
+    assert aircraft_registry.import_csv(str(csv_path)) == 1
+    assert list(aircraft_registry.lookup(['a1b2c3', 'a1b2c4'])) == ['a1b2c3']
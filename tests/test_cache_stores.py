@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from cache_manager import CacheManager, CachePolicy
+from cache_stores import RedisStore, RESPConnection, SQLiteStore
+from tests.resp_server import RESPServer
+
+@pytest.fixture(scope='module')
+def resp_server():
+    server = RESPServer()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_store(request, tmp_path, resp_server):
+    stores = []
+
+    def make():
+        if request.param == 'sqlite':
+            store = SQLiteStore(str(tmp_path / 'cache.db'))
+        else:
+            store = RedisStore(resp_server.url, prefix=f'test:{id(stores)}:')
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.clear()
+        store.close()
+
+def entry(data, age_seconds=0):
+    return {'data': data, 'timestamp': (datetime.now() - timedelta(seconds=age_seconds)).isoformat()}
+
+def write(store, key, data, retention=timedelta(minutes=5)):
+    return store.write_entry({key: entry(data)}, key, retention)
+
+def test_get_missing(make_store):
+    assert make_store().get('nope') is None
+
+def test_set_and_get(make_store):
+    store = make_store()
+    assert write(store, 'flights_a', {'data': [1, 2, 3]}) > 0
+    found = store.get('flights_a')
+    assert found['data'] == {'data': [1, 2, 3]}
+    assert abs(datetime.fromisoformat(found['timestamp']) - datetime.now()) < timedelta(seconds=5)
+
+def test_overwrite(make_store):
+    store = make_store()
+    write(store, 'flights_a', 'old')
+    write(store, 'flights_a', 'new')
+    assert store.get('flights_a')['data'] == 'new'
+
+def test_delete(make_store):
+    store = make_store()
+    write(store, 'flights_a', 1)
+    write(store, 'flights_b', 2)
+    store.delete_entries({}, ['flights_a'])
+    assert store.get('flights_a') is None
+    assert store.get('flights_b')['data'] == 2
+
+def test_clear(make_store):
+    store = make_store()
+    for i in range(3):
+        write(store, f'flights_{i}', i)
+    store.clear()
+    assert all(store.get(f'flights_{i}') is None for i in range(3))
+
+def test_entries_expire_after_retention(make_store):
+    store = make_store()
+    write(store, 'flights_a', 1, retention=timedelta(milliseconds=50))
+    write(store, 'flights_b', 2)
+    time.sleep(0.1)
+    assert store.get('flights_a') is None
+    store.sweep()
+    assert store.get('flights_b')['data'] == 2
+
+def test_workers_share_entries(make_store):
+    first, second = make_store(), make_store()
+    if isinstance(first, RedisStore):
+        second.prefix = first.prefix
+    write(first, 'flights_a', 'shared')
+    assert second.get('flights_a')['data'] == 'shared'
+
+def test_redis_clear_keeps_other_prefixes(resp_server):
+    store = RedisStore(resp_server.url, prefix='flighthub:cache:')
+    other = RESPConnection('127.0.0.1', resp_server.server_address[1])
+    other.execute('SET', 'unrelated', 'keep')
+    write(store, 'flights_a', 1)
+    store.clear()
+    assert store.get('flights_a') is None
+    assert other.execute('GET', 'unrelated') == b'keep'
+    other.close()
+    store.close()
+
+def test_expired_local_copy_leaves_fresher_shared_entry(make_store, tmp_path):
+    store = make_store()
+    policies = {'flights_*': CachePolicy(60, max_stale_seconds=60)}
+    first = CacheManager(cache_file=str(tmp_path / 'a.json'), storage=store, policies=policies)
+    second = CacheManager(cache_file=str(tmp_path / 'b.json'), storage=store, policies=policies)
+    first.set('flights_a', 'old')
+    first.cache['flights_a'] = entry('old', age_seconds=500)
+    second.set('flights_a', 'new')
+
+    assert first.lookup('flights_a') == ('new', pytest.approx(0, abs=5), False)
+    first.cache['flights_a'] = entry('old', age_seconds=500)
+    first.purge_expired()
+    assert store.get('flights_a')['data'] == 'new'
+
+def test_short_lived_threads_share_a_bounded_pool(make_store):
+    # Every gevent greenlet is a thread of its own: connections must not pile up per caller
+    store = make_store()
+    write(store, 'flights_a', 1)
+    for _ in range(5):
+        threads = [threading.Thread(target=store.get, args=('flights_a',)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert store._pool._open <= store._pool.size
+    assert store.get('flights_a')['data'] == 1
+
+def test_redis_reconnects_after_the_server_dropped_the_connection(resp_server):
+    store = RedisStore(resp_server.url, prefix='test:reconnect:', pool_size=1)
+    write(store, 'flights_a', 1)
+    with store._pool.connection() as conn:
+        conn.sock.shutdown(2)  # As if the server had closed it
+    assert store.get('flights_a')['data'] == 1
+    assert store._pool._open == 1
+    store.clear()
+    store.close()
@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+
+from database import db
+from flight_store import FlightStore
+
+def flight(day, number, dep='JFK', status='active'):
+    return {'flight_date': day, 'flight_status': status, 'departure': {'iata': dep, 'scheduled': f'{day}T10:00:00'},
+            'arrival': {'iata': 'LHR'}, 'airline': {'iata': 'BA'}, 'flight': {'iata': f'BA{number}'}}
+
+def response(flights):
+    return {'pagination': {'limit': 100, 'offset': 0, 'count': len(flights), 'total': len(flights)},
+            'data': flights}
+
+@pytest.fixture
+def store(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'flights.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield FlightStore()
+
+def test_narrower_search_is_answered_from_a_broader_one(store):
+    store.ingest({'dep_iata': 'JFK'}, response([flight('2026-10-17', 1), flight('2026-10-17', 2, status='landed')]))
+    answer = store.answer({'dep_iata': 'JFK', 'flight_status': 'active'})
+    assert answer['superset'] == {'dep_iata': 'JFK'}
+    assert [row['flight']['iata'] for row in answer['data']] == ['BA1']
+
+def test_flight_date_must_match_exactly(store):
+    # Without flight_date upstream only answers for recent days, so an older date isn't covered
+    store.ingest({'dep_iata': 'JFK'}, response([flight('2026-10-17', 1)]))
+    assert store.answer({'dep_iata': 'JFK', 'flight_date': '2026-09-01'}) is None
+
+    store.ingest({'dep_iata': 'JFK', 'flight_date': '2026-09-01'}, response([flight('2026-09-01', 3)]))
+    assert store.answer({'dep_iata': 'JFK'})['superset'] == {'dep_iata': 'JFK'}
+    answer = store.answer({'dep_iata': 'JFK', 'flight_date': '2026-09-01', 'flight_status': 'active'})
+    assert [row['flight']['iata'] for row in answer['data']] == ['BA3']
+
+def test_superset_answer_only_holds_its_own_rows(store):
+    store.ingest({'dep_iata': 'JFK'}, response([flight('2026-10-17', 1)]))
+    # Stored later by a search outside the first answer's scope
+    store.ingest({'dep_iata': 'JFK', 'flight_date': '2026-09-01'}, response([flight('2026-09-01', 3)]))
+
+    answer = store.answer({'dep_iata': 'JFK'})
+    assert [row['flight']['iata'] for row in answer['data']] == ['BA1']
+    assert answer['pagination']['total'] == 1
+    answer = store.answer({'dep_iata': 'JFK', 'flight_status': 'active'})
+    assert [row['flight']['iata'] for row in answer['data']] == ['BA1']
@@ -0,0 +1,46 @@
+import multiprocessing
+
+from cache_manager import CacheManager, JournalStore
+
+WORKERS = 4
+KEYS = 300
+
+def write_keys(cache_file, worker):
+    # Compacts every few KB, so workers keep rotating the journal under each other
+    cache = CacheManager(cache_file=cache_file, storage=JournalStore(cache_file, compact_min_bytes=2048,
+                                                                     compact_interval=0.01))
+    for i in range(KEYS):
+        cache.set(f"w{worker}_{i}", {'payload': 'x' * 40})
+    cache.close()
+
+def test_workers_sharing_a_journal_keep_each_others_entries(tmp_path):
+    cache_file = str(tmp_path / 'api_cache.json')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=write_keys, args=(cache_file, worker)) for worker in range(WORKERS)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert all(process.exitcode == 0 for process in workers)
+
+    store = JournalStore(cache_file, compact_interval=0)
+    entries = store.load()
+    store.close()
+    missing = [f"w{worker}_{i}" for worker in range(WORKERS) for i in range(KEYS)
+               if f"w{worker}_{i}" not in entries]
+    assert not missing
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    cache_file = str(tmp_path / 'api_cache.json')
+    cache = CacheManager(cache_file=cache_file, storage=JournalStore(cache_file, compact_interval=0))
+    cache.set('kept', 1)
+    cache.set('gone', 2)
+    with cache._lock:
+        cache._remove(['gone'])
+    assert cache.store.compact()
+    cache.set('after', 3)
+    cache.close()
+
+    store = JournalStore(cache_file, compact_interval=0)
+    assert sorted(store.load()) == ['after', 'kept']
+    store.close()
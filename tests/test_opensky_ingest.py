@@ -0,0 +1,72 @@
+import time
+
+from aircraft_columns import AircraftColumns
+from cache_manager import CacheManager
+from cache_stores import SQLiteStore
+from opensky_ingest import OpenSkyIngestor
+
+STATES = [['abc123', 'BAW1    ', 'United Kingdom', 1700000000, 1700000000, -0.46, 51.47, 1000.0, False,
+           120.0, 90.0, 0.0, None, 1000.0, None, False, 0]]
+
+def make_fetch(calls):
+    def fetch_states():
+        calls.append(1)
+        return 200, {'time': int(time.time() * 1000), 'total_states': 1,
+                     'columns': AircraftColumns.from_states(STATES)}
+    return fetch_states
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_per_process_store_does_not_get_the_snapshot(tmp_path):
+    cache = CacheManager(cache_file=str(tmp_path / 'api_cache.json'), storage='journal')
+    calls = []
+    ingestor = OpenSkyIngestor(make_fetch(calls), cache, poll_interval=0.05, lock_file=str(tmp_path / 'lock'))
+    ingestor.snapshot()
+    ingestor.start()
+    try:
+        assert wait_for(lambda: ingestor.snapshot() is not None)
+        assert cache.lookup(ingestor.cache_key) is None
+    finally:
+        ingestor.stop()
+        cache.close()
+
+def test_idle_leader_hands_over_to_a_worker_with_readers(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'cache.db'))
+    caches = [CacheManager(cache_file=str(tmp_path / f'{i}.json'), storage=store) for i in range(2)]
+    leader_calls, follower_calls = [], []
+    leader = OpenSkyIngestor(make_fetch(leader_calls), caches[0], poll_interval=0.05, idle_timeout=0.3,
+                             lock_file=str(tmp_path / 'lock'))
+    follower = OpenSkyIngestor(make_fetch(follower_calls), caches[1], poll_interval=0.05, idle_timeout=60,
+                               lock_file=str(tmp_path / 'lock'))
+    leader.snapshot()
+    leader.start()
+    try:
+        assert wait_for(lambda: leader.is_leader and leader_calls)
+        follower.snapshot()
+        follower.start()
+        assert wait_for(lambda: follower.snapshot() is not None)
+        assert not follower.is_leader and not follower_calls
+
+        # Only the follower's clients keep reading: it takes over polling OpenSky
+        assert wait_for(lambda: follower.is_leader and follower.snapshot() is not None and follower_calls)
+        assert not leader.is_leader
+    finally:
+        leader.stop()
+        follower.stop()
+        store.close()
+
+def test_only_the_current_snapshot_keeps_encoded_bytes(tmp_path):
+    ingestor = OpenSkyIngestor(make_fetch([]), None, lock_file=str(tmp_path / 'lock'))
+    for opensky_time in (1700000000, 1700000010, 1700000020):
+        ingestor.publish(AircraftColumns.from_states(STATES), opensky_time)
+    current = ingestor.snapshot()
+    assert current._encoded is not None
+    history = [ingestor.snapshot_at(version) for version in (1700000000, 1700000010)]
+    assert all(snapshot._encoded is None and len(snapshot.columns) == 1 for snapshot in history)
+    assert b'"abc123"' in current.encoded()[0]
@@ -0,0 +1,56 @@
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+import reference_catalog
+from database import db
+
+AIRPORTS = [{'id': str(i), 'airport_name': f'Airport {i}', 'iata_code': f'A{i:02d}'} for i in range(10)]
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    db.init_app(app)
+    with app.app_context():
+        reference_catalog.ensure_schema()
+        yield app
+
+def make_fetch(records, calls, page_limit=None, fail_at=None):
+    """aviationstack stand-in returning at most ``page_limit`` rows per page, raising at offset ``fail_at``"""
+    def fetch_page(offset, limit):
+        calls.append(offset)
+        if offset == fail_at:
+            raise RuntimeError('connection reset')
+        page = records[offset:offset + min(limit, page_limit or limit)]
+        return {'pagination': {'limit': limit, 'offset': offset, 'count': len(page), 'total': len(records)},
+                'data': page}
+    return fetch_page
+
+def entry_count():
+    return db.session.execute(text("SELECT COUNT(*) FROM catalog_entries WHERE kind = 'airports'")).scalar()
+
+def test_interrupted_import_resumes_from_the_last_page(app):
+    calls = []
+    with pytest.raises(RuntimeError):
+        reference_catalog.refresh('airports', make_fetch(AIRPORTS, calls, fail_at=6), page_size=3)
+    db.session.rollback()
+    assert entry_count() == 6
+    assert reference_catalog.state('airports')['next_offset'] == 6
+
+    calls.clear()
+    assert reference_catalog.refresh('airports', make_fetch(AIRPORTS, calls), page_size=3) == 4
+    assert calls == [6, 9]
+    assert entry_count() == 10
+    assert reference_catalog.state('airports')['next_offset'] == 0
+
+def test_short_pages_do_not_end_the_pass(app):
+    calls = []
+    assert reference_catalog.refresh('airports', make_fetch(AIRPORTS, calls, page_limit=4), page_size=100) == 10
+    assert calls == [0, 4, 8]
+    assert reference_catalog.state('airports')['completed_at'] is not None
+
+def test_finished_pass_deletes_entries_gone_upstream(app):
+    reference_catalog.refresh('airports', make_fetch(AIRPORTS, []), page_size=5)
+    reference_catalog.refresh('airports', make_fetch(AIRPORTS[:7], []), page_size=5)
+    assert entry_count() == 7
@@ -0,0 +1,38 @@
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+import result_blobs
+from database import db
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'history.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        result_blobs.ensure_schema()
+        yield app
+
+def add_inline(results):
+    db.session.execute(text(
+        "INSERT INTO search_history (user_id, search_type, search_query, results) VALUES (1, 'flight', 'JFK', :results)"
+    ), {'results': results})
+
+def test_migrate_leaves_unreadable_rows_alone(app):
+    for results in ['{"data": [1]}', 'not json', '{}', '{"data": [1]}', 'null', '{"data": [2]}']:
+        add_inline(results)
+    db.session.commit()
+
+    batches = list(result_blobs.migrate(batch_size=2))
+    assert sum(moved for moved, skipped in batches) == 3
+    assert sum(skipped for moved, skipped in batches) == 3
+
+    rows = db.session.execute(text("SELECT results, result_hash FROM search_history ORDER BY id")).all()
+    assert [results for results, result_hash in rows if result_hash is None] == ['not json', '{}', 'null']
+    assert result_blobs.stats()['blobs'] == 2
+    assert result_blobs.stats()['references'] == 3
+
+    # A second run only finds the skipped rows again
+    assert list(result_blobs.migrate()) == [(0, 3)]
@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 32
+
+def run_concurrently(flight, fetch, key='flights_jfk'):
+    """CALLERS threads released together into flight.do(key, fetch); returns (results, errors)"""
+    barrier = threading.Barrier(CALLERS)
+    results, errors = [], []
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(flight.do(key, fetch))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def slow(result=None, error=None, calls=None):
+    """A fetch that stays in flight long enough for every caller to join it"""
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        if error is not None:
+            raise error
+        return result
+    return fetch
+
+def test_concurrent_callers_share_one_upstream_call():
+    flight, calls = SingleFlight(), []
+    response = {'data': ['BA1']}
+    results, errors = run_concurrently(flight, slow(result=response, calls=calls))
+    assert len(calls) == 1
+    assert errors == []
+    assert len(results) == CALLERS and all(result is response for result in results)
+    assert flight.executions == 1 and flight.coalesced == CALLERS - 1
+
+def test_concurrent_callers_share_the_exception():
+    flight, calls = SingleFlight(), []
+    error = ConnectionError('upstream down')
+    results, errors = run_concurrently(flight, slow(error=error, calls=calls))
+    assert len(calls) == 1
+    assert results == []
+    assert len(errors) == CALLERS and all(e is error for e in errors)
+
+def test_next_call_after_completion_runs_again():
+    flight, calls = SingleFlight(), []
+    fetch = slow(result=1, calls=calls)
+    assert flight.do('k', fetch) == 1
+    with pytest.raises(ValueError):
+        flight.do('k', slow(error=ValueError('boom'), calls=calls))
+    assert flight.do('k', fetch) == 1
+    assert len(calls) == 3
+
+def test_different_keys_are_not_coalesced():
+    flight, calls = SingleFlight(), []
+    fetch = slow(result=1, calls=calls)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda key: flight.do(key, fetch), ['a', 'b', 'c', 'd']))
+    assert len(calls) == 4
+
+def test_spawn_joins_foreground_callers():
+    flight, calls = SingleFlight(), []
+    with ThreadPoolExecutor(1) as pool:
+        assert flight.spawn('k', slow(result='refreshed', calls=calls), pool)
+        assert not flight.spawn('k', slow(result='again', calls=calls), pool)
+        assert flight.do('k', slow(result='foreground', calls=calls)) == 'refreshed'
+    assert len(calls) == 1
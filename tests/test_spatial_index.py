@@ -0,0 +1,26 @@
+from array import array
+
+from aircraft_stream import region_for
+from spatial_index import GridIndex, wrap_longitudes
+
+# Aircraft either side of the antimeridian and one over Europe
+LATITUDES = array('d', [10.0, 10.0, 10.0, 48.0])
+LONGITUDES = array('d', [175.0, -175.0, -160.0, 2.0])
+
+def test_wrap_longitudes():
+    assert wrap_longitudes(170.0, 200.0) == (170.0, -160.0)
+    assert wrap_longitudes(-190.0, -170.0) == (170.0, -170.0)
+    assert wrap_longitudes(10.0, 20.0) == (10.0, 20.0)
+    assert wrap_longitudes(-200.0, 200.0) == (-180.0, 180.0)
+
+def test_box_panned_across_the_antimeridian_keeps_the_far_side():
+    index = GridIndex(LATITUDES, LONGITUDES)
+    # Leaflet after panning east across the antimeridian
+    assert sorted(index.query(0.0, 170.0, 20.0, 190.0)) == [0, 1]
+    assert sorted(index.query(0.0, 170.0, 20.0, 210.0)) == [0, 1, 2]
+    # ... and west across it
+    assert sorted(index.query(0.0, -190.0, 20.0, -170.0)) == [0, 1]
+    assert sorted(index.query(0.0, -540.0, 90.0, 540.0)) == [0, 1, 2, 3]
+
+def test_stream_region_of_a_wrapped_box():
+    assert region_for((0.0, 170.0, 20.0, 200.0)) == (0.0, 170.0, 20.0, -160.0)
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+class UserIdentity(UserMixin):
+    """Read-only copy of the User columns requests need, safe to share across threads and sessions.
+
+    Code that changes a user loads the User row itself (``User.query.get(current_user.id)``).
+    """
+
+    def __init__(self, id, email, username, google_id=None, profile_picture=None, created_at=None):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.google_id = google_id
+        self.profile_picture = profile_picture
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.username, user.google_id, user.profile_picture, user.created_at)
+
+    def to_dict(self):
+        """Same shape as User.to_dict()"""
+        return {
+            'id': self.id,
+            'email': self.email,
+            'username': self.username,
+            'created_at': self.created_at.isoformat(),
+            'profile_picture': self.profile_picture
+        }
+
+class IdentityCache:
+    """Per-process TTL cache of UserIdentity by user id, for the Flask-Login user loader.
+
+    Entries live for ``ttl_seconds`` and the least recently used are dropped
+    past ``max_entries``. Changes made in this process invalidate the entry
+    right away; other workers pick them up when their entry expires, so
+    ``ttl_seconds`` bounds how stale a profile (or a deleted account) can be.
+    """
+
+    def __init__(self, ttl_seconds=60, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, identity):
+        if self.ttl_seconds <= 0:
+            return identity
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
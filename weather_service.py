@@ -0,0 +1,183 @@
+import re
+import threading
+
+import requests
+
+import reference_catalog
+from database import db, UserPreferences, WeatherLocation
+
+GROUP_SIZE = 20  # OpenWeatherMap's group endpoint takes at most 20 city ids per call
+AIRPORT_CODE = re.compile(r'^[A-Za-z]{3,4}$')
+
+class Location:
+    """A canonical place to ask OpenWeatherMap about: ``key`` names it, ``params`` locate it"""
+
+    __slots__ = ('key', 'params')
+
+    def __init__(self, key, params):
+        self.key = key
+        self.params = params
+
+    def __repr__(self):
+        return f"Location({self.key!r})"
+
+def resolve(text):
+    """Canonical Location for a free-text city or an airport code.
+
+    IATA/ICAO codes found in the airport catalog become 'airport:<IATA>' at
+    the airport's coordinates; anything else is matched by name, with case
+    and whitespace folded so 'New  York' and 'new york' share one entry.
+    """
+    query = ' '.join((text or '').split())
+    if AIRPORT_CODE.match(query):
+        airport = reference_catalog.find('airports', query.upper())
+        if airport and airport.get('latitude') not in (None, '') and airport.get('longitude') not in (None, ''):
+            return Location(f"airport:{airport.get('iata_code') or query.upper()}", {
+                'lat': round(float(airport['latitude']), 4),
+                'lon': round(float(airport['longitude']), 4)
+            })
+    return Location(f"q:{query.lower()}", {'q': query})
+
+class WeatherService:
+    """Current weather per canonical location, refreshed in as few upstream calls as possible.
+
+    The first fetch of a location learns its OpenWeatherMap city id
+    (kept in WeatherLocation); after that refresh() updates up to GROUP_SIZE
+    locations per call through the group endpoint. Results are cached under
+    ``openweather_location_<key>``.
+
+    ``fetch(endpoint, params)`` makes the upstream call and returns the JSON,
+    raising requests exceptions on failure.
+    """
+
+    def __init__(self, cache, fetch, units='metric'):
+        self.cache = cache
+        self.fetch = fetch
+        self.units = units
+
+    @staticmethod
+    def cache_key(location):
+        return f"openweather_location_{location.key}"
+
+    def fetch_one(self, location):
+        """Fetch and cache one location, an {'error': ...} dict if OpenWeatherMap can't answer"""
+        try:
+            data = self.fetch('weather', dict(location.params, units=self.units))
+        except requests.exceptions.RequestException as e:
+            return {'error': {'message': f'API request failed: {str(e)}'}}
+        self.cache.set(self.cache_key(location), data)
+        if data.get('id'):
+            db.session.merge(WeatherLocation(key=location.key, owm_id=data['id'], name=data.get('name')))
+            db.session.commit()
+        return data
+
+    def city_ids(self, locations):
+        keys = list({location.key for location in locations})
+        rows = WeatherLocation.query.filter(WeatherLocation.key.in_(keys), WeatherLocation.owm_id.isnot(None))
+        return {row.key: row.owm_id for row in rows}
+
+    def refresh(self, locations, parallel=None, max_single=None):
+        """Fetch and cache many locations, returns {key: data}.
+
+        Locations with a known city id go through the group endpoint;
+        the rest are fetched one by one (through ``parallel(calls)`` when
+        given), at most ``max_single`` of them.
+        """
+        unique = list({location.key: location for location in locations}.values())
+        ids = self.city_ids(unique)
+        grouped = [location for location in unique if location.key in ids]
+        single = [location for location in unique if location.key not in ids]
+        results = {}
+
+        for i in range(0, len(grouped), GROUP_SIZE):
+            batch = grouped[i:i + GROUP_SIZE]
+            try:
+                data = self.fetch('group', {'id': ','.join(str(ids[location.key]) for location in batch),
+                                            'units': self.units})
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  OpenWeatherMap group call failed ({e}), fetching {len(batch)} locations one by one")
+                single.extend(batch)
+                continue
+            by_id = {item.get('id'): item for item in data.get('list', [])}
+            for location in batch:
+                item = by_id.get(ids[location.key])
+                if item is None:
+                    single.append(location)
+                    continue
+                self.cache.set(self.cache_key(location), item)
+                results[location.key] = item
+
+        if max_single is not None:
+            single = single[:max_single]
+        calls = [lambda location=location: self.fetch_one(location) for location in single]
+        for location, data in zip(single, parallel(calls) if parallel else [call() for call in calls]):
+            results[location.key] = data
+        return results
+
+def favorite_airports():
+    """Every entry of any user's favorite_airports, deduplicated ignoring case"""
+    codes = {}
+    for (favorites,) in db.session.query(UserPreferences.favorite_airports):
+        for code in favorites or []:
+            if isinstance(code, str) and code.strip():
+                codes.setdefault(code.strip().lower(), code.strip())
+    return list(codes.values())
+
+class WeatherPrewarmer:
+    """Background thread keeping the weather of users' favorite airports in cache.
+
+    Every ``interval`` seconds, the favorites whose cached weather would
+    expire before the next run are refreshed with WeatherService.refresh(),
+    so the weather page for them is served from cache. With a shared cache,
+    a refresh made by one worker is seen by the others, which then skip it.
+    At most ``max_new`` favorites without a known city id are fetched one by
+    one per run.
+    """
+
+    def __init__(self, app, service, interval=300, max_new=10):
+        self.app = app
+        self.service = service
+        self.interval = interval
+        self.max_new = max_new
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the prewarm thread (idempotent, safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='weather-prewarm', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def due(self, location):
+        key = self.service.cache_key(location)
+        found = self.service.cache.lookup(key)
+        ttl = self.service.cache.policy_for(key).ttl.total_seconds()
+        return found is None or found[1] >= ttl - self.interval
+
+    def step(self):
+        with self.app.app_context():
+            try:
+                due = [location for location in map(resolve, favorite_airports()) if self.due(location)]
+                if due:
+                    refreshed = self.service.refresh(due, max_single=self.max_new)
+                    print(f"✓ Weather prewarm: {len(refreshed)} of {len(due)} favorite airports refreshed")
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  Weather prewarm failed: {e}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.step()
+            self._stopped.wait(self.interval)